@@ -39,7 +39,7 @@ import groovyx.gpars.GParsPool
 
 Log.setLog(new StdErrLog())
 
-def startServer(def ontologies, def port) {
+def startServer(def ontologies, def port, def managers) {
 
     Server server = new Server(port)
     if (!server) {
@@ -62,30 +62,45 @@ def startServer(def ontologies, def port) {
     context.addServlet(GroovyServlet, '/api/retrieveRSuccessors.groovy')
     context.addServlet(GroovyServlet, '/api/retrieveAllLabels.groovy')
     context.addServlet(GroovyServlet, '/api/sparql.groovy')
+    context.addServlet(GroovyServlet, '/api/status.groovy')
     context.setAttribute('port', port)
     context.setAttribute('version', '0.2')
     server.start()
     println "Server started on " + server.getURI()
-    def managers = [:]
     context.setAttribute("managers", managers)
-    def tryAgain = []
+
+    // With lazy loading only the pinned ontologies are loaded at startup,
+    // the others on their first query
+    if (managers.lazy) {
+	ontologies.each { ont ->
+	    managers.register(ont.ontId, ont.ontIRI, ont.pinned ?: false, ont.snapshotIRI)
+	}
+    }
+    def startup = managers.lazy ? ontologies.findAll { it.pinned } : ontologies
+    // runontapi lists the most requested ontologies first, a batch is only
+    // started when the previous one is loaded
+    def batches = startup.groupBy { it.batch ?: 0 }.sort { it.key }
+    def tryAgain = [].asSynchronized()
     GParsPool.withPool {
-	ontologies.eachParallel { ont ->
-	    def mgr = RequestManager.create(ont.ontId, ont.ontIRI)
-	    if (mgr != null) {
-		managers[ont.ontId] = mgr
-	    } else {
-		tryAgain.add(ont);
+	batches.each { batch, onts ->
+	    onts.eachParallel { ont ->
+		def mgr = RequestManager.create(ont.ontId, ont.ontIRI, ont.snapshotIRI)
+		if (mgr != null) {
+		    managers[ont.ontId] = mgr
+		} else {
+		    tryAgain.add(ont);
+		}
 	    }
 	}
     }
 
     tryAgain.each { ont ->
-	def mgr = RequestManager.create(ont.ontId, ont.ontIRI)
+	def mgr = RequestManager.create(ont.ontId, ont.ontIRI, ont.snapshotIRI)
 	if (mgr != null) {
 	    managers[ont.ontId] = mgr
 	} else {
 	    println("Can't start " + ont.ontId)
+	    managers.recordFailure(ont.ontId)
 	}
     }
     
@@ -95,4 +110,16 @@ def data = System.in.newReader().getText()
 def slurper = new JsonSlurper()
 def ontologies = slurper.parseText(data)
 
-startServer(ontologies, 8080)
+// runontapi starts one server per partition of the ontologies, each on its
+// own port. Lazy loading is enabled with a second argument "true", followed by the
+// heap fraction kept for the loaded ontologies, the seconds a query waits
+// for its ontology to load, the number of ontologies loaded at once and the
+// seconds before an ontology which failed to load is tried again
+def port = args.length > 0 ? args[0].toInteger() : 8080
+def lazy = args.length > 1 && args[1] == "true"
+def maxHeapFraction = args.length > 2 ? args[2].toDouble() : 0.8
+def loadWait = args.length > 3 ? args[3].toLong() : 30
+def loadConcurrency = args.length > 4 ? args[4].toInteger() : 2
+def failureBackoff = args.length > 5 ? args[5].toLong() : 300
+startServer(ontologies, port, new ManagerCache(
+    lazy, maxHeapFraction, loadWait * 1000, loadConcurrency, failureBackoff * 1000))
@@ -16,8 +16,11 @@ def managers = application.managers
 
 def owlThing = '<http://www.w3.org/2002/07/owl#Thing>'
 
-if(query && ontology && managers.containsKey(ontology)) {
-    def manager = managers[ontology]
+def manager = ontology && managers.containsKey(ontology) ? managers[ontology] : null
+
+if (manager == null && Util.respondLoading(response, managers, ontology)) {
+    return
+} else if(query && manager != null) {
     query = java.net.URLDecoder.decode(query, "UTF-8")
 
     // find superclasses
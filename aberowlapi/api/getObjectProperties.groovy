@@ -14,13 +14,17 @@ def managers = application.managers;
 
 response.contentType = 'application/json';
 
-if(ontology && managers.containsKey(ontology)) {
+def manager = ontology && managers.containsKey(ontology) ? managers[ontology] : null
+
+if (manager == null && Util.respondLoading(response, managers, ontology)) {
+    return
+} else if(manager != null) {
     if (property == null) {
-	def objectProperties = managers[ontology].getObjectProperties()
+	def objectProperties = manager.getObjectProperties()
 	print(new JsonBuilder(objectProperties))
     } else {
 	property = URLDecoder.decode(property, "UTF-8")
-	def objectProperties = managers[ontology].getObjectProperties(property)
+	def objectProperties = manager.getObjectProperties(property)
 	print(new JsonBuilder(objectProperties))
     }
 } else {
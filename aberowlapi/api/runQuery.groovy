@@ -33,7 +33,11 @@ try {
     def start = System.currentTimeMillis()
 
     if (ontology != null) {
-	def out = managers[ontology].runQuery(query, type, direct, labels, axioms)
+	def manager = managers[ontology]
+	if (manager == null && Util.respondLoading(response, managers, ontology)) {
+	    return
+	}
+	def out = manager.runQuery(query, type, direct, labels, axioms)
 	def end = System.currentTimeMillis()
 	results.put('time', (end - start))
 	results.put('result', out)
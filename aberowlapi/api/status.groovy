@@ -0,0 +1,8 @@
+import groovy.json.*
+
+// Ontologies served by this process, runontapi publishes them as heartbeats
+def managers = application.managers
+def status = managers != null ? managers.getStatus() : [ontologies: []]
+
+response.contentType = 'application/json'
+print(new JsonBuilder(status))
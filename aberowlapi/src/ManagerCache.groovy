@@ -0,0 +1,196 @@
+package src
+
+import java.util.concurrent.*
+
+// Request managers of the ontologies served by one ontology API process.
+//
+// Without lazy loading every ontology is loaded at startup and the cache is
+// a plain map. With lazy loading ontologies are only registered at startup
+// and loaded on their first query; when the used heap grows above
+// maxHeapFraction of the maximum heap, the least recently used managers
+// that are not pinned are disposed. A query for an ontology that is still
+// loading waits up to loadWait milliseconds. At most loadConcurrency
+// ontologies are loaded at once. An ontology which failed to load is not
+// loaded again for failureBackoff milliseconds, doubled after every new
+// failure. Ontologies with a taxonomy snapshot are started from it and only
+// loaded by the reasoner when a query needs it.
+public class ManagerCache {
+    private static final MAX_BACKOFF_DOUBLINGS = 6
+
+    def lazy
+    def maxHeapFraction
+    def loadWait
+    def failureBackoff
+
+    def iris = new ConcurrentHashMap<String, String>()
+    def snapshots = new ConcurrentHashMap<String, String>()
+    def pinned = ConcurrentHashMap.newKeySet()
+    def loading = new ConcurrentHashMap<String, Future>()
+    // Access ordered, the eldest entry is the least recently used manager
+    def managers = new LinkedHashMap<String, RequestManager>(16, 0.75f, true)
+    // Failed loads, ontology to [failures, time of the next attempt]
+    def failures = new ConcurrentHashMap<String, List>()
+    def executor
+
+    public ManagerCache(boolean lazy, double maxHeapFraction, long loadWait, int loadConcurrency,
+			long failureBackoff) {
+	this.lazy = lazy
+	this.maxHeapFraction = maxHeapFraction
+	this.loadWait = loadWait
+	this.failureBackoff = failureBackoff
+	this.executor = Executors.newFixedThreadPool(Math.max(loadConcurrency, 1))
+    }
+
+    void register(String ont, String ontIRI, boolean pin, String snapshotIRI) {
+	iris[ont] = ontIRI
+	if (snapshotIRI) {
+	    snapshots[ont] = snapshotIRI
+	}
+	if (pin) {
+	    pinned.add(ont)
+	}
+	failures.remove(ont)
+	println("Registered $ont")
+    }
+
+    boolean containsKey(String ont) {
+	return iris.containsKey(ont)
+    }
+
+    boolean isLoading(String ont) {
+	return loading.containsKey(ont)
+    }
+
+    synchronized boolean isLoaded(String ont) {
+	return managers.containsKey(ont)
+    }
+
+    synchronized def values() {
+	return new ArrayList(managers.values())
+    }
+
+    synchronized void putAt(String ont, RequestManager manager) {
+	// The snapshot belongs to the previous submission of a reloaded ontology
+	if (manager.ontIRI != iris[ont]) {
+	    snapshots.remove(ont)
+	}
+	iris[ont] = manager.ontIRI
+	failures.remove(ont)
+	def previous = managers.put(ont, manager)
+	if (previous != null && !previous.is(manager)) {
+	    previous.dispose()
+	}
+    }
+
+    synchronized def remove(String ont) {
+	return managers.remove(ont)
+    }
+
+    def getAt(String ont) {
+	return acquire(ont, loadWait)
+    }
+
+    boolean hasFailed(String ont) {
+	def failure = failures[ont]
+	return failure != null && System.currentTimeMillis() < failure[1]
+    }
+
+    void recordFailure(String ont) {
+	def count = (failures[ont]?.getAt(0) ?: 0) + 1
+	long backoff = failureBackoff * (1L << Math.min(count - 1, MAX_BACKOFF_DOUBLINGS))
+	failures[ont] = [count, System.currentTimeMillis() + backoff]
+	println("Failed loading $ont, next attempt in ${backoff / 1000} seconds")
+    }
+
+    // Returns the manager of the ontology, loading it if needed. Returns
+    // null when the ontology is unknown, failed to load recently or is still
+    // loading after wait milliseconds.
+    def acquire(String ont, long wait) {
+	synchronized (this) {
+	    def manager = managers.get(ont)
+	    if (manager != null || !lazy || !iris.containsKey(ont) || hasFailed(ont)) {
+		return manager
+	    }
+	}
+	def future = load(ont)
+	try {
+	    return future.get(wait, TimeUnit.MILLISECONDS)
+	} catch (TimeoutException e) {
+	    return null
+	} catch (ExecutionException e) {
+	    return null
+	}
+    }
+
+    // Starts loading the ontology once, concurrent queries share the load
+    Future load(String ont) {
+	def task = new FutureTask<RequestManager>({
+	    def manager = null
+	    try {
+		manager = RequestManager.create(ont, iris[ont], snapshots[ont])
+		if (manager != null) {
+		    putAt(ont, manager)
+		    evict()
+		}
+		return manager
+	    } finally {
+		if (manager == null) {
+		    recordFailure(ont)
+		}
+		loading.remove(ont)
+	    }
+	} as Callable<RequestManager>)
+	def current = loading.putIfAbsent(ont, task)
+	if (current != null) {
+	    return current
+	}
+	executor.execute(task)
+	return task
+    }
+
+    // Disposes least recently used managers while the used heap is above the
+    // budget. The used heap counts garbage until it is collected, it is
+    // measured again after a collection before evicting. The heap of a
+    // manager is estimated from its share of the axioms of the loaded
+    // ontologies, the garbage collector frees it later.
+    synchronized void evict() {
+	def runtime = Runtime.getRuntime()
+	long budget = (long) (runtime.maxMemory() * maxHeapFraction)
+	long used = runtime.totalMemory() - runtime.freeMemory()
+	if (used <= budget) {
+	    return
+	}
+	System.gc()
+	used = runtime.totalMemory() - runtime.freeMemory()
+	if (used <= budget) {
+	    return
+	}
+	long axioms = managers.values().sum { it.getAxiomCount() } ?: 1
+	double bytesPerAxiom = used / Math.max(axioms, 1)
+	def it = managers.entrySet().iterator()
+	while (used > budget && managers.size() > 1 && it.hasNext()) {
+	    def entry = it.next()
+	    if (pinned.contains(entry.key)) {
+		continue
+	    }
+	    it.remove()
+	    used -= (long) (entry.value.getAxiomCount() * bytesPerAxiom)
+	    entry.value.dispose()
+	    println("Evicted ${entry.key}")
+	}
+    }
+
+    synchronized def getStatus() {
+	// Registered ontologies are served, they are loaded on their first
+	// query, until they fail to load. A reload serves them again.
+	return [
+	    ontologies: new ArrayList(iris.keySet() - failures.keySet()),
+	    lazy: lazy,
+	    registered: new ArrayList(iris.keySet()),
+	    loaded: new ArrayList(managers.keySet()),
+	    failed: new ArrayList(failures.keySet()),
+	    loading: new ArrayList(loading.keySet()),
+	    pinned: new ArrayList(pinned),
+	]
+    }
+}
@@ -45,6 +45,9 @@ public class RequestManager {
     def ont = null;
     def ontIRI = null;
     def queryEngine = null;
+    // Answers taxonomy queries until the ontology is loaded for a query
+    // that needs the reasoner
+    def snapshot = null;
 
     def aProperties = [
     	df.getRDFSLabel(),
@@ -105,6 +108,40 @@ public class RequestManager {
 	}
     }
 
+    /**
+     * Start a manager from the taxonomy snapshot of the submission, the
+     * ontology is loaded and classified on the first query the snapshot
+     * cannot answer
+     */
+    public static RequestManager create(String ont, String ontIRI, String snapshotIRI) {
+	if (!snapshotIRI) {
+	    return create(ont, ontIRI)
+	}
+	RequestManager mgr = new RequestManager(ont, ontIRI);
+	try {
+	    println("Starting manager for $ont")
+	    mgr.snapshot = TaxonomySnapshot.load(snapshotIRI)
+	    println("Finished loading $ont")
+	    return mgr;
+	} catch (Exception e) {
+	    println("Failed loading snapshot of $ont")
+	    e.printStackTrace();
+	    return create(ont, ontIRI)
+	}
+    }
+
+    /**
+     * Load and classify the ontology of a manager started from a snapshot
+     */
+    synchronized void ensureReasoner() {
+	if (this.queryEngine == null) {
+	    println("Loading $ont for a query the snapshot cannot answer")
+	    this.loadOntology();
+	    this.createReasoner();
+	    this.snapshot = null;
+	}
+    }
+
     /**
      * Load a new or replace an existing ontology
      *
@@ -190,6 +227,18 @@ public class RequestManager {
 	println "Classified $ont"
     }
 
+    long getAxiomCount() {
+	return this.ontology?.getAxiomCount() ?: (this.snapshot?.size() ?: 0)
+    }
+
+    /**
+     * Release the reasoners of an evicted ontology
+     */
+    void dispose() {
+	queryEngine?.getoReasoner()?.dispose()
+	structReasoner?.dispose()
+    }
+
     def toInfo(OWLEntity c, boolean axioms) {
 	def o = this.ontology;
 	def info = [
@@ -306,6 +355,16 @@ public class RequestManager {
      * @return Set of OWL Classes.
      */
     Set runQuery(String mOwlQuery, String type, boolean direct, boolean labels, boolean axioms) {
+	def snapshot = this.snapshot
+	def snapshotResult = snapshot?.runQuery(mOwlQuery, type, direct, labels, axioms)
+	if (snapshotResult != null) {
+	    return snapshotResult
+	}
+	// A query naming classes of other ontologies does not classify this one
+	if (snapshot != null && !snapshot.hasClasses(mOwlQuery, labels)) {
+	    return []
+	}
+	ensureReasoner()
 	type = type.toLowerCase()
 	def requestType
 	switch (type) {
@@ -334,6 +393,7 @@ public class RequestManager {
      class and relations are given as String-IRIs
      */
     Set relationQuery(String relation, String cl) {
+	ensureReasoner()
 	Set classes = new HashSet<>();
 
 	def vOntUri = ont
@@ -401,6 +461,7 @@ public class RequestManager {
     }
     
     def getObjectProperties(OWLObjectProperty prop) {
+	ensureReasoner()
 
 	def subProps = this.structReasoner.getSubObjectProperties(
 	    prop, true).getFlattened()
@@ -0,0 +1,181 @@
+package src
+
+import groovy.json.*
+import java.util.zip.GZIPInputStream
+
+// Inferred class hierarchy and class annotations of a submission, written
+// by scripts/Ingest.groovy when the submission is classified.
+//
+// The snapshot is gzipped JSON, one line per class:
+//   {"info": {...}, "names": [...], "parents": [...], "equivalents": [...]}
+// after a header line. It answers subclass, superclass and equivalent
+// queries for a named class, runQuery returns null for anything else so
+// that the request manager falls back to the reasoner. The file may be
+// served already decompressed, it is only gunzipped when it is gzipped.
+public class TaxonomySnapshot {
+    private static final OWL_THING = 'http://www.w3.org/2002/07/owl#Thing'
+    private static final OWL_NOTHING = 'http://www.w3.org/2002/07/owl#Nothing'
+    private static final RESTRICTIONS = ['some', 'only', 'value', 'min', 'max', 'exactly', 'self'] as Set
+    private static final KEYWORDS = RESTRICTIONS + (['and', 'or', 'not', 'that', 'inverse'] as Set)
+
+    def infos = [:]
+    def parents = [:]
+    def children = [:].withDefault { [] }
+    def equivalents = [:]
+    def names = [:]
+    def roots = []
+
+    public static TaxonomySnapshot load(String snapshotIRI) {
+	def snapshot = new TaxonomySnapshot()
+	def slurper = new JsonSlurper()
+	def stream = new BufferedInputStream(new URL(snapshotIRI).openStream())
+	stream.mark(2)
+	def magic = (stream.read() & 0xff) | ((stream.read() & 0xff) << 8)
+	stream.reset()
+	if (magic == GZIPInputStream.GZIP_MAGIC) {
+	    stream = new GZIPInputStream(stream)
+	}
+	stream.withReader("UTF-8") { reader ->
+	    reader.readLine() // header
+	    String line
+	    while ((line = reader.readLine()) != null) {
+		snapshot.add(slurper.parseText(line))
+	    }
+	}
+	return snapshot
+    }
+
+    void add(def entry) {
+	def iri = entry.info['class']
+	infos[iri] = entry.info
+	parents[iri] = entry.parents
+	equivalents[iri] = entry.equivalents
+	entry.parents.each { parent -> children[parent] << iri }
+	if (entry.parents.isEmpty()) {
+	    roots << iri
+	}
+	entry.names.each { name -> names.putIfAbsent(name, iri) }
+    }
+
+    int size() {
+	return infos.size()
+    }
+
+    // IRI of the named class of a query, null for class expressions
+    String resolve(String query, boolean labels) {
+	query = query.trim()
+	if (query.startsWith('<') && query.endsWith('>') && query.indexOf('>') == query.length() - 1) {
+	    def iri = query.substring(1, query.length() - 1)
+	    return iri == OWL_THING || infos.containsKey(iri) ? iri : null
+	}
+	if (labels) {
+	    if (query.startsWith("'") && query.endsWith("'") && query.length() > 1) {
+		query = query.substring(1, query.length() - 1)
+	    }
+	    if (query.indexOf("'") < 0) {
+		return names[query.toLowerCase()]
+	    }
+	}
+	return null
+    }
+
+    def getDirectSuperClasses(String iri) {
+	return iri == OWL_THING ? [] : parents[iri]
+    }
+
+    def getDirectSubClasses(String iri) {
+	return iri == OWL_THING ? roots : children.get(iri, [])
+    }
+
+    def closure(String iri, Closure next) {
+	def result = new LinkedHashSet()
+	def queue = new ArrayDeque(next(iri))
+	while (!queue.isEmpty()) {
+	    def cur = queue.poll()
+	    if (result.add(cur)) {
+		queue.addAll(next(cur))
+	    }
+	}
+	return result
+    }
+
+    def getSuperClasses(String iri, boolean direct) {
+	return direct ? getDirectSuperClasses(iri) : closure(iri, this.&getDirectSuperClasses)
+    }
+
+    def getSubClasses(String iri, boolean direct) {
+	return direct ? getDirectSubClasses(iri) : closure(iri, this.&getDirectSubClasses)
+    }
+
+    // The class itself is among its equivalent classes, as for the reasoner
+    def getEquivalentClasses(String iri) {
+	return iri == OWL_THING ? [] : [iri] + equivalents[iri]
+    }
+
+    // False when the query names a class which is not in the snapshot, the
+    // ontology cannot parse the query and the reasoner is not needed to
+    // answer it. Properties and individuals are not in the snapshot and are
+    // not checked, nor are the unquoted names of a query with labels.
+    boolean hasClasses(String query, boolean labels) {
+	if (query == null) {
+	    return true
+	}
+	def tokens = (query =~ /<[^>]*>|'[^']*'|[{}]|[^\s(){},\[\]]+/).collect { it }
+	def individuals = false
+	for (int i = 0; i < tokens.size(); i++) {
+	    def token = tokens[i]
+	    def previous = i > 0 ? tokens[i - 1].toLowerCase() : null
+	    def next = i < tokens.size() - 1 ? tokens[i + 1].toLowerCase() : null
+	    if (token == '{' || token == '}') {
+		individuals = token == '{'
+		continue
+	    }
+	    if (individuals || next in RESTRICTIONS || previous in ['value', 'inverse']
+		|| token.toLowerCase() in KEYWORDS) {
+		continue
+	    }
+	    if (token.startsWith('<') && !labels) {
+		def iri = token.substring(1, token.length() - 1)
+		if (iri != OWL_THING && iri != OWL_NOTHING && !infos.containsKey(iri)) {
+		    return false
+		}
+	    } else if (token.startsWith("'") && labels) {
+		if (!names.containsKey(token.substring(1, token.length() - 1).toLowerCase())) {
+		    return false
+		}
+	    }
+	}
+	return true
+    }
+
+    // Same result as RequestManager.runQuery for a named class, null when the
+    // query needs the reasoner
+    def runQuery(String query, String type, boolean direct, boolean labels, boolean axioms) {
+	if (query == null || axioms) {
+	    return null
+	}
+	def iri = resolve(query, labels)
+	if (iri == null) {
+	    return null
+	}
+	def classes = new LinkedHashSet()
+	switch (type.toLowerCase()) {
+	    case "superclass": classes.addAll(getSuperClasses(iri, direct)); break;
+	    case "subclass": classes.addAll(getSubClasses(iri, direct)); break;
+	    case "equivalent": classes.addAll(getEquivalentClasses(iri)); break;
+	    case "supeq":
+		classes.addAll(getSuperClasses(iri, direct))
+		classes.addAll(getEquivalentClasses(iri))
+		break;
+	    case "realize": return null
+	    default:
+		classes.addAll(getSubClasses(iri, direct))
+		classes.addAll(getEquivalentClasses(iri))
+		break;
+	}
+	classes.remove(OWL_THING)
+	classes.remove(OWL_NOTHING)
+	def result = classes.collect { infos[it] }.findAll { it != null && !it.deprecated }
+	return result.sort { x, y -> x["label"].compareTo(y["label"]) }
+    }
+}
@@ -15,4 +15,16 @@ class Util {
         return params
     }
   }
+
+  // Answers 503 when the ontology of a query is still loading, with lazy
+  // loading the client is expected to retry
+  public static boolean respondLoading(def response, def managers, String ontology) {
+    if (ontology == null || !managers.isLoading(ontology)) {
+      return false
+    }
+    response.setStatus(503)
+    response.contentType = 'application/json'
+    response.getWriter().print(new JsonBuilder([ 'status': 'loading', 'message': "Ontology $ontology is loading, please retry later." ]).toString())
+    return true
+  }
 }
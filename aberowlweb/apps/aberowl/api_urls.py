@@ -30,6 +30,12 @@ urlpatterns = [
          api_views.GetOntologyClassView.as_view(), name='api-ontology_class_details'),
     path('ontology/<str:acronym>/root/<path:class_iri>/',
          api_views.FindOntologyRootClassView.as_view(), name='api-ontology_class_root'),
+    path('queues/',
+         api_views.QueueMetricsAPIView.as_view(), name='api-queue_metrics'),
+    path('servers/',
+         api_views.OntologyServersAPIView.as_view(), name='api-ontology_servers'),
+    path('servers/<str:acronym>/',
+         api_views.OntologyReadinessAPIView.as_view(), name='api-ontology_readiness'),
     path('instance/',
          api_views.ListInstanceAPIView.as_view(), name='api-instance_list'),
 ]
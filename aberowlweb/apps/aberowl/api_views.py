@@ -4,7 +4,7 @@ import re
 import requests
 from django.conf import settings
 from django.core.paginator import Paginator
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.http import HttpResponseNotFound
 from elasticsearch import Elasticsearch
 from expiringdict import ExpiringDict
@@ -16,6 +16,10 @@ from rest_framework.views import APIView
 from aberowl.ont_server_request_processor import OntServerRequestProcessor
 from aberowl.models import Ontology
 from aberowl.serializers import OntologySerializer
+from aberowl.search_query import SearchQueryBuilder
+from aberowl.queue_metrics import get_queue_metrics
+from aberowl import ontapi_registry
+from aberowlweb.celery import app
 
 logger = logging.getLogger(__name__)
 
@@ -60,8 +64,10 @@ def make_request(url):
     return []
 
 
-def search(indexName, query_data):
+def search(indexName, query_data, routing=None):
     try:
+        if routing is not None:
+            return es.search(index=indexName, body=query_data, routing=routing, request_timeout=15)
         res = es.search(index=indexName, body=query_data, request_timeout=15)
         return res
     except Exception as e:
@@ -92,15 +98,10 @@ class FindClassByMethodStartWithAPIView(APIView):
                 {'status': 'error',
                  'message': 'ontology is required'})
         try:
-            query_list = [
-                {'match': {'ontology': ontology}},
-                {'match_bool_prefix': {'label': query.lower()}}
-            ]
-            docs = {
-                'query': {'bool': {'must': query_list, 'filter': {'term': {'deprecated': False}}}},
-                '_source': {'excludes': ['embedding_vector', ]}
-            }
-            result = search(ELASTIC_CLASS_INDEX_NAME, docs)
+            builder = SearchQueryBuilder()
+            builder.must({'match_bool_prefix': {'label': query.lower()}})
+            builder.filter_ontology(ontology).exclude_deprecated()
+            result = search(ELASTIC_CLASS_INDEX_NAME, builder.build(), routing=builder.routing)
             data = []
             for hit in result['hits']['hits']:
                 item = hit['_source']
@@ -122,30 +123,21 @@ class FindClassAPIView(APIView):
             return Response(
                 {'status': 'error',
                  'message': 'Please provide query parameter!'})
-        should = [
-            {'match': {'oboid': {'query': query, 'boost': 150}}},
-            {'match': {'label': {'query': query, 'boost': 100}}},
-            {'match': {'synonym': {'query': query, 'boost': 50}}},
-            {'match': {'definition': {'query': query, 'boost': 30}}},
-        ]
-        es_query = None
+        builder = SearchQueryBuilder(size=100)
+        builder.should({'match': {'oboid': {'query': query, 'boost': 150}}})
+        builder.should({'match': {'label': {'query': query, 'boost': 100}}})
+        builder.should({'match': {'synonym': {'query': query, 'boost': 50}}})
+        builder.should({'match': {'definition': {'query': query, 'boost': 30}}})
         if ontology is not None:
-            ontology = {'match': {'ontology': {'query': ontology}}}
-            es_query = {'bool': {'should': should, 'must': ontology, 'filter': {'term': {'deprecated': False}}}}
+            builder.filter_ontology(ontology)
         else:
-            should.append({'terms': {'ontology': query.lower().split(), 'boost': 150}})
-            es_query = {'bool': {'should': should, 'filter': {'term': {'deprecated': False}}}}
+            builder.should({'terms': {'ontology': query.lower().split(), 'boost': 150}})
+        builder.exclude_deprecated()
+        f_query = builder.build()
 
-        f_query = {
-            'query': es_query,
-            '_source': {'excludes': ['embedding_vector', ]},
-            'from': 0,
-            'size': 100}
-
-        print(ontology, query)
         logger.info("Executing query:" + str(f_query))
 
-        result = search(ELASTIC_CLASS_INDEX_NAME, f_query)
+        result = search(ELASTIC_CLASS_INDEX_NAME, f_query, routing=builder.routing)
         # data = defaultdict(list)
         # for hit in result['hits']['hits']:
         #     item = hit['_source']
@@ -183,42 +175,28 @@ class MostSimilarAPIView(APIView):
                  'message': 'ontology is required'})
         try:
             size = int(size)
-            query_list = [
-                {'term': {'ontology': ontology}},
-                {'term': {'class': cls}}
-            ]
-            docs = {
-                'query': {'bool': {'must': query_list}},
-            }
-            result = search(ELASTIC_CLASS_INDEX_NAME, docs)
+            builder = SearchQueryBuilder(size=1)
+            builder.filter_ontology(ontology).filter_term('class', cls)
+            builder.source(includes=['embedding_vector', ])
+            result = search(ELASTIC_CLASS_INDEX_NAME, builder.build(), routing=builder.routing)
             data = result['hits']['hits']
             if len(data) == 0:
                 return Response({'status': 'error', 'message': 'not found'})
             obj = data[0]['_source']
             encoded_vector = obj['embedding_vector']
-            query = {
-                "query": {
-                    "function_score": {
-                        "query": {"term": {"ontology": ontology}},
-                        "boost_mode": "replace",
-                        "script_score": {
-                            "script": {
-                                "inline": "binary_vector_score",
-                                "lang": "knn",
-                                "params": {
-                                    "cosine": True,
-                                    "field": "embedding_vector",
-                                    "encoded_vector": encoded_vector
-                                }
-                            }
-                        }
-                    }
-                },
-                "_source": {"excludes": ["embedding_vector", ]},
-                "size": size
-            }
-
-            result = search(ELASTIC_CLASS_INDEX_NAME, query)
+            builder = SearchQueryBuilder(size=size)
+            builder.filter_ontology(ontology)
+            builder.script_score({
+                "inline": "binary_vector_score",
+                "lang": "knn",
+                "params": {
+                    "cosine": True,
+                    "field": "embedding_vector",
+                    "encoded_vector": encoded_vector
+                }
+            })
+
+            result = search(ELASTIC_CLASS_INDEX_NAME, builder.build(), routing=builder.routing)
             data = []
             for hit in result['hits']['hits']:
                 item = hit['_source']
@@ -252,7 +230,8 @@ class BackendAPIView(APIView):
                 queryset = Ontology.objects.filter(acronym=ontology)
                 if queryset.exists():
                     ontology = queryset.get()
-                    if ontology.nb_servers:
+                    if ontology.is_live():
+                        ontapi_registry.record_access(ontology.acronym)
                         url = ontology.get_api_url() + script + '?' + query_string
                         r = requests.get(url)
                         result = r.json()
@@ -272,8 +251,7 @@ class BackendAPIView(APIView):
                     result['total'] = page_cache.get(pages_key).count
                     return Response(result)
                 else:
-                    queryset = Ontology.objects.filter(nb_servers__gt=0)
-                    if queryset.exists():
+                    if Ontology.filter_live(Ontology.objects.all()).exists():
                         url = ABEROWL_API_URL + script + '?' + query_string
                         r = requests.get(url)
                         result = r.json()
@@ -285,8 +263,7 @@ class BackendAPIView(APIView):
                     else:
                         raise Exception('API server is down!')
             else:
-                queryset = Ontology.objects.filter(nb_servers__gt=0)
-                if queryset.exists():
+                if Ontology.filter_live(Ontology.objects.all()).exists():
                     url = ABEROWL_API_URL + script + '?' + query_string
                     r = requests.get(url)
                     result = r.json()
@@ -310,15 +287,10 @@ class FindOntologyAPIView(APIView):
                  'message': 'query field is required'})
 
         fields = ['name', 'ontology', 'description']
-        query_list = []
+        builder = SearchQueryBuilder()
         for field in fields:
-            q = {'match': {field: {'query': query}}}
-            query_list.append(q)
-        omap = {
-            'query': {'bool': {'should': query_list}},
-            '_source': {'excludes': ['embedding_vector', ]}
-        }
-        result = search(ELASTIC_ONTOLOGY_INDEX_NAME, omap)
+            builder.should({'match': {field: {'query': query}}})
+        result = search(ELASTIC_ONTOLOGY_INDEX_NAME, builder.build())
         data = []
         for hit in result['hits']['hits']:
             item = hit['_source']
@@ -407,7 +379,11 @@ class DLQueryAPIView(APIView):
             return Response({'status': 'error', 'message': 'type is required'})
 
         try:
-            if ontology is None and offset is not None:
+            if ontology is None and request.GET.get('stream') == 'true':
+                return StreamingHttpResponse(
+                    ont_server.stream_dl_query(query, query_type, axioms, labels, direct),
+                    content_type='application/x-ndjson')
+            elif ontology is None and offset is not None:
                 pages_key = query + ":" + query_type
                 if page_cache.get(pages_key):
                     result = {'status': 'ok'}
@@ -417,9 +393,12 @@ class DLQueryAPIView(APIView):
 
                 else:
                     result = ont_server.execute_dl_query(query, query_type, None, axioms, labels, direct)
-                    page_cache[pages_key] = Paginator(result['result'], DEFUALT_PAGE_SIZE)
-                    result['result'] = page_cache.get(pages_key).page(offset).object_list
-                    result['total'] = page_cache.get(pages_key).count
+                    paginator = Paginator(result['result'], DEFUALT_PAGE_SIZE)
+                    # Partial results are not cached, the next page queries again
+                    if result['complete']:
+                        page_cache[pages_key] = paginator
+                    result['result'] = paginator.page(offset).object_list
+                    result['total'] = paginator.count
                     result['status'] = 'ok'
                     return Response(result)
             else:
@@ -447,6 +426,33 @@ class DLQueryLogsDownloadAPIView(APIView):
             return HttpResponseNotFound()
 
 
+class QueueMetricsAPIView(APIView):
+
+    def get(self, request, format=None):
+        try:
+            return Response({'status': 'ok', 'result': get_queue_metrics(app)})
+        except Exception as e:
+            return Response({'status': 'exception', 'message': str(e)})
+
+
+class OntologyServersAPIView(APIView):
+
+    def get(self, request, format=None):
+        status = ontapi_registry.get_status()
+        if status is None:
+            return Response({'status': 'error', 'message': 'The ontology API supervisor is not running'})
+        return Response({'status': 'ok', 'result': status})
+
+
+class OntologyReadinessAPIView(APIView):
+
+    def get(self, request, acronym, format=None):
+        readiness = ontapi_registry.get_readiness(acronym)
+        if readiness is None:
+            return Response({'status': 'error', 'message': 'Ontology %s is not served' % (acronym,)})
+        return Response({'status': 'ok', 'result': readiness})
+
+
 class ListOntologyObjectPropertiesView(APIView):
     def get(self, request, acronym):
         try:
@@ -488,7 +494,7 @@ class GetOntologyClassView(APIView):
             queryset = Ontology.objects.filter(acronym=ontology)
             if queryset.exists():
                 ontology = queryset.get()
-                if ontology.nb_servers:
+                if ontology.is_live():
                     result = ont_server.execute_dl_query('<' + iri + '>', 'equivalent', ontology.acronym, 'false', None,
                                                          'true')
                     result['status'] = 'ok'
@@ -6,3 +6,7 @@ from django.apps import AppConfig
 
 class AberowlConfig(AppConfig):
     name = 'aberowl'
+
+    def ready(self):
+        # Connects the celery signal handlers of the queue metrics
+        from aberowl import queue_metrics  # noqa: F401
@@ -0,0 +1,85 @@
+# Streaming downloads of ontology files
+#
+# Files are streamed to a partial file while their md5 checksum is computed
+# in the same pass. Conditional requests are sent with the ETag and
+# Last-Modified values of the previous download, and an interrupted download
+# is resumed with a Range request when the server still has the same file.
+
+import hashlib
+import os
+
+import requests
+from django.conf import settings
+
+DOWNLOAD_TIMEOUT = getattr(settings, 'DOWNLOAD_TIMEOUT', 120)
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+NOT_MODIFIED = 'not_modified'
+DOWNLOADED = 'downloaded'
+
+
+def get_partial_filepath(filepath):
+    return filepath + '.download'
+
+
+def get_resume_validator(response):
+    # If-Range only accepts strong entity tags
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def download_file(url, filepath, etag=None, last_modified=None, params=None, timeout=DOWNLOAD_TIMEOUT):
+    partial_filepath = get_partial_filepath(filepath)
+    validator_filepath = partial_filepath + '.validator'
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    resume_validator = None
+    if os.path.exists(partial_filepath) and os.path.exists(validator_filepath):
+        with open(validator_filepath) as f:
+            resume_validator = f.read().strip()
+    if resume_validator:
+        headers['Range'] = 'bytes=%d-' % os.path.getsize(partial_filepath)
+        headers['If-Range'] = resume_validator
+
+    md5 = hashlib.md5()
+    with requests.get(url, params=params, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 304:
+            return {'status': NOT_MODIFIED, 'etag': etag, 'last_modified': last_modified}
+        r.raise_for_status()
+
+        mode = 'wb'
+        if r.status_code == 206 and resume_validator:
+            mode = 'ab'
+            with open(partial_filepath, 'rb') as f:
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+                    md5.update(chunk)
+
+        validator = get_resume_validator(r)
+        if validator:
+            with open(validator_filepath, 'w') as f:
+                f.write(validator)
+        elif os.path.exists(validator_filepath):
+            os.remove(validator_filepath)
+
+        with open(partial_filepath, mode) as f:
+            for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                md5.update(chunk)
+
+        result = {
+            'status': DOWNLOADED,
+            'md5sum': md5.hexdigest(),
+            'etag': r.headers.get('ETag'),
+            'last_modified': r.headers.get('Last-Modified'),
+        }
+
+    os.replace(partial_filepath, filepath)
+    if os.path.exists(validator_filepath):
+        os.remove(validator_filepath)
+    return result
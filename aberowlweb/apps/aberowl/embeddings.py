@@ -0,0 +1,134 @@
+# Cache of the axiom corpora and word2vec embeddings of the ontologies
+#
+# Artifacts are keyed by the md5 checksum of the ontology file and the
+# version of the corpus script; embeddings are also keyed by the training
+# parameters. An unchanged ontology is never trained twice with the same
+# parameters, changing EMBEDDINGS_SIZE or EMBEDDINGS_ITER trains new
+# embeddings next to the old ones.
+
+from subprocess import Popen, DEVNULL
+import hashlib
+import json
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from aberowl.file_store import link_file
+
+EMBEDDINGS_CACHE_ROOT = getattr(settings, 'EMBEDDINGS_CACHE_ROOT', settings.MEDIA_ROOT + 'embeddings/')
+EMBEDDINGS_SIZE = getattr(settings, 'EMBEDDINGS_SIZE', 256)
+EMBEDDINGS_ITER = getattr(settings, 'EMBEDDINGS_ITER', 50)
+EMBEDDINGS_MIN_COUNT = getattr(settings, 'EMBEDDINGS_MIN_COUNT', 1)
+EMBEDDINGS_WINDOW = getattr(settings, 'EMBEDDINGS_WINDOW', 5)
+# Threads of one word2vec process, they do not change the cache key
+EMBEDDINGS_THREADS = getattr(settings, 'EMBEDDINGS_THREADS', 4)
+# 'word2vec' trains from an axiom corpus file, 'gensim' trains in process
+# from the axioms streamed by Ingest.groovy without caching a corpus
+EMBEDDINGS_TRAINER = getattr(settings, 'EMBEDDINGS_TRAINER', 'word2vec')
+
+
+def get_training_parameters():
+    return {
+        'size': EMBEDDINGS_SIZE,
+        'iter': EMBEDDINGS_ITER,
+        'min-count': EMBEDDINGS_MIN_COUNT,
+        'window': EMBEDDINGS_WINDOW,
+    }
+
+
+def get_parameters_key(parameters):
+    if EMBEDDINGS_TRAINER != 'word2vec':
+        parameters = dict(parameters, trainer=EMBEDDINGS_TRAINER)
+    data = json.dumps(parameters, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def get_cache_dir(checksum):
+    return EMBEDDINGS_CACHE_ROOT + checksum[:2] + '/' + checksum + '/'
+
+
+def get_corpus_filepath(checksum, corpus_version):
+    return get_cache_dir(checksum) + corpus_version + '.axms'
+
+
+def get_embeddings_filepath(checksum, corpus_version, parameters=None):
+    if parameters is None:
+        parameters = get_training_parameters()
+    return get_cache_dir(checksum) + corpus_version + '-' + get_parameters_key(parameters) + '.embs'
+
+
+def train(corpus_filepath, embeddings_filepath, parameters=None, threads=EMBEDDINGS_THREADS):
+    # Embeddings are written to a temporary file so that a failed run is
+    # never cached
+    if parameters is None:
+        parameters = get_training_parameters()
+    tmp_filepath = embeddings_filepath + '.tmp'
+    args = ['word2vec', '-train', corpus_filepath, '-output', tmp_filepath, '-threads', str(threads)]
+    for name, value in sorted(parameters.items()):
+        args += ['-' + name, str(value)]
+    p = Popen(args, stderr=DEVNULL, stdout=DEVNULL)
+    if p.wait() != 0 or not os.path.exists(tmp_filepath):
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        return False
+    os.replace(tmp_filepath, embeddings_filepath)
+    return True
+
+
+def get_word2vec():
+    try:
+        from gensim.models import Word2Vec
+    except ImportError:
+        raise ImproperlyConfigured('EMBEDDINGS_TRAINER=gensim requires the gensim package')
+    return Word2Vec
+
+
+def has_gensim():
+    try:
+        get_word2vec()
+    except ImproperlyConfigured:
+        return False
+    return True
+
+
+def train_stream(lines, embeddings_filepath, check=None, parameters=None, threads=EMBEDDINGS_THREADS):
+    # Trains with gensim from streamed axiom sentences. Training needs
+    # several passes over the corpus, the sentences are spooled to a
+    # temporary corpus file next to the embeddings, removed after training,
+    # instead of being held in memory. check tells once the stream ended
+    # whether its sentences can be trained.
+    Word2Vec = get_word2vec()
+    if parameters is None:
+        parameters = get_training_parameters()
+    os.makedirs(os.path.dirname(embeddings_filepath), exist_ok=True)
+    corpus_filepath = embeddings_filepath + '.axms.tmp'
+    try:
+        sentences = 0
+        with open(corpus_filepath, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line + '\n')
+                sentences += 1
+        if not sentences or (check is not None and not check()):
+            return False
+        # alpha is the default of word2vec with cbow
+        model = Word2Vec(
+            corpus_file=corpus_filepath, vector_size=parameters['size'], epochs=parameters['iter'],
+            min_count=parameters['min-count'], window=parameters['window'],
+            alpha=0.05, workers=threads)
+    finally:
+        if os.path.exists(corpus_filepath):
+            os.remove(corpus_filepath)
+    tmp_filepath = embeddings_filepath + '.tmp'
+    model.wv.save_word2vec_format(tmp_filepath, binary=False)
+    os.replace(tmp_filepath, embeddings_filepath)
+    return True
+
+
+def link_embeddings(checksum, corpus_version, filepath):
+    # Links the cached embeddings to filepath.embs where IndexElastic reads them
+    embeddings_filepath = get_embeddings_filepath(checksum, corpus_version)
+    if not os.path.exists(embeddings_filepath):
+        return False
+    link_file(embeddings_filepath, filepath + '.embs')
+    return True
@@ -0,0 +1,161 @@
+# Content-addressed store of ontology files
+#
+# Every ontology file is stored once under its md5 checksum in
+# FILE_STORE_ROOT. Submission folders and the latest folder only contain hard
+# links to the stored blob (symbolic links when the store is on another
+# filesystem), so identical content is never copied. Links are replaced
+# atomically and blobs are read-only; files must be replaced, never written
+# in place.
+#
+# With FILE_STORE_COMPRESSION set to 'gzip' or 'zstd' blobs are stored
+# compressed and linked with the .gz or .zst suffix next to the file name.
+# find_file and open_file resolve a file name to its stored form, so readers
+# use the plain file name whatever the compression.
+
+import gzip
+import hashlib
+import os
+import shutil
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+FILE_STORE_ROOT = getattr(settings, 'FILE_STORE_ROOT', settings.MEDIA_ROOT + 'store/')
+FILE_STORE_COMPRESSION = getattr(settings, 'FILE_STORE_COMPRESSION', '')
+CHUNK_SIZE = 1024 * 1024
+
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+SUFFIX_ENCODINGS = {suffix: encoding for encoding, suffix in COMPRESSION_SUFFIXES.items()}
+
+
+def get_blob_filepath(checksum):
+    return FILE_STORE_ROOT + checksum[:2] + '/' + checksum
+
+
+def find_file(filepath):
+    # Path of the stored form of filepath, raw or compressed, None if missing
+    for suffix in ('',) + tuple(SUFFIX_ENCODINGS):
+        if os.path.isfile(filepath + suffix):
+            return filepath + suffix
+    return None
+
+
+def get_encoding(stored_filepath):
+    # Content encoding of a path returned by find_file, '' when raw
+    return SUFFIX_ENCODINGS.get(os.path.splitext(stored_filepath)[1], '')
+
+
+def get_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImproperlyConfigured('zstd compression requires the zstandard package')
+    return zstandard
+
+
+def open_file(filepath):
+    # Opens the stored form of filepath for reading its uncompressed content
+    stored_filepath = find_file(filepath)
+    if stored_filepath is None:
+        raise FileNotFoundError(filepath)
+    encoding = get_encoding(stored_filepath)
+    if encoding == 'gzip':
+        return gzip.open(stored_filepath, 'rb')
+    if encoding == 'zstd':
+        return get_zstandard().ZstdDecompressor().stream_reader(open(stored_filepath, 'rb'), closefd=True)
+    return open(stored_filepath, 'rb')
+
+
+def find_blob(checksum):
+    return find_file(get_blob_filepath(checksum))
+
+
+def has_blob(checksum):
+    return find_blob(checksum) is not None
+
+
+def file_checksum(filepath):
+    md5 = hashlib.md5()
+    with open_file(filepath) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def compress_file(filepath, compression):
+    # Writes filepath with the suffix of the compression and removes it
+    compressed_filepath = filepath + COMPRESSION_SUFFIXES[compression]
+    tmp_filepath = compressed_filepath + '.tmp'
+    with open(filepath, 'rb') as f:
+        if compression == 'zstd':
+            with open(tmp_filepath, 'wb') as out:
+                get_zstandard().ZstdCompressor().copy_stream(f, out)
+        else:
+            with gzip.open(tmp_filepath, 'wb') as out:
+                shutil.copyfileobj(f, out, CHUNK_SIZE)
+    os.replace(tmp_filepath, compressed_filepath)
+    os.remove(filepath)
+    return compressed_filepath
+
+
+def add_file(filepath, checksum=None):
+    # Moves the file into the store, or removes it if the content is stored
+    if checksum is None:
+        checksum = file_checksum(filepath)
+    blob_filepath = get_blob_filepath(checksum)
+    if has_blob(checksum):
+        os.remove(filepath)
+        return checksum
+    os.makedirs(os.path.dirname(blob_filepath), exist_ok=True)
+    if FILE_STORE_COMPRESSION:
+        compressed_filepath = compress_file(filepath, FILE_STORE_COMPRESSION)
+        blob_filepath += COMPRESSION_SUFFIXES[FILE_STORE_COMPRESSION]
+        shutil.move(compressed_filepath, blob_filepath)
+    else:
+        shutil.move(filepath, blob_filepath)
+    os.chmod(blob_filepath, 0o444)
+    return checksum
+
+
+def compress_blob(checksum):
+    # Replaces a raw blob by its compressed form, files linked to the raw
+    # blob keep their content until they are linked again
+    blob_filepath = get_blob_filepath(checksum)
+    if not FILE_STORE_COMPRESSION or not os.path.isfile(blob_filepath):
+        return False
+    os.chmod(compress_file(blob_filepath, FILE_STORE_COMPRESSION), 0o444)
+    return True
+
+
+def link_file(source_filepath, filepath):
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    link_filepath = filepath + '.link'
+    if os.path.lexists(link_filepath):
+        os.remove(link_filepath)
+    try:
+        os.link(source_filepath, link_filepath)
+    except OSError:
+        os.symlink(os.path.abspath(source_filepath), link_filepath)
+    os.replace(link_filepath, filepath)
+
+
+def link_blob(checksum, filepath):
+    blob_filepath = find_blob(checksum)
+    encoding = get_encoding(blob_filepath)
+    suffix = COMPRESSION_SUFFIXES.get(encoding, '')
+    link_file(blob_filepath, filepath + suffix)
+    # Other forms of the file would be found instead of the new one
+    for other_suffix in ('',) + tuple(SUFFIX_ENCODINGS):
+        if other_suffix != suffix and os.path.lexists(filepath + other_suffix):
+            os.remove(filepath + other_suffix)
+    return filepath + suffix
+
+
+def store_file(filepath, links, checksum=None):
+    checksum = add_file(filepath, checksum)
+    for link in links:
+        link_blob(checksum, link)
+    return checksum
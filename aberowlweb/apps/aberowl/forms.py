@@ -1,15 +1,11 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Max
-from aberowl.tasks import classify_ontology, reload_ontology, index_submission
+from aberowl.tasks import validate_submission, index_submission
 from aberowl.models import Ontology, Submission
 import shutil
-import os
-from django.conf import settings
-
-ABEROWL_SERVER_URL = getattr(
-    settings, 'ABEROWL_SERVER_URL', 'http://localhost/')
 
 
 class OntologyForm(forms.ModelForm):
@@ -52,15 +48,6 @@ class SubmissionForm(forms.ModelForm):
         ontology_file = self.cleaned_data['ontology_file']
         if self.instance.pk is None and ontology_file is None:
             raise ValidationError('Required when creating a submission!')
-        if ontology_file is not None:
-            filepath = ontology_file.temporary_file_path()
-            result = classify_ontology.delay(filepath)
-            result = result.get()
-            if result['classifiable']:
-                self.metrics = result
-            else:
-                raise forms.ValidationError('Unloadable ontology file')
-
         return ontology_file
 
     def save(self):
@@ -74,27 +61,18 @@ class SubmissionForm(forms.ModelForm):
             self.instance.date_created = timezone.now()
             self.instance.date_released = timezone.now()
         ontology_file = self.cleaned_data['ontology_file']
+        # Restored when the new file of a valid submission is not loadable
+        previous_status = self.instance.status
         if ontology_file is not None:
-            shutil.move(
-                ontology_file.temporary_file_path(),
-                self.instance.get_filepath())
-            os.chmod(self.instance.get_filepath(), 0o664)
-            shutil.copy(
-                self.instance.get_filepath(),
-                self.instance.get_filepath('latest'))
-            self.instance.nb_inconsistent = self.metrics['incon']
-            self.instance.status = self.metrics['status']
-            self.instance.classifiable = True
-            self.instance.nb_classes = self.metrics['nb_classes']
-            self.instance.nb_properties = self.metrics['nb_properties']
-            self.instance.nb_individuals = self.metrics['nb_individuals']
-            self.instance.max_depth = self.metrics['max_depth']
-            self.instance.max_children = self.metrics['max_children']
-            self.instance.avg_children = self.metrics['avg_children']
-            self.ontology.status = self.metrics['status']
-            self.ontology.save()
-            ontIRI = ABEROWL_SERVER_URL + self.instance.get_filepath()
-            reload_ontology.delay(self.ontology.acronym, ontIRI)
+            self.instance.status = Submission.VALIDATING
         self.instance.save()
-        index_submission.delay(self.ontology.pk, self.instance.pk)
+        submission_pk = self.instance.pk
+        if ontology_file is not None:
+            # The file is classified by validate_submission which reloads
+            # and indexes the ontology once it is loadable
+            shutil.move(ontology_file.temporary_file_path(), self.instance.get_upload_filepath())
+            transaction.on_commit(lambda: validate_submission.delay(submission_pk, previous_status))
+        else:
+            ontology_pk = self.ontology.pk
+            transaction.on_commit(lambda: index_submission.delay(ontology_pk, submission_pk))
         return self.instance
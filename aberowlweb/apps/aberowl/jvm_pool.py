@@ -0,0 +1,232 @@
+# Pool of long-lived JVM workers running the groovy scripts
+#
+# Starting groovy for every task pays script compilation, @Grab resolution
+# and JVM warm-up before any ontology is loaded. Workers started with
+# scripts/Worker.groovy keep the compiled scripts and run one job at a time,
+# exchanging one JSON line per job on stdin/stdout. A worker is pinged before
+# it gets a job and is restarted after JVM_WORKER_MAX_JOBS jobs or when its
+# resident memory exceeds JVM_WORKER_MAX_MEMORY_MB. Jobs run in a new groovy
+# process when the pool is disabled or no worker can be started.
+
+from subprocess import Popen, PIPE, DEVNULL
+import atexit
+import json
+import os
+import select
+import threading
+import time
+
+from django.conf import settings
+
+JVM_WORKER_POOL_SIZE = getattr(settings, 'JVM_WORKER_POOL_SIZE', 1)
+JVM_WORKER_MAX_JOBS = getattr(settings, 'JVM_WORKER_MAX_JOBS', 50)
+JVM_WORKER_MAX_MEMORY_MB = getattr(settings, 'JVM_WORKER_MAX_MEMORY_MB', 8192)
+JVM_WORKER_JAVA_OPTS = getattr(settings, 'JVM_WORKER_JAVA_OPTS', '')
+JVM_WORKER_START_TIMEOUT = getattr(settings, 'JVM_WORKER_START_TIMEOUT', 300)
+JVM_WORKER_PING_TIMEOUT = getattr(settings, 'JVM_WORKER_PING_TIMEOUT', 30)
+JVM_WORKER_COMMAND = ['groovy', 'Worker.groovy']
+
+SCRIPTS_DIR = 'scripts/'
+
+
+class JVMWorkerError(Exception):
+    pass
+
+
+def run_cold(script, args, stdin=None, timeout=None):
+    p = Popen(
+        ['groovy', script] + list(args), cwd=SCRIPTS_DIR,
+        stdin=PIPE, stdout=PIPE, stderr=DEVNULL)
+    try:
+        output, _ = p.communicate((stdin or '').encode('utf-8'), timeout=timeout)
+    except Exception:
+        p.kill()
+        p.wait()
+        return {'returncode': -1, 'output': ''}
+    return {'returncode': p.returncode, 'output': output.decode('utf-8')}
+
+
+def stream_cold(script, args, command=None):
+    # Runs the script in a new groovy process and yields its output lines
+    # while it runs, the output is never held in memory as a whole
+    p = Popen(
+        (command or ['groovy']) + [script] + list(args), cwd=SCRIPTS_DIR,
+        stdout=PIPE, stderr=DEVNULL)
+    try:
+        for line in p.stdout:
+            yield line.decode('utf-8').rstrip('\n')
+        if p.wait() != 0:
+            raise JVMWorkerError('%s exited with code %d' % (script, p.returncode))
+    finally:
+        if p.poll() is None:
+            p.kill()
+            p.wait()
+        p.stdout.close()
+
+
+class JVMWorker:
+
+    def __init__(self, command=None):
+        env = dict(os.environ)
+        if JVM_WORKER_JAVA_OPTS:
+            env['JAVA_OPTS'] = JVM_WORKER_JAVA_OPTS
+        self.process = Popen(
+            command or JVM_WORKER_COMMAND, cwd=SCRIPTS_DIR, env=env,
+            stdin=PIPE, stdout=PIPE)
+        self.buffer = b''
+        self.nb_jobs = 0
+        try:
+            if not self.read(JVM_WORKER_START_TIMEOUT).get('ready'):
+                raise JVMWorkerError('Worker did not start')
+        except JVMWorkerError:
+            self.stop()
+            raise
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def send(self, message):
+        try:
+            self.process.stdin.write((json.dumps(message) + '\n').encode('utf-8'))
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError) as e:
+            raise JVMWorkerError('Worker is not running: %s' % e)
+
+    def read(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self.buffer:
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                raise JVMWorkerError('Worker timed out')
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise JVMWorkerError('Worker exited with code %s' % self.process.poll())
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return json.loads(line.decode('utf-8'))
+
+    def ping(self):
+        try:
+            self.send({'ping': True})
+            return self.read(JVM_WORKER_PING_TIMEOUT).get('pong', False)
+        except (JVMWorkerError, ValueError):
+            return False
+
+    def memory_usage(self):
+        # Resident memory in MB, None when /proc is not available
+        try:
+            with open('/proc/%d/status' % self.process.pid) as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) // 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def needs_restart(self):
+        if not self.is_alive() or self.nb_jobs >= JVM_WORKER_MAX_JOBS:
+            return True
+        memory = self.memory_usage()
+        return memory is not None and memory > JVM_WORKER_MAX_MEMORY_MB
+
+    def run(self, script, args, stdin=None, timeout=None):
+        self.send({'script': script, 'args': list(args), 'stdin': stdin or ''})
+        result = self.read(timeout)
+        self.nb_jobs += 1
+        return {'returncode': result['status'], 'output': result['output']}
+
+    def stop(self):
+        if self.is_alive():
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=10)
+            except Exception:
+                self.process.kill()
+                self.process.wait()
+
+
+class JVMWorkerPool:
+
+    def __init__(self, size=JVM_WORKER_POOL_SIZE, command=None):
+        self.size = size
+        self.command = command
+        self.idle = []
+        self.nb_workers = 0
+        self.condition = threading.Condition()
+
+    def resize(self, size):
+        # The pool only grows and stays disabled when its size is 0
+        with self.condition:
+            if self.size > 0:
+                self.size = max(self.size, size)
+            self.condition.notify_all()
+
+    def acquire(self):
+        with self.condition:
+            while not self.idle and self.nb_workers >= self.size:
+                self.condition.wait()
+            worker = self.idle.pop() if self.idle else None
+            if worker is None:
+                self.nb_workers += 1
+        if worker is not None and worker.is_alive() and worker.ping():
+            return worker
+        if worker is not None:
+            print('Restarting unresponsive JVM worker', worker.process.pid)
+            worker.stop()
+        try:
+            return JVMWorker(self.command)
+        except (JVMWorkerError, OSError) as e:
+            self.discard()
+            raise JVMWorkerError('Unable to start JVM worker: %s' % e)
+
+    def release(self, worker):
+        if worker.needs_restart():
+            worker.stop()
+            self.discard()
+            return
+        with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def discard(self):
+        with self.condition:
+            self.nb_workers -= 1
+            self.condition.notify()
+
+    def run_script(self, script, args, stdin=None, timeout=None):
+        if self.size <= 0:
+            return run_cold(script, args, stdin, timeout)
+        try:
+            worker = self.acquire()
+        except JVMWorkerError as e:
+            print(e, '- running', script, 'in a new process')
+            return run_cold(script, args, stdin, timeout)
+        try:
+            return worker.run(script, args, stdin, timeout)
+        except JVMWorkerError as e:
+            # The job crashed or timed out, the worker is not reused
+            print('JVM worker failed running', script, ':', e)
+            worker.process.kill()
+            worker.process.wait()
+            return {'returncode': -1, 'output': ''}
+        finally:
+            self.release(worker)
+
+    def stop(self):
+        with self.condition:
+            workers, self.idle = self.idle, []
+        for worker in workers:
+            worker.stop()
+
+
+# One pool per process, celery prefork children start their own workers
+pool = JVMWorkerPool()
+atexit.register(pool.stop)
+
+
+def run_script(script, args, stdin=None, timeout=None):
+    return pool.run_script(script, args, stdin, timeout)
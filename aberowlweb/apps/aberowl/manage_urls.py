@@ -10,4 +10,6 @@ urlpatterns = [
          name='create_submission'),
     path('ontology/<int:onto_pk>/submission/edit/<int:pk>/', login_required(views.SubmissionUpdateView.as_view()),
          name='edit_submission'),
+    path('ontology/<int:onto_pk>/submission/status/<int:pk>/', login_required(views.SubmissionStatusView.as_view()),
+         name='submission_status'),
 ]
@@ -1,10 +1,12 @@
-from django.views.generic import CreateView, UpdateView, ListView
+from django.views.generic import CreateView, UpdateView, ListView, View
+from django.http import JsonResponse
 from django.urls import reverse
 from aberowl.models import Ontology, Submission
+from aberowl import ontapi_registry
 from aberowl.forms import OntologyForm, SubmissionForm
 from aberowlweb.mixins import FormRequestMixin, ActionMixin
 from django.shortcuts import get_object_or_404
-from aberowlweb.apps.aberowl.tasks import reload_ontology
+from aberowlweb.apps.aberowl.tasks import reload_ontology, get_submission_status
 from django.conf import settings
 from django.contrib import messages
 
@@ -23,6 +25,12 @@ class MyOntologyListView(ActionMixin, ListView):
         return self.request.user.created_ontologies.all().order_by(
             'acronym')
 
+    def get_context_data(self, *args, **kwargs):
+        context = super(MyOntologyListView, self).get_context_data(*args, **kwargs)
+        context['live_acronyms'] = ontapi_registry.get_live_routes(
+            [ontology.acronym for ontology in context['object_list']])
+        return context
+
     def get_success_url(self):
         return reverse('list_ontology')
 
@@ -83,19 +91,42 @@ class OntologyMixin(object):
         return context
 
 
-class SubmissionCreateView(FormRequestMixin, OntologyMixin, CreateView):
-    model = Submission
-    form_class = SubmissionForm
-    template_name = 'aberowl/manage/edit_submission.html'
+class SubmissionSuccessMixin(object):
+    # Uploaded files are validated in the background, the submission page
+    # polls the status of the validation
+
+    def form_valid(self, form):
+        response = super(SubmissionSuccessMixin, self).form_valid(form)
+        if self.object.status == Submission.VALIDATING:
+            messages.info(
+                self.request,
+                'The ontology file of %s is being validated!' % (self.get_ontology().acronym,))
+        return response
 
     def get_success_url(self):
+        submission = getattr(self, 'object', None)
+        if submission is not None and submission.status == Submission.VALIDATING:
+            kwargs = {'onto_pk': self.get_ontology().pk, 'pk': submission.pk}
+            return reverse('edit_submission', kwargs=kwargs)
         return reverse('list_ontology')
 
 
-class SubmissionUpdateView(FormRequestMixin, OntologyMixin, UpdateView):
+class SubmissionCreateView(FormRequestMixin, OntologyMixin, SubmissionSuccessMixin, CreateView):
     model = Submission
     form_class = SubmissionForm
     template_name = 'aberowl/manage/edit_submission.html'
 
-    def get_success_url(self):
-        return reverse('list_ontology')
+
+class SubmissionUpdateView(FormRequestMixin, OntologyMixin, SubmissionSuccessMixin, UpdateView):
+    model = Submission
+    form_class = SubmissionForm
+    template_name = 'aberowl/manage/edit_submission.html'
+
+
+class SubmissionStatusView(OntologyMixin, View):
+
+    def get(self, request, *args, **kwargs):
+        submission = get_object_or_404(
+            Submission.objects.select_related('ontology'),
+            ontology=self.get_ontology(), pk=kwargs['pk'])
+        return JsonResponse(get_submission_status(submission))
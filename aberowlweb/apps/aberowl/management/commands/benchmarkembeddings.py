@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from aberowl import embeddings
+from aberowl.models import Ontology
+from aberowl.tasks import ingest_ontology, stream_axioms
+
+import os
+import resource
+import tempfile
+import time
+
+
+def get_max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+class Command(BaseCommand):
+    help = ('Trains the embeddings of ontologies from an axiom corpus file and from streamed axioms, '
+            'and reports time to embeddings and corpus disk use. The embeddings cache is not used.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('acronyms', nargs='+', type=str, help='ontology acronyms')
+        parser.add_argument('-t', '--threads', type=int, default=embeddings.EMBEDDINGS_THREADS,
+                            help='number of training threads', )
+
+    def run_file(self, filepath, tmpdir, threads):
+        start = time.time()
+        corpus_filepath = os.path.join(tmpdir, 'corpus.axms')
+        result = ingest_ontology(filepath, classify=False, axioms=True, axioms_filepath=corpus_filepath)
+        if not result['classifiable'] or not os.path.exists(corpus_filepath):
+            return None
+        corpus_size = os.path.getsize(corpus_filepath)
+        trained = embeddings.train(corpus_filepath, os.path.join(tmpdir, 'file.embs'), threads=threads)
+        os.remove(corpus_filepath)
+        return trained, time.time() - start, corpus_size
+
+    def run_stream(self, filepath, tmpdir, threads):
+        start = time.time()
+        result = {}
+        trained = embeddings.train_stream(
+            stream_axioms(filepath, result), os.path.join(tmpdir, 'stream.embs'),
+            check=lambda: result.get('classifiable'), threads=threads)
+        if not result.get('classifiable'):
+            return None
+        return trained, time.time() - start, 0
+
+    def handle(self, *args, **options):
+        for acronym in options['acronyms']:
+            ontology = Ontology.objects.filter(acronym=acronym).first()
+            submission = ontology.get_latest_submission() if ontology is not None else None
+            if submission is None:
+                raise CommandError('Ontology %s does not have any submission' % (acronym,))
+            filepath = os.path.abspath(submission.get_filepath(folder='latest'))
+            runs = [('file', self.run_file)]
+            if embeddings.has_gensim():
+                runs.append(('stream', self.run_stream))
+            else:
+                self.stdout.write('ontology=%s|mode=stream|skipped, gensim is not installed' % (acronym,))
+            for mode, run in runs:
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    result = run(filepath, tmpdir, options['threads'])
+                if result is None:
+                    self.stdout.write('ontology=%s|mode=%s|unloadable' % (acronym, mode))
+                    continue
+                trained, elapsed, corpus_size = result
+                self.stdout.write('ontology=%s|mode=%s|trained=%s|elapsed=%.1fs|corpus_mb=%.1f|max_rss_mb=%d' % (
+                    acronym, mode, trained, elapsed, corpus_size / (1024 * 1024), get_max_rss_mb()))
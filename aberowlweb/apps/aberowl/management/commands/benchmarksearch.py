@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from aberowl.api_views import es, search
+from aberowl.models import Ontology
+from aberowl.search_query import SearchQueryBuilder
+
+import time
+
+ELASTIC_CLASS_INDEX_NAME = getattr(settings, 'ELASTIC_CLASS_INDEX_NAME', 'aberowl_owlclass')
+
+
+def get_query_cache_stats():
+    stats = es.nodes.stats(metric='indices', index_metric='query_cache')
+    hits, misses = 0, 0
+    for node in stats['nodes'].values():
+        query_cache = node['indices']['query_cache']
+        hits += query_cache['hit_count']
+        misses += query_cache['miss_count']
+    return hits, misses
+
+
+class Command(BaseCommand):
+    help = 'Runs the class search queries repeatedly and reports latency and filter cache hit rate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', type=str, help='search terms')
+        parser.add_argument('-o', '--ontology', action='append', help='ontology acronym, can be repeated', )
+        parser.add_argument('-r', '--repeat', type=int, default=10, help='number of rounds', )
+
+    def handle(self, *args, **options):
+        ontologies = options['ontology']
+        if not ontologies:
+            ontologies = list(Ontology.objects.filter(
+                status=Ontology.CLASSIFIED).order_by('acronym').values_list('acronym', flat=True)[:10])
+
+        start_hits, start_misses = get_query_cache_stats()
+        nb_queries = 0
+        start = time.time()
+        for _ in range(options['repeat']):
+            for ontology in ontologies:
+                for query in options['queries']:
+                    builder = SearchQueryBuilder()
+                    builder.must({'match_bool_prefix': {'label': query.lower()}})
+                    builder.filter_ontology(ontology).exclude_deprecated()
+                    search(ELASTIC_CLASS_INDEX_NAME, builder.build(), routing=builder.routing)
+
+                    builder = SearchQueryBuilder(size=100)
+                    builder.should({'match': {'label': {'query': query, 'boost': 100}}})
+                    builder.filter_ontology(ontology).exclude_deprecated()
+                    search(ELASTIC_CLASS_INDEX_NAME, builder.build(), routing=builder.routing)
+                    nb_queries += 2
+        elapsed = time.time() - start
+
+        hits, misses = get_query_cache_stats()
+        hits, misses = hits - start_hits, misses - start_misses
+        lookups = hits + misses
+        hit_rate = 100.0 * hits / lookups if lookups else 0.0
+        self.stdout.write('queries=%d|elapsed=%.2fs|avg=%.1fms' % (
+            nb_queries, elapsed, 1000.0 * elapsed / max(nb_queries, 1)))
+        self.stdout.write('filter_cache_hits=%d|filter_cache_misses=%d|hit_rate=%.1f%%' % (
+            hits, misses, hit_rate))
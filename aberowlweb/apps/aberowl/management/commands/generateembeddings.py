@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from aberowl.embeddings import EMBEDDINGS_THREADS
+from aberowl.tasks import generate_all_embeddings
+
+import os
+import time
+
+
+class Command(BaseCommand):
+    help = 'Generates the embeddings of the latest submissions, only changed ontologies are trained'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-c', '--cpus', type=int, default=os.cpu_count(),
+                            help='number of cpus used by all the word2vec processes', )
+        parser.add_argument('-t', '--threads', type=int, default=EMBEDDINGS_THREADS,
+                            help='number of threads of each word2vec process', )
+
+    def handle(self, *args, **options):
+        start = time.time()
+        result = generate_all_embeddings(options['cpus'], options['threads'])
+        self.stdout.write('total=%d|done=%d|failed=%d|elapsed=%ds' % (
+            result['total'], result['done'], result['failed'], time.time() - start))
@@ -1,38 +1,69 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from aberowl.tasks import reload_indexes
+from aberowl.models import ReindexJob
+from aberowl.tasks import (
+    create_reindex_job, resume_reindex_job, get_unfinished_reindex_job, run_reindex_job, get_reindex_progress)
 
-import signal
+import threading
+import time
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 
+def format_duration(seconds):
+    seconds = int(seconds)
+    return '%d:%02d:%02d' % (seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
 class Command(BaseCommand):
     help = 'Starts reloading all the ontology indexes for target elastic search server'
 
-    def __init__(self, *args, **kwargs):
-        super(Command, self).__init__(*args, **kwargs)
-        self.processes = {}
-        signal.signal(signal.SIGTERM, self.stop_subprocesses)
-        signal.signal(signal.SIGINT, self.stop_subprocesses)
-        signal.signal(signal.SIGQUIT, self.stop_subprocesses)
-
     def add_arguments(self, parser):
         parser.add_argument('elasticsearch_url', type=str, help='elasticsearch server')
         parser.add_argument('-u', '--elasticsearch_username', type=str, help='elasticsearch user name', )
         parser.add_argument('-p', '--elasticsearch_password', type=str, help='elasticsearch password', )
+        parser.add_argument('-j', '--parallel', type=int, default=1, help='number of ontologies indexed at once', )
+        parser.add_argument('-r', '--resume', action='store_true',
+                            help='resume the last unfinished reindex job instead of starting a new one', )
+        parser.add_argument('-i', '--interval', type=int, default=10, help='seconds between progress reports', )
 
-    def stop_subprocesses(self, signum, frame):
-        if self.proc.poll() is None:
-            self.proc.kill()
-        exit(0)
+    def report(self, job, start, classes_start):
+        progress = get_reindex_progress(job)
+        elapsed = max(time.time() - start, 1)
+        classes_rate = (progress['classes_done'] - classes_start) / elapsed
+        remaining = progress[ReindexJob.PENDING] + progress[ReindexJob.RUNNING]
+        eta = '-'
+        if classes_rate > 0:
+            eta = format_duration((progress['classes_total'] - progress['classes_done']) / classes_rate)
+        self.stdout.write(
+            'job=%d|done=%d/%d|failed=%d|remaining=%d|classes/s=%.1f|elapsed=%s|eta=%s' % (
+                job.pk, progress[ReindexJob.DONE], progress['total'], progress[ReindexJob.FAILED],
+                remaining, classes_rate, format_duration(elapsed), eta))
+        return progress
 
     def handle(self, *args, **options):
         es_url = options['elasticsearch_url']
-        es_username = options['elasticsearch_username']
-        es_password = options['elasticsearch_password']
-        if es_username and es_password:
-            reload_indexes(True, es_url, es_username, es_password)
+        es_username = options['elasticsearch_username'] or ''
+        es_password = options['elasticsearch_password'] or ''
+
+        if options['resume']:
+            job = get_unfinished_reindex_job()
+            if job is None:
+                raise CommandError('No unfinished reindex job')
+            job = resume_reindex_job(job)
+            job.es_url = es_url
         else:
-            reload_indexes(True, es_url)
+            job = create_reindex_job(True, es_url)
+
+        # Interrupted jobs keep their state and can be resumed with --resume
+        start = time.time()
+        classes_start = get_reindex_progress(job)['classes_done']
+        thread = threading.Thread(
+            target=run_reindex_job, args=(job, options['parallel'], es_username, es_password), daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(options['interval'])
+            self.report(job, start, classes_start)
+        job.refresh_from_db()
+        self.stdout.write('job=%d|status=%s' % (job.pk, job.status))
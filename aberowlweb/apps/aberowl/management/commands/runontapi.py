@@ -1,22 +1,10 @@
 from django.core.management.base import BaseCommand
-from django.conf import settings
-from django.db.models import F
 from aberowl.models import Ontology
-from django import db
+from aberowl.ontapi_supervisor import (
+    Supervisor, get_startup_list, ONTAPI_PROCESSES, ONTAPI_BASE_PORT, ONTAPI_LAZY, ONTAPI_SNAPSHOTS)
 
-from gevent.subprocess import Popen, PIPE
 import signal
 import logging
-import json
-import os
-
-import environ
-
-envl = environ.Env()
-
-ABEROWL_SERVER_URL = getattr(settings, 'ABEROWL_SERVER_URL', 'http://localhost/')
-
-environ.Env.read_env(os.path.join(getattr(settings, 'BASE_DIR'), '.env'))
 
 logging.basicConfig(level=logging.INFO)
 
@@ -24,63 +12,46 @@ logging.basicConfig(level=logging.INFO)
 class Command(BaseCommand):
     help = 'Starts API servers for all ontologies'
 
-    def __init__(self, *args, **kwargs):
-        super(Command, self).__init__(*args, **kwargs)
-        self.processes = {}
-        signal.signal(signal.SIGTERM, self.stop_subprocesses)
-        signal.signal(signal.SIGINT, self.stop_subprocesses)
-        signal.signal(signal.SIGQUIT, self.stop_subprocesses)
-
     def add_arguments(self, parser):
-        pass
+        parser.add_argument(
+            '--processes', type=int, default=ONTAPI_PROCESSES,
+            help='Number of ontology API processes the ontologies are partitioned over')
+        parser.add_argument(
+            '--port', type=int, default=ONTAPI_BASE_PORT,
+            help='Port of the first process, the others use the next ports')
+        parser.add_argument(
+            '--lazy', action='store_true', default=ONTAPI_LAZY,
+            help='Load the ontologies which are not pinned on their first query')
+        parser.add_argument(
+            '--pin', nargs='+', default=[], metavar='ACRONYM',
+            help='Pin ontologies, they are always loaded at startup')
+        parser.add_argument(
+            '--unpin', nargs='+', default=[], metavar='ACRONYM',
+            help='Unpin ontologies')
+        parser.add_argument(
+            '--no-snapshots', dest='snapshots', action='store_false', default=ONTAPI_SNAPSHOTS,
+            help='Classify every ontology at startup instead of starting from its taxonomy snapshot')
 
     def stop_subprocesses(self, signum, frame):
-        if self.proc.poll() is None:
-            self.proc.kill()
-        Ontology.objects.filter(
-            nb_servers__gt=0,
-            acronym__in=self.loaded).update(nb_servers=F('nb_servers') - 1)
-        exit(0)
+        self.supervisor.stopping.set()
 
     def handle(self, *args, **options):
-        ontologies = Ontology.objects.filter(
-            status=Ontology.CLASSIFIED)
-        data = []
-        self.loaded = set()
-        for ont in ontologies:
-            ontIRI = ABEROWL_SERVER_URL + ont.get_latest_submission().get_filepath()
-            data.append({'ontId': ont.acronym, 'ontIRI': ontIRI})
-        data = json.dumps(data)
-        memory = envl('RAM_SIZE', default=10)
-        env = os.environ.copy()
-        env['JAVA_OPTS'] = f'-Xmx{memory}g -Xms8g -XX:+UseParallelGC'
-        self.proc = Popen(
-            ['groovy', 'OntologyServer.groovy'],
-            cwd='aberowlapi/', stdin=PIPE, stdout=PIPE,
-            universal_newlines=True, env=env)
-        self.proc.stdin.write(data)
-        self.proc.stdin.close()
-        for line in self.proc.stdout:
-            line = line.strip()
-            logging.info(line)
-            if line.startswith('Finished loading'):
-                oid = line.split()[2]
-                if oid not in self.loaded:
-                    self.loaded.add(oid)
-                    try:
-                        Ontology.objects.filter(
-                            acronym=oid).update(nb_servers=F('nb_servers') + 1)
-                    except Exception as e:
-                        print('Exception:', e)
-                        # Reset database connection if update query fails
-                        db.close_connection()
-                        Ontology.objects.filter(
-                            acronym=oid).update(nb_servers=F('nb_servers') + 1)
-            if line.startswith('Unloadable ontology'):
-                oid = line.split()[2]
-                try:
-                    Ontology.objects.filter(acronym=oid).update(status=Ontology.UNLOADABLE)
-                except Exception as e:
-                    print('Exception:', e)
-        self.proc.stdout.close()
-        self.proc.wait()
+        # The pinned ontologies are kept for the next starts
+        if options['pin']:
+            Ontology.objects.filter(acronym__in=options['pin']).update(pinned=True)
+        if options['unpin']:
+            Ontology.objects.filter(acronym__in=options['unpin']).update(pinned=False)
+        self.supervisor = Supervisor(
+            get_startup_list(options['snapshots']), nb_processes=options['processes'], base_port=options['port'],
+            lazy=options['lazy'])
+        signal.signal(signal.SIGTERM, self.stop_subprocesses)
+        signal.signal(signal.SIGINT, self.stop_subprocesses)
+        signal.signal(signal.SIGQUIT, self.stop_subprocesses)
+        for member in self.supervisor.members:
+            logging.info(
+                'Process %d: port %d, %d ontologies, %d MB heap, %s', member.index, member.port,
+                len(member.ontologies), member.heap_mb, ' '.join(member.placement['command']) or 'no binding')
+        try:
+            self.supervisor.run()
+        finally:
+            self.supervisor.stop()
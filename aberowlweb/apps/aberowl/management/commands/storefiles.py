@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from aberowl.models import Ontology
+from aberowl import file_store
+
+import os
+import shutil
+
+
+class Command(BaseCommand):
+    help = ('Moves the submission files into the content-addressed file store and links them back, '
+            'stored files are compressed when FILE_STORE_COMPRESSION is set')
+
+    def store_submission(self, submission):
+        filepath = submission.get_filepath()
+        stored_filepath = file_store.find_file(filepath)
+        if stored_filepath is None:
+            return None
+        checksum = file_store.file_checksum(filepath)
+        blob_filepath = file_store.find_blob(checksum)
+        if blob_filepath is not None and os.path.samefile(stored_filepath, blob_filepath):
+            # Raw blobs are compressed when compression was enabled later
+            if file_store.compress_blob(checksum):
+                file_store.link_blob(checksum, filepath)
+                self.nb_stored += 1
+            return checksum
+        if blob_filepath is not None:
+            self.freed += os.path.getsize(stored_filepath)
+            file_store.link_blob(checksum, filepath)
+        elif stored_filepath == filepath:
+            file_store.store_file(filepath, [filepath], checksum)
+        else:
+            # Compressed file outside of the store
+            blob_filepath = file_store.get_blob_filepath(checksum) + stored_filepath[len(filepath):]
+            os.makedirs(os.path.dirname(blob_filepath), exist_ok=True)
+            shutil.move(stored_filepath, blob_filepath)
+            os.chmod(blob_filepath, 0o444)
+            file_store.link_blob(checksum, filepath)
+        self.nb_stored += 1
+        if not submission.md5sum and not submission.ontology.submissions.filter(md5sum=checksum).exists():
+            submission.md5sum = checksum
+            submission.save(update_fields=['md5sum'])
+        return checksum
+
+    def handle(self, *args, **options):
+        self.nb_stored = 0
+        self.freed = 0
+        for ontology in Ontology.objects.all().order_by('acronym'):
+            checksum = None
+            for submission in ontology.submissions.order_by('pk'):
+                checksum = self.store_submission(submission)
+            if checksum is not None:
+                latest_filepath = file_store.find_file(submission.get_filepath(folder='latest'))
+                if latest_filepath is not None and not os.path.samefile(
+                        latest_filepath, file_store.find_blob(checksum)):
+                    self.freed += os.path.getsize(latest_filepath)
+                file_store.link_blob(checksum, submission.get_filepath(folder='latest'))
+        self.stdout.write('stored=%d|freed=%dMB' % (self.nb_stored, self.freed // (1024 * 1024)))
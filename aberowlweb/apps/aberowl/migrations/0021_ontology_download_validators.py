@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0020_alter_ontology_id_alter_submission_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ontology',
+            name='download_etag',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='ontology',
+            name='download_last_modified',
+            field=models.CharField(blank=True, max_length=63, null=True),
+        ),
+    ]
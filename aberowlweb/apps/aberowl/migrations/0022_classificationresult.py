@@ -0,0 +1,25 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0021_ontology_download_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(max_length=32)),
+                ('classifier_version', models.CharField(max_length=63)),
+                ('result', models.JSONField()),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('checksum', 'classifier_version')},
+            },
+        ),
+    ]
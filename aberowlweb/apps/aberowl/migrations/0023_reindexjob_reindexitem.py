@@ -0,0 +1,46 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0022_classificationresult'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReindexJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(
+                    choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')],
+                    default='pending', max_length=15)),
+                ('skip_embedding', models.BooleanField(default=True)),
+                ('es_url', models.CharField(max_length=255)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_started', models.DateTimeField(blank=True, null=True)),
+                ('date_finished', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReindexItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(
+                    choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')],
+                    default='pending', max_length=15)),
+                ('nb_classes', models.PositiveIntegerField(default=0)),
+                ('date_started', models.DateTimeField(blank=True, null=True)),
+                ('date_finished', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='items', to='aberowl.reindexjob')),
+                ('ontology', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='aberowl.ontology')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='aberowl.submission')),
+            ],
+            options={
+                'unique_together': {('job', 'ontology')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0023_reindexjob_reindexitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(
+                choices=[('Classified', 'Classified'), ('Unloadable', 'Unloadable'),
+                         ('Incoherent', 'Incoherent'), ('Unknown', 'Unknown'),
+                         ('Validating', 'Validating')],
+                default='Unknown', max_length=31),
+        ),
+    ]
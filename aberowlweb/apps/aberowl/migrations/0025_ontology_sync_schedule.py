@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0024_submission_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ontology',
+            name='sync_interval',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ontology',
+            name='date_checked',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ontology',
+            name='date_changed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ontology',
+            name='next_check',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
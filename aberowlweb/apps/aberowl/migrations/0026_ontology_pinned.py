@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0025_ontology_sync_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ontology',
+            name='pinned',
+            field=models.BooleanField(default=False),
+        ),
+    ]
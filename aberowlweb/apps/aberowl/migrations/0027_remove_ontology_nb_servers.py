@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0026_ontology_pinned'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ontology',
+            name='nb_servers',
+        ),
+    ]
@@ -0,0 +1,59 @@
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0027_remove_ontology_nb_servers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='taxonomy_imported',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TaxonomyClass',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iri', models.TextField()),
+                ('info', models.JSONField()),
+                ('label', models.TextField()),
+                ('deprecated', models.BooleanField(default=False)),
+                ('names', django.contrib.postgres.fields.ArrayField(
+                    base_field=models.TextField(), default=list, size=None)),
+                ('equivalents', django.contrib.postgres.fields.ArrayField(
+                    base_field=models.TextField(), default=list, size=None)),
+                ('submission', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='taxonomy_classes',
+                    to='aberowl.submission')),
+            ],
+            options={
+                'unique_together': {('submission', 'iri')},
+                'indexes': [django.contrib.postgres.indexes.GinIndex(
+                    fields=['names'], name='aberowl_tax_names_c8f33d_gin')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxonomyEdge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('child', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='parent_edges',
+                    to='aberowl.taxonomyclass')),
+                ('parent', models.ForeignKey(
+                    blank=True, null=True, on_delete=django.db.models.deletion.CASCADE,
+                    related_name='child_edges', to='aberowl.taxonomyclass')),
+                ('submission', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, related_name='taxonomy_edges',
+                    to='aberowl.submission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['submission', 'parent'], name='aberowl_tax_submiss_c3c455_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aberowl', '0028_taxonomy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxonomyclass',
+            name='root_path',
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), blank=True, null=True, size=None),
+        ),
+    ]
@@ -4,8 +4,10 @@ from __future__ import unicode_literals
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.utils import timezone
 from django.conf import settings
+from aberowl import file_store, ontapi_registry
 import os
 
 ABEROWL_API_URL = getattr(
@@ -46,10 +48,23 @@ class Ontology(models.Model):
         models.CharField(max_length=127), blank=True, null=True)
     species = ArrayField(
         models.CharField(max_length=127), blank=True, null=True)
-    nb_servers = models.PositiveIntegerField(default=0)
 
     is_obsolete = models.BooleanField(default=False)
 
+    # HTTP validators of the last downloaded ontology file
+    download_etag = models.CharField(max_length=255, blank=True, null=True)
+    download_last_modified = models.CharField(max_length=63, blank=True, null=True)
+
+    # Sync history and schedule, see aberowl.sync_schedule
+    sync_interval = models.DurationField(blank=True, null=True)
+    date_checked = models.DateTimeField(blank=True, null=True)
+    date_changed = models.DateTimeField(blank=True, null=True)
+    next_check = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    # Loaded at startup and never evicted by ontology API processes loading
+    # ontologies on demand
+    pinned = models.BooleanField(default=False)
+
     class Meta:
         verbose_name_plural = 'Ontologies'
 
@@ -61,10 +76,23 @@ class Ontology(models.Model):
         return submission
 
     def get_api_url(self):
-        return ABEROWL_API_URL
+        # URL of the ontology API process serving the ontology
+        return ontapi_registry.get_route(self.acronym)
+
+    def is_live(self):
+        # Served by an ontology API process which sent a recent heartbeat
+        return ontapi_registry.is_live(self.acronym)
+
+    @classmethod
+    def filter_live(cls, queryset):
+        routes = ontapi_registry.get_live_routes(queryset.values_list('acronym', flat=True))
+        return queryset.filter(acronym__in=list(routes))
 
 
 class Submission(models.Model):
+    # Uploaded files are classified in the background
+    VALIDATING = 'Validating'
+    STATUS_CHOICES = Ontology.STATUS_CHOICES + ((VALIDATING, VALIDATING),)
     LANGUAGE_CHOICES = (
         ('OWL', 'OWL'),
         ('OBO', 'OBO'),
@@ -99,10 +127,16 @@ class Submission(models.Model):
     classifiable = models.BooleanField(default=False)
     nb_inconsistent = models.PositiveIntegerField(default=0)
     indexed = models.BooleanField(default=False)
+    status = models.CharField(
+        max_length=31, choices=STATUS_CHOICES, default=Ontology.UNKNOWN)
 
     md5sum = models.CharField(
         max_length=32, blank=True, null=True)
 
+    # The inferred hierarchy of the submission is in TaxonomyClass and
+    # TaxonomyEdge, see aberowl.taxonomy
+    taxonomy_imported = models.BooleanField(default=False)
+
     class Meta:
         unique_together = (
             ('ontology', 'submission_id'),
@@ -120,4 +154,116 @@ class Submission(models.Model):
                    + '/' + folder + '/')
         if not os.path.exists(filedir):
             os.makedirs(filedir)
-        return filedir + filename
+        filepath = filedir + filename
+        if (self.md5sum and file_store.find_file(filepath) is None
+                and file_store.has_blob(self.md5sum)):
+            file_store.link_blob(self.md5sum, filepath)
+        return filepath
+
+    def get_hashes_filepath(self):
+        return self.get_filepath() + '.hashes'
+
+    def get_classes_filepath(self):
+        return self.get_filepath() + '.classes'
+
+    def get_snapshot_filepath(self):
+        return self.get_filepath() + '.taxonomy.gz'
+
+    def get_upload_filepath(self):
+        return self.get_filepath() + '.upload'
+
+
+class TaxonomyClass(models.Model):
+    # Named class of a submission with the class information served by the
+    # ontology API, imported from the taxonomy snapshot of the submission
+    submission = models.ForeignKey(
+        Submission, on_delete=models.CASCADE, related_name='taxonomy_classes')
+    iri = models.TextField()
+    info = models.JSONField()
+    label = models.TextField()
+    deprecated = models.BooleanField(default=False)
+    # Lowercased labels and synonyms resolved by label queries
+    names = ArrayField(models.TextField(), default=list)
+    equivalents = ArrayField(models.TextField(), default=list)
+    # Ids of the ancestors from a top class down to the direct superclass,
+    # following the first superclass by label as findRoot.groovy does. Null
+    # when the class has no path of classes which are not deprecated.
+    root_path = ArrayField(models.BigIntegerField(), blank=True, null=True)
+
+    class Meta:
+        unique_together = (('submission', 'iri'),)
+        indexes = [GinIndex(fields=['names'])]
+
+    def __str__(self):
+        return self.iri
+
+
+class TaxonomyEdge(models.Model):
+    # Inferred direct subclass relation, the parent of the top classes is
+    # owl:Thing, stored as null
+    submission = models.ForeignKey(
+        Submission, on_delete=models.CASCADE, related_name='taxonomy_edges')
+    parent = models.ForeignKey(
+        TaxonomyClass, on_delete=models.CASCADE, blank=True, null=True, related_name='child_edges')
+    child = models.ForeignKey(
+        TaxonomyClass, on_delete=models.CASCADE, related_name='parent_edges')
+
+    class Meta:
+        indexes = [models.Index(fields=['submission', 'parent'])]
+
+
+class ClassificationResult(models.Model):
+    # Metrics of Ingest.groovy keyed by the md5 checksum of the ontology
+    # file and the version of the classifier configuration
+    checksum = models.CharField(max_length=32)
+    classifier_version = models.CharField(max_length=63)
+    result = models.JSONField()
+    date_created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = (('checksum', 'classifier_version'),)
+
+    def __str__(self):
+        return self.checksum + ' - ' + self.classifier_version
+
+
+class ReindexJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, PENDING),
+        (RUNNING, RUNNING),
+        (DONE, DONE),
+        (FAILED, FAILED),
+    )
+
+    status = models.CharField(
+        max_length=15, choices=STATUS_CHOICES, default=PENDING)
+    skip_embedding = models.BooleanField(default=True)
+    es_url = models.CharField(max_length=255)
+    date_created = models.DateTimeField(default=timezone.now)
+    date_started = models.DateTimeField(blank=True, null=True)
+    date_finished = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return str(self.pk) + ' - ' + self.status
+
+
+class ReindexItem(models.Model):
+    job = models.ForeignKey(
+        ReindexJob, on_delete=models.CASCADE, related_name='items')
+    ontology = models.ForeignKey(Ontology, on_delete=models.CASCADE)
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE)
+    status = models.CharField(
+        max_length=15, choices=ReindexJob.STATUS_CHOICES, default=ReindexJob.PENDING)
+    nb_classes = models.PositiveIntegerField(default=0)
+    date_started = models.DateTimeField(blank=True, null=True)
+    date_finished = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = (('job', 'ontology'),)
+
+    def __str__(self):
+        return str(self.job_id) + ' - ' + self.ontology.acronym + ' - ' + self.status
@@ -1,6 +1,7 @@
 from enum import Enum
 
 from aberowl.models import Ontology
+from aberowl import ontapi_registry, scatter_gather, taxonomy
 
 from django.conf import settings
 
@@ -19,16 +20,43 @@ class RequestType(Enum):
 
 
 class OntServerRequestProcessor:
+    # Every query on an ontology is counted for the startup order of
+    # runontapi, also the ones answered from the taxonomy tables
     ABEROWL_API_URL = getattr(settings, 'ABEROWL_API_URL', 'http://localhost:8080/api/')
 
     def find_ontology_root(self, owl_class, ontology_acronym):
+        # The ancestor paths of the taxonomy tables answer without the ontology API
+        ontology = Ontology.objects.filter(acronym=ontology_acronym).first()
+        if ontology is not None:
+            ontapi_registry.record_access(ontology.acronym)
+        result = taxonomy.find_root(ontology, owl_class) if ontology is not None else None
+        if result is not None:
+            self.__set_class_axioms(result, owl_class, ontology)
+            return result
         ontology = self.__load_ontology(ontology_acronym)
         url = ontology.get_api_url()
         query_string = 'query=' + owl_class + '&ontology=' + ontology_acronym
         return self.__execute_request(url, RequestType.FIND_ROOT.value, query_string)
 
+    def __set_class_axioms(self, result, owl_class, ontology):
+        # The tables have no axioms, the selected class gets them from one
+        # query of the ontology API as the class view does
+        node = taxonomy.find_node(result, owl_class)
+        if node is None or not ontology.is_live():
+            return
+        try:
+            classes = self.__execute_dl_query(
+                '<' + node['class'] + '>', 'equivalent', ontology.acronym, axioms='true')['result']
+        except Exception as e:
+            print('Unable to get the axioms of', owl_class, e)
+            return
+        for info in classes:
+            if info['class'] == node['class']:
+                node.update((key, info[key]) for key in taxonomy.AXIOM_KEYS if key in info)
+
     def find_ontology_object_properties(self, ontology_acronym, ont_property=None):
         ontology = self.__load_ontology(ontology_acronym)
+        ontapi_registry.record_access(ontology.acronym)
         url = ontology.get_api_url()
         query_string = {'ontology': ontology_acronym}
         if ont_property:
@@ -65,11 +93,16 @@ class OntServerRequestProcessor:
 
     def find_by_ontology_and_class(self, ontology_acronym, class_iri):
         ontology = self.__load_ontology(ontology_acronym)
+        ontapi_registry.record_access(ontology.acronym)
         url = ontology.get_api_url()
         query_string = {'ontology': ontology_acronym, 'class_iri': class_iri}
         return self.__execute_request(url, RequestType.FIND_INSTANCES.value, urllib.parse.urlencode(query_string))
 
     def execute_dl_query(self, query, query_type, ontology_acronym=None, axioms=None, labels=None, direct=None):
+        return self.__execute_dl_query(query, query_type, ontology_acronym, axioms, labels, direct, record=True)
+
+    def __execute_dl_query(self, query, query_type, ontology_acronym=None, axioms=None, labels=None, direct=None,
+                           record=False):
         url = None
         if labels:
             query = query.lower()
@@ -78,7 +111,13 @@ class OntServerRequestProcessor:
             queryset = Ontology.objects.filter(acronym=ontology_acronym)
             if queryset.exists():
                 ontology = queryset.get()
-                if ontology.nb_servers:
+                if record:
+                    ontapi_registry.record_access(ontology.acronym)
+                # Named class hierarchy queries do not need the ontology API
+                result = taxonomy.run_query(ontology, query, query_type, axioms, labels, direct)
+                if result is not None:
+                    return result
+                if ontology.is_live():
                     url = ontology.get_api_url()
                     query_string['ontology'] = ontology_acronym
                 else:
@@ -88,14 +127,24 @@ class OntServerRequestProcessor:
                     "Ontology \'{ontology_acronym}\' does not exist".format(ontology_acronym=ontology_acronym))
 
         else:
-            queryset = Ontology.objects.filter(nb_servers__gt=0)
-            if not queryset.exists():
+            # Every available ontology is queried separately
+            targets = scatter_gather.get_targets()
+            if not targets:
                 raise Exception('API server is down!')
 
-            url = self.ABEROWL_API_URL
+            return scatter_gather.gather(query, query_type, labels, direct, targets=targets)
 
         return self.__execute_request(url, RequestType.DL_QUERY.value, urllib.parse.urlencode(query_string))
 
+    def stream_dl_query(self, query, query_type, axioms=None, labels=None, direct=None):
+        # JSON lines with the results of every available ontology as it answers
+        if labels:
+            query = query.lower()
+        targets = scatter_gather.get_targets()
+        if not targets:
+            raise Exception('API server is down!')
+        return scatter_gather.stream(query, query_type, labels, direct, targets=targets)
+
     def __load_ontology(self, ontology_acronym):
         if ontology_acronym is not None:
             queryset = Ontology.objects.filter(acronym=ontology_acronym)
@@ -104,7 +153,7 @@ class OntServerRequestProcessor:
                     "Ontology \'{ontology_acronym}\' does not exist".format(ontology_acronym=ontology_acronym))
 
             ontology = queryset.get()
-            if not ontology.nb_servers:
+            if not ontology.is_live():
                 raise Exception('API server is down!')
 
             return ontology
@@ -114,4 +163,8 @@ class OntServerRequestProcessor:
                                                                query_string=query_string)
         logger.info("Executing request on Ontology Server:" + url)
         response = requests.get(url)
-        return response.json()
+        result = response.json()
+        # Ontologies loaded on demand answer 503 until they are loaded
+        if response.status_code == 503 and isinstance(result, dict) and result.get('status') == 'loading':
+            raise Exception(result['message'])
+        return result
@@ -0,0 +1,168 @@
+# Routes and status of the ontology API processes started by runontapi
+#
+# runontapi partitions the ontologies over several OntologyServer.groovy
+# processes. The URL of the process serving an ontology and the state of
+# the supervisor are kept in the cache, so that the web and celery workers
+# send requests to the right process.
+#
+# Routes are heartbeats: runontapi publishes the ontologies every process
+# reports as served every few seconds and the routes expire after
+# ONTAPI_HEARTBEAT_TIMEOUT seconds. An ontology is available while it has a
+# route, the routes of a crashed process or of a stopped runontapi expire
+# by themselves.
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+ABEROWL_API_URL = getattr(settings, 'ABEROWL_API_URL', 'http://localhost:8080/api/')
+# The supervisor refreshes its status more often, an expired status means
+# that runontapi is not running
+ONTAPI_STATUS_TIMEOUT = getattr(settings, 'ONTAPI_STATUS_TIMEOUT', 60)
+ONTAPI_HEARTBEAT_TIMEOUT = getattr(settings, 'ONTAPI_HEARTBEAT_TIMEOUT', 30)
+
+ONTAPI_STATUS_KEY = 'ontapi:status'
+
+# Readiness of an ontology while the processes start
+QUEUED = 'queued'
+LOADING = 'loading'
+READY = 'ready'
+UNLOADABLE = 'unloadable'
+FAILED = 'failed'
+
+
+def route_key(acronym):
+    return 'ontapi:route:%s' % (acronym,)
+
+
+def server_key(url):
+    return 'ontapi:server:%s' % (url,)
+
+
+def set_route(acronym, url):
+    cache.set(route_key(acronym), url, timeout=ONTAPI_HEARTBEAT_TIMEOUT)
+
+
+def publish_heartbeat(url, acronyms, loaded=None):
+    # loaded are the served ontologies the process has in memory, all of
+    # them when it does not load lazily
+    cache.set(server_key(url), {
+        'url': url,
+        'ontologies': sorted(acronyms),
+        'loaded': sorted(acronyms if loaded is None else loaded),
+        'updated': timezone.now().isoformat(),
+    }, timeout=ONTAPI_HEARTBEAT_TIMEOUT)
+    cache.set_many({route_key(acronym): url for acronym in acronyms}, timeout=ONTAPI_HEARTBEAT_TIMEOUT)
+
+
+def withdraw_server(url, acronyms):
+    # Routes already moved to another process are kept
+    routes = cache.get_many([route_key(acronym) for acronym in acronyms])
+    keys = [key for key, route in routes.items() if route == url]
+    cache.delete_many(keys + [server_key(url)])
+
+
+def get_server(url):
+    return cache.get(server_key(url))
+
+
+def get_route(acronym):
+    # Requests go to the first process when the cache is not available
+    try:
+        return cache.get(route_key(acronym)) or ABEROWL_API_URL
+    except Exception as e:
+        print('Unable to read the route of', acronym, e)
+        return ABEROWL_API_URL
+
+
+def get_live_routes(acronyms):
+    # Routes of the available ontologies among acronyms
+    keys = {route_key(acronym): acronym for acronym in acronyms}
+    try:
+        routes = cache.get_many(list(keys))
+    except Exception as e:
+        print('Unable to read the ontology routes', e)
+        return {}
+    return {keys[key]: url for key, url in routes.items()}
+
+
+def get_loaded_routes(acronyms):
+    # Routes of the available ontologies among acronyms which are loaded, a
+    # query sent to them does not load them
+    routes = get_live_routes(acronyms)
+    try:
+        servers = cache.get_many([server_key(url) for url in set(routes.values())])
+    except Exception as e:
+        print('Unable to read the ontology API processes', e)
+        return {}
+    loaded = set()
+    for server in servers.values():
+        loaded.update((acronym, server['url']) for acronym in server.get('loaded', server['ontologies']))
+    return {acronym: url for acronym, url in routes.items() if (acronym, url) in loaded}
+
+
+def is_live(acronym):
+    return acronym in get_live_routes([acronym])
+
+
+def assignment_key(acronym):
+    return 'ontapi:assignment:%s' % (acronym,)
+
+
+def set_assignments(url, acronyms):
+    # Process an ontology is partitioned to, kept while it is not loaded
+    cache.set_many({assignment_key(acronym): url for acronym in acronyms}, timeout=None)
+
+
+def get_assignment(acronym):
+    try:
+        return cache.get(assignment_key(acronym))
+    except Exception as e:
+        print('Unable to read the assignment of', acronym, e)
+        return None
+
+
+def set_status(status):
+    cache.set(ONTAPI_STATUS_KEY, status, timeout=ONTAPI_STATUS_TIMEOUT)
+
+
+def get_status():
+    return cache.get(ONTAPI_STATUS_KEY)
+
+
+def readiness_key(acronym):
+    return 'ontapi:readiness:%s' % (acronym,)
+
+
+def set_readiness(acronym, state, url=None, position=None):
+    cache.set(readiness_key(acronym), {
+        'state': state,
+        'url': url,
+        'position': position,
+        'updated': timezone.now().isoformat(),
+    }, timeout=None)
+
+
+def get_readiness(acronym):
+    return cache.get(readiness_key(acronym))
+
+
+def access_key(acronym):
+    return 'ontapi:access:%s' % (acronym,)
+
+
+def record_access(acronym):
+    # Counts the requests sent to the ontology API per ontology, runontapi
+    # loads the most requested ontologies first
+    key = access_key(acronym)
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception as e:
+        print('Unable to count the access to', acronym, e)
+
+
+def get_access_counts(acronyms):
+    keys = {access_key(acronym): acronym for acronym in acronyms}
+    values = cache.get_many(list(keys))
+    return {keys[key]: value for key, value in values.items()}
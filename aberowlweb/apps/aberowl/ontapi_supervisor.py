@@ -0,0 +1,413 @@
+# Supervisor of the ontology API processes
+#
+# The classified ontologies are partitioned over ONTAPI_PROCESSES
+# OntologyServer.groovy processes by their number of classes. Every process
+# listens on its own port, gets a share of the ONTAPI_MEMORY heap budget
+# proportional to its partition and is bound to a NUMA node with numactl, or
+# to a set of cores with taskset. A crashed process is restarted; after
+# ONTAPI_MAX_RESTARTS crashes within ONTAPI_RESTART_WINDOW seconds its
+# ontologies are loaded by the other processes instead. Every
+# ONTAPI_HEARTBEAT_INTERVAL seconds the ontologies each running process
+# reports as served are published to ontapi_registry, where they expire when
+# the process stops answering.
+#
+# With ONTAPI_LAZY the processes only load the pinned ontologies at startup
+# and the others on their first query, evicting the least recently used ones
+# above ONTAPI_MAX_HEAP_FRACTION of their heap. Registered ontologies count
+# as served.
+#
+# Every process loads its ontologies by popularity, taken from the DL query
+# logs and the API access counts, then smallest first, in batches of
+# ONTAPI_STARTUP_BATCH_SIZE. The readiness of every ontology is published to
+# ontapi_registry while it loads.
+
+from subprocess import Popen, PIPE, DEVNULL
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import glob
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import requests
+from django import db
+from django.conf import settings
+from django.utils import timezone
+
+from aberowl import ontapi_registry
+from aberowl.dl_query_logger import LOG_FOLDER
+from aberowl.models import Ontology
+
+ABEROWL_SERVER_URL = getattr(settings, 'ABEROWL_SERVER_URL', 'http://localhost/')
+ONTAPI_PROCESSES = getattr(settings, 'ONTAPI_PROCESSES', 1)
+ONTAPI_HOST = getattr(settings, 'ONTAPI_HOST', 'localhost')
+ONTAPI_BASE_PORT = getattr(settings, 'ONTAPI_BASE_PORT', 8080)
+# Heap of all the processes in GB
+ONTAPI_MEMORY = getattr(settings, 'ONTAPI_MEMORY', 10)
+ONTAPI_MIN_HEAP_MB = getattr(settings, 'ONTAPI_MIN_HEAP_MB', 1024)
+ONTAPI_JAVA_OPTS = getattr(settings, 'ONTAPI_JAVA_OPTS', '-XX:+UseParallelGC')
+ONTAPI_MAX_RESTARTS = getattr(settings, 'ONTAPI_MAX_RESTARTS', 3)
+ONTAPI_RESTART_WINDOW = getattr(settings, 'ONTAPI_RESTART_WINDOW', 600)
+ONTAPI_RELOAD_TIMEOUT = getattr(settings, 'ONTAPI_RELOAD_TIMEOUT', 3600)
+ONTAPI_LAZY = getattr(settings, 'ONTAPI_LAZY', False)
+ONTAPI_MAX_HEAP_FRACTION = getattr(settings, 'ONTAPI_MAX_HEAP_FRACTION', 0.8)
+# Seconds a query waits for its ontology to load before a loading response
+ONTAPI_LOAD_WAIT = getattr(settings, 'ONTAPI_LOAD_WAIT', 30)
+# Ontologies loaded at once by a process, and seconds before an ontology which
+# failed to load is tried again
+ONTAPI_LOAD_CONCURRENCY = getattr(settings, 'ONTAPI_LOAD_CONCURRENCY', 2)
+ONTAPI_LOAD_FAILURE_BACKOFF = getattr(settings, 'ONTAPI_LOAD_FAILURE_BACKOFF', 300)
+ONTAPI_STARTUP_BATCH_SIZE = getattr(settings, 'ONTAPI_STARTUP_BATCH_SIZE', 8)
+# Age of the DL queries counted for the popularity of the ontologies
+ONTAPI_POPULARITY_DAYS = getattr(settings, 'ONTAPI_POPULARITY_DAYS', 30)
+# Ontologies with a taxonomy snapshot answer hierarchy queries from it and
+# are only classified for the queries which need the reasoner
+ONTAPI_SNAPSHOTS = getattr(settings, 'ONTAPI_SNAPSHOTS', True)
+# The heartbeats have to be more frequent than ONTAPI_HEARTBEAT_TIMEOUT
+ONTAPI_HEARTBEAT_INTERVAL = getattr(settings, 'ONTAPI_HEARTBEAT_INTERVAL', 5)
+ONTAPI_HEARTBEAT_REQUEST_TIMEOUT = getattr(settings, 'ONTAPI_HEARTBEAT_REQUEST_TIMEOUT', 5)
+
+ONTAPI_DIR = 'aberowlapi/'
+
+STARTING = 'starting'
+RUNNING = 'running'
+RESTARTING = 'restarting'
+FAILED = 'failed'
+STOPPED = 'stopped'
+
+
+def get_query_counts(days=ONTAPI_POPULARITY_DAYS, log_folder=LOG_FOLDER):
+    # Number of logged DL queries per ontology in the last days
+    counts = Counter()
+    since = datetime.now() - timedelta(days=days)
+    try:
+        with open('{log_folder}/aberowl-dl-logs.txt'.format(log_folder=log_folder)) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if datetime.fromisoformat(entry['time']) < since:
+                        continue
+                except (ValueError, KeyError):
+                    continue
+                for acronym in entry.get('ontology', []):
+                    counts[acronym] += 1
+    except FileNotFoundError:
+        pass
+    return counts
+
+
+def rank(ontologies):
+    # Most requested ontologies first, then the smallest ones which load faster
+    ranked = sorted(ontologies, key=lambda ont: (-ont.get('hits', 0), ont['weight']))
+    for i, ont in enumerate(ranked):
+        ont['rank'] = i
+    return ranked
+
+
+def get_startup_list(snapshots=ONTAPI_SNAPSHOTS):
+    # Classified ontologies with the IRI of their latest submission and of
+    # its taxonomy snapshot, their number of classes as weight and their
+    # popularity, in startup order
+    data = []
+    ontologies = Ontology.objects.filter(status=Ontology.CLASSIFIED)
+    for ont in ontologies:
+        submission = ont.get_latest_submission()
+        if submission is None:
+            continue
+        data.append({
+            'ontId': ont.acronym,
+            'ontIRI': ABEROWL_SERVER_URL + submission.get_filepath(),
+            'weight': max(submission.nb_classes or 0, 1),
+            'pinned': ont.pinned,
+        })
+        if snapshots and os.path.exists(submission.get_snapshot_filepath()):
+            data[-1]['snapshotIRI'] = ABEROWL_SERVER_URL + submission.get_snapshot_filepath()
+    acronyms = [ont['ontId'] for ont in data]
+    hits = get_query_counts()
+    hits.update(ontapi_registry.get_access_counts(acronyms))
+    for ont in data:
+        ont['hits'] = hits.get(ont['ontId'], 0)
+    return rank(data)
+
+
+def partition(ontologies, nb_partitions):
+    # Largest ontologies first, each to the lightest partition
+    partitions = [[] for i in range(nb_partitions)]
+    weights = [0] * nb_partitions
+    for ont in sorted(ontologies, key=lambda ont: ont['weight'], reverse=True):
+        i = weights.index(min(weights))
+        partitions[i].append(ont)
+        weights[i] += ont['weight']
+    return partitions
+
+
+def get_heap_sizes(partitions, memory_mb=None):
+    memory_mb = memory_mb or ONTAPI_MEMORY * 1024
+    weights = [sum(ont['weight'] for ont in onts) for onts in partitions]
+    total = sum(weights)
+    if not total:
+        return [max(memory_mb // len(partitions), ONTAPI_MIN_HEAP_MB)] * len(partitions)
+    return [max(memory_mb * weight // total, ONTAPI_MIN_HEAP_MB) for weight in weights]
+
+
+def get_numa_nodes():
+    nodes = []
+    for path in glob.glob('/sys/devices/system/node/node[0-9]*'):
+        nodes.append(int(os.path.basename(path)[4:]))
+    return sorted(nodes)
+
+
+def get_cpu_sets(nb_sets):
+    cpus = sorted(os.sched_getaffinity(0))
+    size = max(len(cpus) // nb_sets, 1)
+    return [cpus[i * size:(i + 1) * size] or cpus for i in range(nb_sets)]
+
+
+def get_placement(index, nb_processes, nodes=None, cpu_sets=None):
+    # Processes are spread over the NUMA nodes when there are several,
+    # otherwise over disjoint sets of cores
+    nodes = get_numa_nodes() if nodes is None else nodes
+    if len(nodes) > 1 and shutil.which('numactl'):
+        node = nodes[index % len(nodes)]
+        return {'node': node, 'cpus': None,
+                'command': ['numactl', '--cpunodebind=%d' % node, '--membind=%d' % node]}
+    cpu_sets = get_cpu_sets(nb_processes) if cpu_sets is None else cpu_sets
+    cpus = cpu_sets[index % len(cpu_sets)]
+    if nb_processes > 1 and shutil.which('taskset'):
+        return {'node': None, 'cpus': cpus,
+                'command': ['taskset', '-c', ','.join(str(cpu) for cpu in cpus)]}
+    return {'node': None, 'cpus': None, 'command': []}
+
+
+class Member:
+
+    def __init__(self, index, port, heap_mb, ontologies, placement, lazy=ONTAPI_LAZY):
+        self.index = index
+        self.lazy = lazy
+        self.port = port
+        self.url = 'http://%s:%d/api/' % (ONTAPI_HOST, port)
+        self.heap_mb = heap_mb
+        self.ontologies = ontologies
+        self.placement = placement
+        self.process = None
+        self.state = STOPPED
+        self.loaded = set()
+        self.unloadable = set()
+        self.crashes = []
+        self.lock = threading.Lock()
+
+    def get_command(self):
+        return self.placement['command'] + [
+            'groovy', 'OntologyServer.groovy', str(self.port), str(self.lazy).lower(),
+            str(ONTAPI_MAX_HEAP_FRACTION), str(ONTAPI_LOAD_WAIT),
+            str(ONTAPI_LOAD_CONCURRENCY), str(ONTAPI_LOAD_FAILURE_BACKOFF)]
+
+    def start(self):
+        env = os.environ.copy()
+        env['JAVA_OPTS'] = '-Xmx%dm -Xms%dm %s' % (
+            self.heap_mb, min(self.heap_mb, 8192), ONTAPI_JAVA_OPTS)
+        self.state = STARTING
+        self.process = Popen(
+            self.get_command(), cwd=ONTAPI_DIR, stdin=PIPE, stdout=PIPE,
+            stderr=DEVNULL, universal_newlines=True, env=env)
+        self.ontologies.sort(key=lambda ont: ont.get('rank', 0))
+        ontapi_registry.set_assignments(self.url, [ont['ontId'] for ont in self.ontologies])
+        data = []
+        for position, ont in enumerate(self.ontologies):
+            data.append({
+                'ontId': ont['ontId'], 'ontIRI': ont['ontIRI'], 'pinned': ont.get('pinned', False),
+                'batch': position // ONTAPI_STARTUP_BATCH_SIZE, 'snapshotIRI': ont.get('snapshotIRI')})
+            if not self.lazy or ont.get('pinned', False):
+                ontapi_registry.set_readiness(ont['ontId'], ontapi_registry.QUEUED, self.url, position)
+        self.process.stdin.write(json.dumps(data))
+        self.process.stdin.close()
+        self.reader = threading.Thread(target=self.read_output, args=(self.process,), daemon=True)
+        self.reader.start()
+
+    def read_output(self, process):
+        for line in process.stdout:
+            self.handle_line(line.strip())
+        process.stdout.close()
+        db.connection.close()
+
+    def handle_line(self, line):
+        logging.info('[%d] %s', self.index, line)
+        if line.startswith('Server started'):
+            self.state = RUNNING
+        elif line.startswith('Starting manager for'):
+            ontapi_registry.set_readiness(line.split()[3], ontapi_registry.LOADING, self.url)
+        elif line.startswith('Finished loading'):
+            self.set_loaded(line.split()[2])
+            ontapi_registry.set_readiness(line.split()[2], ontapi_registry.READY, self.url)
+        elif line.startswith('Registered'):
+            self.set_loaded(line.split()[1])
+        elif line.startswith("Can't start"):
+            ontapi_registry.set_readiness(line.split()[2], ontapi_registry.FAILED, self.url)
+        elif line.startswith('Unloadable ontology'):
+            oid = line.split()[2]
+            self.unloadable.add(oid)
+            ontapi_registry.set_readiness(oid, ontapi_registry.UNLOADABLE, self.url)
+            try:
+                Ontology.objects.filter(acronym=oid).update(status=Ontology.UNLOADABLE)
+            except Exception:
+                logging.exception('Unable to mark %s as unloadable', oid)
+
+    def set_loaded(self, oid):
+        # Routed right away, the next heartbeat keeps the route alive
+        with self.lock:
+            if oid in self.loaded:
+                return
+            self.loaded.add(oid)
+        ontapi_registry.set_route(oid, self.url)
+
+    def set_unloaded(self):
+        with self.lock:
+            loaded, self.loaded = list(self.loaded), set()
+        ontapi_registry.withdraw_server(self.url, loaded)
+
+    def heartbeat(self):
+        # Publishes the ontologies the process reports as served. A process
+        # which does not answer is not published and its routes expire.
+        if self.state != RUNNING or not self.is_alive():
+            return False
+        try:
+            r = requests.get(self.url + 'status.groovy', timeout=ONTAPI_HEARTBEAT_REQUEST_TIMEOUT)
+            status = r.json()
+            served = status['ontologies']
+            loaded = [acronym for acronym in status.get('loaded', served) if acronym in served]
+        except Exception as e:
+            logging.warning('Ontology API process %d missed its heartbeat: %s', self.index, e)
+            return False
+        with self.lock:
+            self.loaded = set(served)
+        ontapi_registry.publish_heartbeat(self.url, served, loaded)
+        return True
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def can_restart(self, now):
+        self.crashes = [t for t in self.crashes if now - t < ONTAPI_RESTART_WINDOW]
+        return len(self.crashes) < ONTAPI_MAX_RESTARTS
+
+    def stop(self):
+        if self.is_alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except Exception:
+                self.process.kill()
+                self.process.wait()
+        self.state = STOPPED
+        self.set_unloaded()
+
+    def load(self, ont):
+        # Loads an ontology of a failed member with the reloadOntology API
+        params = {'ontology': ont['ontId'], 'ontologyIRI': ont['ontIRI']}
+        try:
+            r = requests.get(self.url + 'reloadOntology.groovy', params=params,
+                             timeout=ONTAPI_RELOAD_TIMEOUT)
+            if r.status_code != 200:
+                return False
+        except Exception as e:
+            logging.warning('Ontology API process %d failed loading %s: %s', self.index, ont['ontId'], e)
+            return False
+        self.ontologies.append(ont)
+        ontapi_registry.set_assignments(self.url, [ont['ontId']])
+        self.set_loaded(ont['ontId'])
+        return True
+
+    def get_status(self):
+        return {
+            'index': self.index,
+            'url': self.url,
+            'pid': self.process.pid if self.is_alive() else None,
+            'state': self.state,
+            'heap_mb': self.heap_mb,
+            'lazy': self.lazy,
+            'node': self.placement['node'],
+            'cpus': self.placement['cpus'],
+            'ontologies': len(self.ontologies),
+            'loaded': len(self.loaded),
+            'unloadable': sorted(self.unloadable),
+            'crashes': len(self.crashes),
+        }
+
+
+class Supervisor:
+
+    def __init__(self, ontologies, nb_processes=ONTAPI_PROCESSES, base_port=ONTAPI_BASE_PORT,
+                 lazy=ONTAPI_LAZY):
+        nb_processes = max(min(nb_processes, len(ontologies)), 1)
+        partitions = partition(ontologies, nb_processes)
+        heap_sizes = get_heap_sizes(partitions)
+        nodes = get_numa_nodes()
+        cpu_sets = get_cpu_sets(nb_processes)
+        self.members = [
+            Member(i, base_port + i, heap_sizes[i], partitions[i],
+                   get_placement(i, nb_processes, nodes, cpu_sets), lazy)
+            for i in range(nb_processes)]
+        self.started = timezone.now().isoformat()
+        self.stopping = threading.Event()
+
+    def start(self):
+        for member in self.members:
+            member.start()
+        self.publish_status()
+
+    def check(self):
+        # Restarts the members that exited and moves the ontologies of the
+        # members crashing too often
+        now = time.time()
+        for member in self.members:
+            if member.state in (FAILED, STOPPED) or member.is_alive():
+                continue
+            logging.warning('Ontology API process %d exited with code %s', member.index, member.process.returncode)
+            member.reader.join()
+            member.set_unloaded()
+            member.crashes.append(now)
+            if member.can_restart(now):
+                member.state = RESTARTING
+                member.start()
+            else:
+                member.state = FAILED
+                threading.Thread(target=self.replace, args=(member,), daemon=True).start()
+
+    def replace(self, member):
+        # Loading can take long, this runs in its own thread
+        live = [m for m in self.members if m.state != FAILED]
+        if not live:
+            logging.warning('No ontology API process left to load %d ontologies', len(member.ontologies))
+            return
+        ontologies, member.ontologies = member.ontologies, []
+        for i, onts in enumerate(partition(ontologies, len(live))):
+            for ont in onts:
+                if ont['ontId'] not in member.unloadable:
+                    live[i].load(ont)
+
+    def publish_status(self):
+        ontapi_registry.set_status({
+            'started': self.started,
+            'updated': timezone.now().isoformat(),
+            'processes': [member.get_status() for member in self.members],
+        })
+
+    def heartbeat(self):
+        with ThreadPoolExecutor(max_workers=len(self.members)) as executor:
+            return list(executor.map(lambda member: member.heartbeat(), self.members))
+
+    def run(self, interval=ONTAPI_HEARTBEAT_INTERVAL):
+        self.start()
+        while not self.stopping.wait(interval):
+            self.check()
+            self.heartbeat()
+            self.publish_status()
+
+    def stop(self):
+        for member in self.members:
+            member.stop()
+        self.publish_status()
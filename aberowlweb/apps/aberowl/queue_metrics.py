@@ -0,0 +1,82 @@
+# Depth and wait time metrics of the celery queues
+#
+# The publish time is added to the headers of every task message and the
+# wait time is recorded in the cache when a worker starts the task. Queue
+# depth is read from the broker.
+
+import time
+
+from celery.signals import before_task_publish, task_prerun
+from django.conf import settings
+from django.core.cache import cache
+
+CELERY_QUEUE_METRICS_TIMEOUT = getattr(settings, 'CELERY_QUEUE_METRICS_TIMEOUT', 24 * 60 * 60)
+
+
+def queue_metrics_key(queue, name):
+    return 'celery_queue:%s:%s' % (queue, name)
+
+
+def increment(key, delta):
+    cache.add(key, 0, CELERY_QUEUE_METRICS_TIMEOUT)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, CELERY_QUEUE_METRICS_TIMEOUT)
+
+
+def record_wait_time(queue, wait):
+    wait_ms = int(wait * 1000)
+    increment(queue_metrics_key(queue, 'started'), 1)
+    increment(queue_metrics_key(queue, 'wait_ms'), wait_ms)
+    cache.set(queue_metrics_key(queue, 'last_wait_ms'), wait_ms, CELERY_QUEUE_METRICS_TIMEOUT)
+    max_key = queue_metrics_key(queue, 'max_wait_ms')
+    if wait_ms > (cache.get(max_key) or 0):
+        cache.set(max_key, wait_ms, CELERY_QUEUE_METRICS_TIMEOUT)
+
+
+@before_task_publish.connect
+def add_publish_time(headers=None, **kwargs):
+    if headers is not None:
+        headers['published_at'] = time.time()
+
+
+@task_prerun.connect
+def record_task_wait_time(task=None, **kwargs):
+    request = task.request
+    published_at = getattr(request, 'published_at', None)
+    if published_at is None:
+        published_at = (getattr(request, 'headers', None) or {}).get('published_at')
+    queue = (request.delivery_info or {}).get('routing_key')
+    if published_at is None or queue is None:
+        return
+    record_wait_time(queue, max(time.time() - published_at, 0))
+
+
+def get_queue_depths(app, queues):
+    depths = {}
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue in queues:
+            try:
+                depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+            except Exception:
+                depths[queue] = None
+    return depths
+
+
+def get_queue_metrics(app):
+    queues = [queue.name for queue in app.conf.task_queues or []]
+    depths = get_queue_depths(app, queues)
+    metrics = {}
+    for queue in queues:
+        started = cache.get(queue_metrics_key(queue, 'started')) or 0
+        wait_ms = cache.get(queue_metrics_key(queue, 'wait_ms')) or 0
+        metrics[queue] = {
+            'depth': depths.get(queue),
+            'started': started,
+            'avg_wait_ms': wait_ms // started if started else 0,
+            'last_wait_ms': cache.get(queue_metrics_key(queue, 'last_wait_ms')) or 0,
+            'max_wait_ms': cache.get(queue_metrics_key(queue, 'max_wait_ms')) or 0,
+        }
+    return metrics
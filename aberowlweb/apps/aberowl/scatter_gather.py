@@ -0,0 +1,127 @@
+# Scatter-gather of the DL queries without an ontology
+#
+# Instead of one runQuery.groovy request running the query on every
+# ontology of one process, the query is sent to every loaded ontology
+# separately, DL_QUERY_MAX_WORKERS requests at a time. As runQuery.groovy
+# did, the results are returned without their axioms. An ontology gets
+# DL_QUERY_ONTOLOGY_TIMEOUT seconds to answer and the whole query
+# DL_QUERY_TIMEOUT seconds. The results which arrived in time are returned
+# with the ontologies which timed out or failed, or streamed as JSON lines
+# while the ontologies answer.
+
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import json
+import time
+
+import requests
+from django.conf import settings
+
+from aberowl import ontapi_registry
+from aberowl.models import Ontology
+
+DL_QUERY_MAX_WORKERS = getattr(settings, 'DL_QUERY_MAX_WORKERS', 16)
+DL_QUERY_ONTOLOGY_TIMEOUT = getattr(settings, 'DL_QUERY_ONTOLOGY_TIMEOUT', 10)
+DL_QUERY_TIMEOUT = getattr(settings, 'DL_QUERY_TIMEOUT', 60)
+
+OK = 'ok'
+TIMEOUT = 'timeout'
+FAILED = 'failed'
+
+
+def get_targets():
+    # Routes of the ontologies loaded by the ontology API processes, with
+    # lazy loading a query does not load every registered ontology
+    return ontapi_registry.get_loaded_routes(Ontology.objects.values_list('acronym', flat=True))
+
+
+def query_ontology(url, acronym, params, deadline, ontology_timeout):
+    # Runs in a worker thread, returns (acronym, status, result or message)
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return acronym, TIMEOUT, 'Not queried before the deadline'
+    try:
+        r = requests.get(url + 'runQuery.groovy', params=dict(params, ontology=acronym),
+                         timeout=min(ontology_timeout, remaining))
+        data = r.json()
+    except requests.Timeout:
+        return acronym, TIMEOUT, 'No answer after %s seconds' % (ontology_timeout,)
+    except Exception as e:
+        return acronym, FAILED, str(e)
+    if r.status_code != 200 or not isinstance(data, dict) or 'result' not in data:
+        message = data.get('message') if isinstance(data, dict) else None
+        return acronym, FAILED, message or 'Status %d' % (r.status_code,)
+    return acronym, OK, data['result']
+
+
+def scatter(query, query_type, labels=None, direct=None, targets=None,
+            max_workers=DL_QUERY_MAX_WORKERS, ontology_timeout=DL_QUERY_ONTOLOGY_TIMEOUT,
+            timeout=DL_QUERY_TIMEOUT):
+    # Yields (acronym, status, result or message) as the ontologies answer,
+    # then the ontologies still running at the deadline as timed out
+    if targets is None:
+        targets = get_targets()
+    if not targets:
+        return
+    params = {'query': query, 'type': query_type, 'axioms': 'false', 'labels': labels, 'direct': direct}
+    params = {key: value for key, value in params.items() if value is not None}
+    deadline = time.monotonic() + timeout
+    executor = ThreadPoolExecutor(max_workers=max(min(max_workers, len(targets)), 1))
+    futures = [
+        executor.submit(query_ontology, url, acronym, params, deadline, ontology_timeout)
+        for acronym, url in sorted(targets.items())]
+    pending = set(targets)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            acronym, status, data = future.result()
+            pending.discard(acronym)
+            yield acronym, status, data
+    except FuturesTimeoutError:
+        pass
+    finally:
+        # Queued requests see the deadline and return at once
+        executor.shutdown(wait=False)
+    for acronym in sorted(pending):
+        yield acronym, TIMEOUT, 'No answer before the deadline'
+
+
+def gather(query, query_type, labels=None, direct=None, **kwargs):
+    start = time.monotonic()
+    results = {}
+    timeouts = []
+    failures = []
+    for acronym, status, data in scatter(query, query_type, labels, direct, **kwargs):
+        if status == OK:
+            results[acronym] = data
+        elif status == TIMEOUT:
+            timeouts.append(acronym)
+        else:
+            failures.append({'ontology': acronym, 'message': data})
+    return {
+        # In ontology order, so that pages do not depend on the answer order
+        'result': [item for acronym in sorted(results) for item in results[acronym]],
+        'time': int((time.monotonic() - start) * 1000),
+        'complete': not timeouts and not failures,
+        'timeout': sorted(timeouts),
+        'failed': sorted(failures, key=lambda failure: failure['ontology']),
+    }
+
+
+def stream(query, query_type, labels=None, direct=None, **kwargs):
+    # One JSON line per ontology as it answers and a last line with the
+    # ontologies which timed out or failed
+    timeouts = []
+    failures = []
+    for acronym, status, data in scatter(query, query_type, labels, direct, **kwargs):
+        line = {'ontology': acronym, 'status': status}
+        if status == OK:
+            line['result'] = data
+        else:
+            line['message'] = data
+            (timeouts if status == TIMEOUT else failures).append(acronym)
+        yield json.dumps(line) + '\n'
+    yield json.dumps({
+        'status': 'done',
+        'complete': not timeouts and not failures,
+        'timeout': timeouts,
+        'failed': failures,
+    }) + '\n'
@@ -0,0 +1,102 @@
+# Builder for elasticsearch queries used by the search API views
+#
+# Exact match constraints (ontology, class, deprecated) are added in filter
+# context so that elasticsearch does not score them and can cache them as
+# bitsets. Scoring clauses go to must/should. The size of a search is always
+# clamped to ELASTIC_SEARCH_MAX_SIZE.
+
+from django.conf import settings
+
+ELASTIC_SEARCH_DEFAULT_SIZE = getattr(settings, 'ELASTIC_SEARCH_DEFAULT_SIZE', 10)
+ELASTIC_SEARCH_MAX_SIZE = getattr(settings, 'ELASTIC_SEARCH_MAX_SIZE', 100)
+
+DEFAULT_SOURCE_EXCLUDES = ['embedding_vector', ]
+
+
+def class_routing(ontology):
+    # Class documents are routed by lower-cased ontology acronym at index time
+    return ontology.lower()
+
+
+class SearchQueryBuilder:
+
+    def __init__(self, size=ELASTIC_SEARCH_DEFAULT_SIZE):
+        self.must_clauses = []
+        self.should_clauses = []
+        self.filter_clauses = []
+        self.source_includes = None
+        self.source_excludes = list(DEFAULT_SOURCE_EXCLUDES)
+        self.script = None
+        self.routing = None
+        self.set_size(size)
+
+    def set_size(self, size):
+        self.size = min(max(int(size), 1), ELASTIC_SEARCH_MAX_SIZE)
+        return self
+
+    def must(self, clause):
+        self.must_clauses.append(clause)
+        return self
+
+    def should(self, clause):
+        self.should_clauses.append(clause)
+        return self
+
+    def filter_term(self, field, value):
+        self.filter_clauses.append({'term': {field: value}})
+        return self
+
+    def filter_ontology(self, ontology):
+        self.routing = class_routing(ontology)
+        return self.filter_term('ontology', ontology)
+
+    def exclude_deprecated(self):
+        return self.filter_term('deprecated', False)
+
+    def source(self, includes=None, excludes=None):
+        self.source_includes = includes
+        self.source_excludes = excludes or []
+        return self
+
+    def script_score(self, script):
+        # Replaces the relevance score by the score computed by the script
+        self.script = script
+        return self
+
+    def build_query(self):
+        query = {}
+        if self.must_clauses:
+            query['must'] = self.must_clauses
+        if self.should_clauses:
+            query['should'] = self.should_clauses
+        if self.filter_clauses:
+            query['filter'] = self.filter_clauses
+        if not query:
+            return {'match_all': {}}
+        return {'bool': query}
+
+    def build(self):
+        query = self.build_query()
+        if self.script is not None:
+            query = {
+                'function_score': {
+                    'query': query,
+                    'boost_mode': 'replace',
+                    'script_score': {'script': self.script}
+                }
+            }
+
+        source = {}
+        if self.source_includes:
+            source['includes'] = self.source_includes
+        if self.source_excludes:
+            source['excludes'] = self.source_excludes
+
+        body = {
+            'query': query,
+            'from': 0,
+            'size': self.size,
+        }
+        if source:
+            body['_source'] = source
+        return body
@@ -0,0 +1,134 @@
+# Adaptive schedule of the ontology syncs
+#
+# Every sync records when an ontology was checked and when its content last
+# changed. The check interval starts from the median time between the
+# submissions of the ontology, is halved when a check finds a new file and
+# grows when it does not, within SYNC_MIN_INTERVAL and SYNC_MAX_INTERVAL
+# hours. The next check is jittered so that ontologies do not stay grouped
+# and the sync tasks, which run every hour, only start the due ontologies.
+# Acronyms of a source without an ontology (retired ontologies, ontologies
+# without a submission or failed listings) are backed off the same way in
+# the cache.
+
+from datetime import timedelta
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from aberowl.models import Ontology
+
+SYNC_MIN_INTERVAL = getattr(settings, 'SYNC_MIN_INTERVAL', 24)
+SYNC_MAX_INTERVAL = getattr(settings, 'SYNC_MAX_INTERVAL', 24 * 28)
+SYNC_DEFAULT_INTERVAL = getattr(settings, 'SYNC_DEFAULT_INTERVAL', 24 * 7)
+SYNC_INTERVAL_GROWTH = getattr(settings, 'SYNC_INTERVAL_GROWTH', 1.5)
+SYNC_JITTER = getattr(settings, 'SYNC_JITTER', 0.1)
+# Ontologies started by one run of a sync task, the most overdue first
+SYNC_MAX_ONTOLOGIES_PER_RUN = getattr(settings, 'SYNC_MAX_ONTOLOGIES_PER_RUN', 200)
+# Submissions used to estimate the interval of an ontology without one
+SYNC_HISTORY_SIZE = getattr(settings, 'SYNC_HISTORY_SIZE', 10)
+
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+
+def clamp_interval(interval):
+    return max(timedelta(hours=SYNC_MIN_INTERVAL), min(interval, timedelta(hours=SYNC_MAX_INTERVAL)))
+
+
+def get_history_interval(ontology):
+    # Median time between the submissions of the ontology, every submission
+    # of a synced ontology has a new md5sum
+    dates = list(ontology.submissions.order_by('-date_created').values_list(
+        'date_created', flat=True)[:SYNC_HISTORY_SIZE])
+    gaps = sorted(newer - older for newer, older in zip(dates, dates[1:]) if newer > older)
+    if not gaps:
+        return timedelta(hours=SYNC_DEFAULT_INTERVAL)
+    return clamp_interval(gaps[len(gaps) // 2])
+
+
+def get_next_interval(interval, outcome):
+    if outcome == CHANGED:
+        return clamp_interval(interval / 2)
+    if outcome == UNCHANGED:
+        return clamp_interval(interval * SYNC_INTERVAL_GROWTH)
+    return interval
+
+
+def record_check(ontology, outcome, now=None):
+    now = now or timezone.now()
+    interval = ontology.sync_interval or get_history_interval(ontology)
+    interval = get_next_interval(interval, outcome)
+    ontology.sync_interval = interval
+    ontology.date_checked = now
+    if outcome == CHANGED:
+        ontology.date_changed = now
+    elif ontology.date_changed is None:
+        latest = ontology.get_latest_submission()
+        ontology.date_changed = latest.date_created if latest else None
+    ontology.next_check = now + get_jittered_delay(interval, outcome)
+    ontology.save(update_fields=['sync_interval', 'date_checked', 'date_changed', 'next_check'])
+    return ontology.next_check
+
+
+def get_jittered_delay(interval, outcome):
+    # Failed checks are retried after the minimum interval
+    if outcome == FAILED:
+        delay = timedelta(hours=SYNC_MIN_INTERVAL)
+    else:
+        delay = interval
+    return delay * (1 + random.uniform(-SYNC_JITTER, SYNC_JITTER))
+
+
+def backoff_key(acronym):
+    return 'sync_backoff:%s' % (acronym,)
+
+
+def set_backoff(acronym, interval, next_check):
+    # Kept longer than the next check so that the interval keeps growing
+    cache.set(backoff_key(acronym), {'interval': interval, 'next_check': next_check},
+              timeout=int(timedelta(hours=SYNC_MAX_INTERVAL * 2).total_seconds()))
+
+
+def record_missing_check(acronym, outcome, now=None):
+    # Check of an acronym which has no ontology
+    now = now or timezone.now()
+    backoff = cache.get(backoff_key(acronym))
+    interval = backoff['interval'] if backoff else timedelta(hours=SYNC_MIN_INTERVAL)
+    if backoff and outcome == UNCHANGED:
+        interval = clamp_interval(interval * SYNC_INTERVAL_GROWTH)
+    next_check = now + get_jittered_delay(interval, outcome)
+    set_backoff(acronym, interval, next_check)
+    return next_check
+
+
+def claim_due_acronyms(acronyms, now=None, limit=SYNC_MAX_ONTOLOGIES_PER_RUN, sources=None):
+    # Ontologies never checked, including the new ones, come first and then
+    # the most overdue ones. The claimed ontologies are postponed so that a
+    # check still running is not started again by the next run. Ontologies
+    # stored with a source not in sources belong to another sync.
+    now = now or timezone.now()
+    next_checks = {}
+    known = set()
+    for acronym, next_check, source in Ontology.objects.filter(acronym__in=acronyms).values_list(
+            'acronym', 'next_check', 'source'):
+        known.add(acronym)
+        if sources is None or source in sources:
+            next_checks[acronym] = next_check
+    missing = [acronym for acronym in acronyms if acronym not in known]
+    backoffs = cache.get_many([backoff_key(acronym) for acronym in missing])
+    for acronym in missing:
+        backoff = backoffs.get(backoff_key(acronym))
+        next_checks[acronym] = backoff['next_check'] if backoff else None
+    due = [acronym for acronym in acronyms
+           if acronym in next_checks and (next_checks[acronym] is None or next_checks[acronym] <= now)]
+    due.sort(key=lambda acronym: (next_checks[acronym] is not None, next_checks[acronym] or now))
+    due = due[:limit]
+    postponed = now + timedelta(hours=SYNC_MIN_INTERVAL)
+    Ontology.objects.filter(acronym__in=due).update(next_check=postponed)
+    for acronym in set(due) & set(missing):
+        backoff = backoffs.get(backoff_key(acronym))
+        set_backoff(acronym, backoff['interval'] if backoff else timedelta(hours=SYNC_MIN_INTERVAL), postponed)
+    return set(due)
@@ -1,16 +1,23 @@
-from celery import shared_task
+from celery import shared_task, chain, group
 from celery.schedules import crontab
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Max, F
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
 from django.utils import timezone
 import requests
-import shutil
 from aberowlweb.celery import app
-from aberowl.models import Ontology, Submission
-from subprocess import Popen, PIPE, DEVNULL
+from aberowl.models import Ontology, Submission, ClassificationResult, ReindexJob, ReindexItem
+from aberowl.downloader import download_file, NOT_MODIFIED
+from aberowl.file_store import store_file, file_checksum
+from aberowl import embeddings, jvm_pool, ontapi_registry, sync_schedule, taxonomy
+from aberowl.jvm_pool import run_script, stream_cold, JVMWorkerError
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import json
 import os
+import shutil
 
 BIOPORTAL_API_URL = getattr(settings, 'BIOPORTAL_API_URL', 'http://data.bioontology.org/')
 BIOPORTAL_API_KEY = getattr(settings, 'BIOPORTAL_API_KEY', '24e0413e-54e0-11e0-9d7b-005056aa3316')
@@ -20,19 +27,39 @@ OBOFOUNDRY_API_URL = getattr(settings, 'OBOFOUNDRY_API_URL', 'http://obofoundry.
 ABEROWL_API_URL = getattr(settings, 'ABEROWL_API_URL', 'http://localhost:8080/api/')
 ABEROWL_API_WORKERS = getattr(settings, 'ABEROWL_API_WORKERS', ['http://localhost:8080/api/'])
 ABEROWL_SERVER_URL = getattr(settings, 'ABEROWL_SERVER_URL', 'http://localhost/')
+ABEROWL_RELOAD_MAX_UNAVAILABLE = getattr(settings, 'ABEROWL_RELOAD_MAX_UNAVAILABLE', 0.5)
+ABEROWL_RELOAD_TIMEOUT = getattr(settings, 'ABEROWL_RELOAD_TIMEOUT', 3600)
+ABEROWL_RELOAD_PARALLEL_ONTOLOGIES = getattr(settings, 'ABEROWL_RELOAD_PARALLEL_ONTOLOGIES', 2)
 
 ELASTIC_SEARCH_URL = getattr(settings, 'ELASTIC_SEARCH_URL', 'http://localhost:9200/')
 ELASTIC_SEARCH_USERNAME = getattr(settings, 'ELASTIC_SEARCH_USERNAME', '')
 ELASTIC_SEARCH_PASSWORD = getattr(settings, 'ELASTIC_SEARCH_PASSWORD', '')
 ELASTIC_ONTOLOGY_INDEX_NAME = getattr(settings, 'ELASTIC_ONTOLOGY_INDEX_NAME', 'aberowl_ontology')
 ELASTIC_CLASS_INDEX_NAME = getattr(settings, 'ELASTIC_CLASS_INDEX_NAME', 'aberowl_owlclass')
+ELASTIC_CLASS_INDEX_SHARD_SIZE = getattr(settings, 'ELASTIC_CLASS_INDEX_SHARD_SIZE', 5000000)
+ELASTIC_CLASS_INDEX_MAX_SHARDS = getattr(settings, 'ELASTIC_CLASS_INDEX_MAX_SHARDS', 16)
+ELASTIC_CLASS_INDEX_REPLICAS = getattr(settings, 'ELASTIC_CLASS_INDEX_REPLICAS', 1)
+ELASTIC_CLASS_INDEX_ROUTING_PARTITION_SIZE = getattr(settings, 'ELASTIC_CLASS_INDEX_ROUTING_PARTITION_SIZE', 1)
+
+# Cached classification results are only used with the same version
+CLASSIFIER_VERSION = getattr(settings, 'CLASSIFIER_VERSION', '1')
+# Classification also writes the taxonomy snapshot the ontology API starts from
+ONTAPI_SNAPSHOTS = getattr(settings, 'ONTAPI_SNAPSHOTS', True)
+
+SYNC_PENDING = 'pending'
+SYNC_DOWNLOADED = 'downloaded'
+SYNC_CLASSIFIED = 'classified'
+SYNC_INDEXED = 'indexed'
+SYNC_UNCHANGED = 'unchanged'
+SYNC_FAILED = 'failed'
 
 chem_ontologies = ('CHEBI', 'ENVO', 'REX', 'CHMO', 'PROCCHEMICAL', 'FIX', 'CHIRO', 'LIPRO', 'CHEMINF')
 
 
-@app.task(run_every=crontab(hour=12, minute=0, day_of_week=1))
-def sync_obofoundry(chem=False):
-    user = User.objects.get(pk=1)
+# The sync tasks run every hour and only start the ontologies that are due
+# according to sync_schedule, force=True checks all of them
+@app.task(run_every=crontab(minute=0))
+def sync_obofoundry(chem=False, force=False):
     timeout = 120
     params = {}
     try:
@@ -48,108 +75,32 @@ def sync_obofoundry(chem=False):
         print(e)
         return
 
-    for onto in data['ontologies']:
-        acronym = onto['id'].upper()
+    ontologies = [
+        onto for onto in data['ontologies']
+        if not onto.get('is_obsolete', False)
         # only for chemical ontology
-        if chem and acronym not in chem_ontologies:
-            continue
-        try:
-            if 'is_obsolete' in onto and onto['is_obsolete']:
-                continue
-
-            ontology, created = Ontology.objects.get_or_create(
-                acronym=acronym,
-                defaults={
-                    'name': onto['title'],
-                    'created_by': user,
-                    'source': Ontology.OBOFOUNDRY
-                }
-            )
-            if ontology.name != onto['title']:
-                ontology.name = onto['title']
-                ontology.save()
-                print('Ontology %s name updated to %s' % (acronym, onto['title'],))
-
-            if ontology.source != Ontology.OBOFOUNDRY:
-                ontology.source = Ontology.OBOFOUNDRY
-                ontology.save()
-
-            download_url = onto['ontology_purl']
-            filedir = (settings.MEDIA_ROOT + 'ontologies/' + acronym + '/')
-            if not os.path.exists(filedir):
-                os.makedirs(filedir)
-            filename = download_url.split('/')[-1]
-            file_ext = filename.split('.')[1]
-            filepath = filedir + filename
-            p = Popen(['curl', '-L', download_url, '-o', filepath])
-            if p.wait() == 0:
-                p = Popen(['md5sum', filepath], stdout=PIPE)
-                if p.wait() == 0:
-                    md5sum = p.stdout.read().strip().split()[0]
-                    md5sum = md5sum.decode('utf-8')
-                    print('MD5SUM:', md5sum)
-                    p.stdout.close()
-                    queryset = ontology.submissions.filter(md5sum=md5sum)
-                    if queryset.exists():  # Already uptodate
-                        continue
-            else:
-                print('Downloading ontology %s failed!' % (acronym,))
-                continue
-
-            submission_id = ontology.submissions.aggregate(
-                Max('submission_id'))['submission_id__max'] or 0
-            submission_id += 1
-
-            submission = Submission(
-                ontology=ontology,
-                submission_id=submission_id,
-                description=onto.get('description', ''),
-                has_ontology_language=file_ext.upper(),
-                date_released=timezone.now(),
-                date_created=timezone.now(),
-                home_page=onto.get('homepage', ''),
-                publications=onto.get('publications', None),
-                products=onto.get('products', None),
-                taxon=onto.get('taxon', None),
-                documentation=onto.get('documentation', None),
-                domain=onto.get('domain', None),
-                md5sum=md5sum,
-            )
-
-            shutil.move(filepath, submission.get_filepath())
-            shutil.copyfile(
-                submission.get_filepath(),
-                submission.get_filepath(folder='latest'))
-
-            filepath = '../' + submission.get_filepath()
-            result = classify_ontology(filepath)
-            if result['classifiable']:
-                submission.nb_inconsistent = result['incon']
-                submission.classifiable = result['classifiable']
-                submission.nb_classes = result['nb_classes']
-                submission.nb_properties = result['nb_properties']
-                submission.nb_individuals = result['nb_individuals']
-                submission.max_depth = result['max_depth']
-                submission.max_children = result['max_children']
-                submission.avg_children = result['avg_children']
-                submission.save()
-                ontology.status = result['status']
-                ontology.save()
-                ontIRI = ABEROWL_SERVER_URL + submission.get_filepath()
-                reload_ontology.delay(ontology.acronym, ontIRI)
-            else:
-                print('Classifying ontology %s failed!' % (acronym,))
-
-            if submission.classifiable:
-                index_submission(ontology.pk, submission.pk)
-
-        except Exception as e:
-            print(acronym, e)
-
-
-@app.task(run_every=crontab(hour=12, minute=0, day_of_week=2))
-def sync_bioportal(chem=False):
-    user = User.objects.get(pk=1)
+        and (not chem or onto['id'].upper() in chem_ontologies)]
+    if not force:
+        # BioPortal ontologies listed by the OBO Foundry are taken over
+        due = sync_schedule.claim_due_acronyms(
+            [onto['id'].upper() for onto in ontologies], sources=(Ontology.OBOFOUNDRY, Ontology.BIOPORTAL))
+        ontologies = [onto for onto in ontologies if onto['id'].upper() in due]
+
+    jobs = []
+    for onto in ontologies:
+        jobs.append(chain(
+            download_obofoundry_ontology.si(onto),
+            classify_synced_submission.s(),
+            index_synced_submission.s()))
+
+    if jobs:
+        start_sync_progress(Ontology.OBOFOUNDRY, len(jobs))
+        group(jobs).apply_async()
+    return len(jobs)
+
+
+@app.task(run_every=crontab(minute=30))
+def sync_bioportal(chem=False, force=False):
     params = {
         'apikey': BIOPORTAL_API_KEY,
         'format': 'json',
@@ -171,229 +122,809 @@ def sync_bioportal(chem=False):
         print(e)
         return
 
-    params['display'] = (
-            'hasOntologyLanguage,released,creationDate,homepage,status,' +
-            'publication,documentation,version,description,submissionId')
-    for onto in data:
-        acronym = onto['acronym']
+    # only for chemical ontology
+    ontologies = [onto for onto in data if not chem or onto['acronym'] in chem_ontologies]
+    if not force:
+        due = sync_schedule.claim_due_acronyms(
+            [onto['acronym'] for onto in ontologies], sources=(Ontology.BIOPORTAL,))
+        ontologies = [onto for onto in ontologies if onto['acronym'] in due]
+
+    jobs = []
+    for onto in ontologies:
+        jobs.append(chain(
+            download_bioportal_ontology.si(onto),
+            classify_synced_submission.s(),
+            index_synced_submission.s()))
+
+    if jobs:
+        start_sync_progress(Ontology.BIOPORTAL, len(jobs))
+        group(jobs).apply_async()
+    return len(jobs)
+
+
+# Every ontology of a sync runs as a chain of download, classify and index
+# stages. Each stage takes and returns a job dict, stages skip the work when
+# the job is not in the status they expect and the last stage records the
+# outcome in the sync progress counters.
+def new_sync_job(source, acronym):
+    return {
+        'source': source,
+        'acronym': acronym,
+        'ontology_pk': None,
+        'submission': None,
+        'submission_pk': None,
+        'status': SYNC_PENDING,
+    }
 
-        # only for chemical ontology
-        if chem and acronym not in chem_ontologies:
-            continue
-        try:
-            r = requests.get(
-                BIOPORTAL_API_URL + 'ontologies/' + acronym + '/latest_submission',
-                params)
-            if r.status_code != 200:
-                print('Unable to load latest submission for %s' % (acronym,))
-                continue
-            sub = r.json()
-            if sub.get('submissionId', None) is None or sub.get('status', None) == 'retired':
-                continue
-
-            ontology, created = Ontology.objects.get_or_create(
-                acronym=acronym,
-                defaults={
-                    'name': onto['name'],
-                    'created_by': user,
-                    'source': Ontology.BIOPORTAL
-                }
-            )
-
-            if ontology.name != onto['name'] and ontology.source == Ontology.BIOPORTAL:
-                ontology.name = onto['name']
-                ontology.save()
-                print('Ontology %s name updated to %s' % (acronym, onto['name'],))
-
-            if ontology.source != Ontology.BIOPORTAL:
-                continue
-
-            queryset = ontology.submissions.filter(
-                submission_id=sub['submissionId'])
-            if queryset.exists():  # Already uptodate
-                submission = queryset.get()
-                if not submission.indexed and submission.classifiable:
-                    index_submission(ontology.pk, submission.pk)
-                continue
-
-            submission = Submission(
-                ontology=ontology,
-                submission_id=sub['submissionId'],
-                description=sub['description'],
-                has_ontology_language=sub['hasOntologyLanguage'],
-                date_released=sub['released'],
-                date_created=sub['creationDate'],
-                home_page=sub['homepage'],
-                publication=sub['publication'],
-                documentation=sub['documentation'],
-                version=sub['version']
-            )
-            download_url = (BIOPORTAL_API_URL + 'ontologies/' + acronym
-                            + '/download?apikey=' + BIOPORTAL_API_KEY)
-            filepath = submission.get_filepath() + '.donwload'
-            p = Popen(['curl', '-L', download_url, '-o', filepath])
-            if p.wait() == 0:
-                shutil.move(filepath, submission.get_filepath())
-                shutil.copyfile(
-                    submission.get_filepath(),
-                    submission.get_filepath(folder='latest'))
-            else:
-                print('Downloading ontology %s failed!' % (acronym,))
-                continue
-            filepath = '../' + submission.get_filepath()
-            result = classify_ontology(filepath)
-            if result['classifiable']:
-                submission.nb_inconsistent = result['incon']
-                submission.classifiable = result['classifiable']
-                submission.nb_classes = result['nb_classes']
-                submission.nb_properties = result['nb_properties']
-                submission.nb_individuals = result['nb_individuals']
-                submission.max_depth = result['max_depth']
-                submission.max_children = result['max_children']
-                submission.avg_children = result['avg_children']
-                submission.save()
-                ontology.status = result['status']
-                ontology.save()
-                ontIRI = ABEROWL_SERVER_URL + submission.get_filepath()
-                reload_ontology.delay(ontology.acronym, ontIRI)
+
+def save_download_validators(ontology, download):
+    # Stored only once the content became a submission or matched one, so
+    # that files which failed to classify are downloaded again
+    ontology.download_etag = download['etag']
+    ontology.download_last_modified = download['last_modified']
+    ontology.save(update_fields=['download_etag', 'download_last_modified'])
+
+
+def get_sync_job_submission(job):
+    ontology = Ontology.objects.get(pk=job['ontology_pk'])
+    return Submission(ontology=ontology, **job['submission'])
+
+
+@shared_task
+def download_obofoundry_ontology(onto):
+    acronym = onto['id'].upper()
+    job = new_sync_job(Ontology.OBOFOUNDRY, acronym)
+    try:
+        user = User.objects.get(pk=1)
+        ontology, created = Ontology.objects.get_or_create(
+            acronym=acronym,
+            defaults={
+                'name': onto['title'],
+                'created_by': user,
+                'source': Ontology.OBOFOUNDRY
+            }
+        )
+        job['ontology_pk'] = ontology.pk
+        if ontology.name != onto['title']:
+            ontology.name = onto['title']
+            ontology.save()
+            print('Ontology %s name updated to %s' % (acronym, onto['title'],))
+
+        if ontology.source != Ontology.OBOFOUNDRY:
+            ontology.source = Ontology.OBOFOUNDRY
+            ontology.save()
+
+        download_url = onto['ontology_purl']
+        filedir = (settings.MEDIA_ROOT + 'ontologies/' + acronym + '/')
+        if not os.path.exists(filedir):
+            os.makedirs(filedir)
+        filename = download_url.split('/')[-1]
+        file_ext = filename.split('.')[1]
+        filepath = filedir + filename
+        result = download_file(
+            download_url, filepath, ontology.download_etag, ontology.download_last_modified)
+        if result['status'] == NOT_MODIFIED:  # Already uptodate
+            job['status'] = SYNC_UNCHANGED
+            return job
+        md5sum = result['md5sum']
+        print('MD5SUM:', md5sum)
+        if ontology.submissions.filter(md5sum=md5sum).exists():  # Already uptodate
+            os.remove(filepath)
+            save_download_validators(ontology, result)
+            job['status'] = SYNC_UNCHANGED
+            return job
+        job['download'] = {'etag': result['etag'], 'last_modified': result['last_modified']}
+
+        submission_id = ontology.submissions.aggregate(
+            Max('submission_id'))['submission_id__max'] or 0
+        submission_id += 1
+
+        job['submission'] = {
+            'submission_id': submission_id,
+            'description': onto.get('description', ''),
+            'has_ontology_language': file_ext.upper(),
+            'date_released': timezone.now().isoformat(),
+            'date_created': timezone.now().isoformat(),
+            'home_page': onto.get('homepage', ''),
+            'publications': onto.get('publications', None),
+            'products': onto.get('products', None),
+            'taxon': onto.get('taxon', None),
+            'documentation': onto.get('documentation', None),
+            'domain': onto.get('domain', None),
+            'md5sum': md5sum,
+        }
+        submission = get_sync_job_submission(job)
+        store_file(filepath, [
+            submission.get_filepath(), submission.get_filepath(folder='latest')], md5sum)
+        job['status'] = SYNC_DOWNLOADED
+    except Exception as e:
+        print(acronym, e)
+        job['status'] = SYNC_FAILED
+    return job
+
+
+@shared_task
+def download_bioportal_ontology(onto):
+    acronym = onto['acronym']
+    job = new_sync_job(Ontology.BIOPORTAL, acronym)
+    params = {
+        'apikey': BIOPORTAL_API_KEY,
+        'format': 'json',
+        'display_links': 'false',
+        'display_context': 'false',
+        'include_views': 'false',
+        'display': ('hasOntologyLanguage,released,creationDate,homepage,status,'
+                    + 'publication,documentation,version,description,submissionId')
+    }
+    try:
+        user = User.objects.get(pk=1)
+        r = requests.get(
+            BIOPORTAL_API_URL + 'ontologies/' + acronym + '/latest_submission',
+            params)
+        if r.status_code != 200:
+            print('Unable to load latest submission for %s' % (acronym,))
+            job['status'] = SYNC_FAILED
+            return job
+        sub = r.json()
+        if sub.get('submissionId', None) is None or sub.get('status', None) == 'retired':
+            job['status'] = SYNC_UNCHANGED
+            return job
+
+        ontology, created = Ontology.objects.get_or_create(
+            acronym=acronym,
+            defaults={
+                'name': onto['name'],
+                'created_by': user,
+                'source': Ontology.BIOPORTAL
+            }
+        )
+        job['ontology_pk'] = ontology.pk
+
+        if ontology.name != onto['name'] and ontology.source == Ontology.BIOPORTAL:
+            ontology.name = onto['name']
+            ontology.save()
+            print('Ontology %s name updated to %s' % (acronym, onto['name'],))
+
+        if ontology.source != Ontology.BIOPORTAL:
+            job['status'] = SYNC_UNCHANGED
+            return job
+
+        queryset = ontology.submissions.filter(
+            submission_id=sub['submissionId'])
+        if queryset.exists():  # Already uptodate
+            submission = queryset.get()
+            job['submission_pk'] = submission.pk
+            if not submission.indexed and submission.classifiable:
+                job['status'] = SYNC_CLASSIFIED
             else:
-                print('Classifying ontology %s failed!' % (acronym,))
+                job['status'] = SYNC_UNCHANGED
+            return job
+
+        job['submission'] = {
+            'submission_id': sub['submissionId'],
+            'description': sub['description'],
+            'has_ontology_language': sub['hasOntologyLanguage'],
+            'date_released': sub['released'],
+            'date_created': sub['creationDate'],
+            'home_page': sub['homepage'],
+            'publication': sub['publication'],
+            'documentation': sub['documentation'],
+            'version': sub['version']
+        }
+        submission = get_sync_job_submission(job)
+        download_url = BIOPORTAL_API_URL + 'ontologies/' + acronym + '/download'
+        result = download_file(
+            download_url, submission.get_filepath(), ontology.download_etag,
+            ontology.download_last_modified, params={'apikey': BIOPORTAL_API_KEY})
+        if result['status'] == NOT_MODIFIED:  # Already uptodate
+            job['status'] = SYNC_UNCHANGED
+            return job
+        if ontology.submissions.filter(md5sum=result['md5sum']).exists():  # Already uptodate
+            os.remove(submission.get_filepath())
+            save_download_validators(ontology, result)
+            job['status'] = SYNC_UNCHANGED
+            return job
+        job['submission']['md5sum'] = result['md5sum']
+        job['download'] = {'etag': result['etag'], 'last_modified': result['last_modified']}
+        store_file(submission.get_filepath(), [
+            submission.get_filepath(), submission.get_filepath(folder='latest')], result['md5sum'])
+        job['status'] = SYNC_DOWNLOADED
+    except Exception as e:
+        print(acronym, e)
+        job['status'] = SYNC_FAILED
+    return job
 
-            if submission.classifiable:
-                index_submission(ontology.pk, submission.pk)
 
-        except Exception as e:
-            print(acronym, e)
+@shared_task
+def classify_synced_submission(job):
+    if job['status'] != SYNC_DOWNLOADED:
+        return job
+    try:
+        submission = get_sync_job_submission(job)
+        ontology = submission.ontology
+        filepath = '../' + submission.get_filepath()
+        # Class documents of the index stage are written in the same pass
+        result = classify_ontology(
+            filepath, submission.md5sum, ontology.acronym, '../' + submission.get_classes_filepath(),
+            get_snapshot_argument(submission))
+        if result['classifiable']:
+            set_submission_metrics(submission, result)
+            submission.save()
+            ontology.status = result['status']
+            ontology.save()
+            import_submission_taxonomy(submission)
+            if job.get('download'):
+                save_download_validators(ontology, job['download'])
+            ontIRI = ABEROWL_SERVER_URL + submission.get_filepath()
+            reload_ontology.delay(ontology.acronym, ontIRI)
+            job['submission_pk'] = submission.pk
+            job['status'] = SYNC_CLASSIFIED
+        else:
+            print('Classifying ontology %s failed!' % (job['acronym'],))
+            job['status'] = SYNC_FAILED
+    except Exception as e:
+        print(job['acronym'], e)
+        job['status'] = SYNC_FAILED
+    return job
+
+
+def get_snapshot_argument(submission):
+    # Relative to the scripts folder, empty when neither the ontology API nor
+    # the taxonomy tables use snapshots
+    if not ONTAPI_SNAPSHOTS and not taxonomy.TAXONOMY_TABLES:
+        return ''
+    return '../' + submission.get_snapshot_filepath()
+
+
+def import_submission_taxonomy(submission):
+    # Hierarchy queries fall back to the ontology API when this fails
+    try:
+        taxonomy.import_taxonomy(submission)
+    except Exception as e:
+        print('Importing the taxonomy of %s failed: %s' % (submission, e))
+
+
+def set_submission_metrics(submission, result):
+    submission.nb_inconsistent = result['incon']
+    submission.classifiable = result['classifiable']
+    submission.status = result['status']
+    submission.nb_classes = result['nb_classes']
+    submission.nb_properties = result['nb_properties']
+    submission.nb_individuals = result['nb_individuals']
+    submission.max_depth = result['max_depth']
+    submission.max_children = result['max_children']
+    submission.avg_children = result['avg_children']
+
+
+@shared_task
+def validate_submission(submission_pk, previous_status=None):
+    # Classifies a file uploaded in the manage UI. It replaces the file of
+    # the submission only when it can be loaded, the web workers do not wait
+    # for the reasoner. The class documents and the snapshot are written next
+    # to the files of the submission and only replace them then, a failed
+    # edit of a valid submission keeps serving the previous file.
+    submission = Submission.objects.select_related('ontology').get(pk=submission_pk)
+    ontology = submission.ontology
+    upload_filepath = submission.get_upload_filepath()
+    checksum = file_checksum(upload_filepath)
+    artifacts = [(submission.get_classes_filepath() + '.validating', submission.get_classes_filepath())]
+    snapshot_argument = ''
+    if get_snapshot_argument(submission):
+        artifacts.append((submission.get_snapshot_filepath() + '.validating', submission.get_snapshot_filepath()))
+        snapshot_argument = '../' + artifacts[-1][0]
+    result = classify_ontology(
+        '../' + upload_filepath, checksum, ontology.acronym, '../' + artifacts[0][0], snapshot_argument)
+    if not result['classifiable']:
+        print('Validating submission %s failed!' % (submission,))
+        for filepath in [upload_filepath] + [validating for validating, _ in artifacts]:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        if submission.classifiable and previous_status not in (None, Submission.VALIDATING):
+            submission.status = previous_status
+        else:
+            submission.status = Ontology.UNLOADABLE
+        submission.save(update_fields=['status'])
+        return False
+
+    for validating, filepath in artifacts:
+        if os.path.exists(validating):
+            os.replace(validating, filepath)
+    store_file(upload_filepath, [
+        submission.get_filepath(), submission.get_filepath('latest')], checksum)
+    # The checksum deduplicates later identical files and relinks the file
+    # from the store, it is unique per ontology
+    if ontology.submissions.filter(md5sum=checksum).exclude(pk=submission.pk).exists():
+        submission.md5sum = None
+    else:
+        submission.md5sum = checksum
+    set_submission_metrics(submission, result)
+    submission.save()
+    ontology.status = result['status']
+    ontology.save()
+    import_submission_taxonomy(submission)
+    ontIRI = ABEROWL_SERVER_URL + submission.get_filepath()
+    reload_ontology.delay(ontology.acronym, ontIRI)
+    index_submission.delay(ontology.pk, submission.pk)
+    return True
+
+
+def get_submission_status(submission):
+    return {
+        'submission_id': submission.submission_id,
+        'status': submission.status,
+        'validating': submission.status == Submission.VALIDATING,
+        'classifiable': submission.classifiable,
+        'indexed': submission.indexed,
+        'nb_classes': submission.nb_classes,
+        'live': submission.ontology.is_live(),
+    }
 
 
 @shared_task
-def classify_ontology(filepath):
-    p = Popen(
-        ['groovy', 'Classify.groovy', filepath],
-        cwd='scripts/', stderr=DEVNULL, stdout=PIPE)
-    if p.wait() == 0:
-        lines = p.stdout.readlines()
-        result = json.loads(lines[-1].decode('utf-8'))
-        return result
+def index_synced_submission(job):
+    try:
+        if job['status'] == SYNC_CLASSIFIED:
+            index_submission(job['ontology_pk'], job['submission_pk'])
+            submission = Submission.objects.get(pk=job['submission_pk'])
+            job['status'] = SYNC_INDEXED if submission.indexed else SYNC_FAILED
+    except Exception as e:
+        print(job['acronym'], e)
+        job['status'] = SYNC_FAILED
+
+    record_sync_check(job)
+    progress = update_sync_progress(job['source'], job['status'])
+    print('Sync %s: %s %s (%d/%d done, %d failed)' % (
+        job['source'], job['acronym'], job['status'],
+        progress['done'], progress['total'], progress['failed']))
+    return job
+
+
+def record_sync_check(job):
+    # A new submission means the ontology changed, a file matching the md5sum
+    # of a submission or an unchanged submission id means it did not
+    if job['status'] == SYNC_FAILED:
+        outcome = sync_schedule.FAILED
+    elif job['submission'] is not None:
+        outcome = sync_schedule.CHANGED
+    else:
+        outcome = sync_schedule.UNCHANGED
+    try:
+        if job['ontology_pk'] is None:
+            sync_schedule.record_missing_check(job['acronym'], outcome)
+            return
+        ontology = Ontology.objects.get(pk=job['ontology_pk'])
+        sync_schedule.record_check(ontology, outcome)
+    except Exception as e:
+        print(job['acronym'], e)
+
+
+def sync_progress_key(source, counter):
+    return 'sync_progress:%s:%s' % (source, counter)
+
+
+def start_sync_progress(source, total):
+    cache.set_many({
+        sync_progress_key(source, 'total'): total,
+        sync_progress_key(source, 'done'): 0,
+        sync_progress_key(source, 'failed'): 0,
+        sync_progress_key(source, 'updated'): 0,
+        sync_progress_key(source, 'started'): timezone.now().isoformat(),
+    }, timeout=None)
+
+
+def update_sync_progress(source, status):
+    if status == SYNC_FAILED:
+        cache.incr(sync_progress_key(source, 'failed'))
+    elif status == SYNC_INDEXED:
+        cache.incr(sync_progress_key(source, 'updated'))
+    cache.incr(sync_progress_key(source, 'done'))
+    return get_sync_progress(source)
+
+
+def get_sync_progress(source):
+    counters = ('total', 'done', 'failed', 'updated', 'started')
+    values = cache.get_many([sync_progress_key(source, counter) for counter in counters])
+    progress = {counter: values.get(sync_progress_key(source, counter), 0) for counter in counters}
+    progress['remaining'] = max(progress['total'] - progress['done'], 0)
+    return progress
+
+
+@shared_task
+def classify_ontology(filepath, checksum=None, acronym='', classes_filepath='', snapshot_filepath=''):
+    # Classification metrics are cached by file checksum, relative paths
+    # are relative to the scripts folder. The class documents are written to
+    # classes_filepath and the taxonomy snapshot of the ontology API to
+    # snapshot_filepath while the ontology is loaded for classification.
+    if checksum is None:
+        checksum = file_checksum(os.path.join('scripts/', filepath))
+    classifier_version = get_classifier_version()
+    cached = ClassificationResult.objects.filter(
+        checksum=checksum, classifier_version=classifier_version).first()
+    if cached is not None:
+        # The snapshot needs the reasoner, the cached metrics are kept
+        snapshot_missing = bool(snapshot_filepath) and not os.path.exists(
+            os.path.join('scripts/', snapshot_filepath))
+        if classes_filepath or snapshot_missing:
+            ingest_ontology(
+                filepath, acronym, classes_filepath, classify=False,
+                snapshot_filepath=snapshot_filepath if snapshot_missing else '')
+        return cached.result
+
+    result = ingest_ontology(filepath, acronym, classes_filepath, snapshot_filepath=snapshot_filepath)
+    if result['classifiable']:
+        ClassificationResult.objects.filter(checksum=checksum).exclude(
+            classifier_version=classifier_version).delete()
+        ClassificationResult.objects.get_or_create(
+            checksum=checksum, classifier_version=classifier_version,
+            defaults={'result': result})
+    return result
+
+
+def ingest_ontology(filepath, acronym='', classes_filepath='', classify=True, axioms=False, axioms_filepath='',
+                    snapshot_filepath=''):
+    # Loads the ontology once and, depending on the arguments, classifies
+    # it, writes the class documents to classes_filepath, the axiom corpus
+    # to axioms_filepath, filepath.axms by default, and the taxonomy
+    # snapshot to snapshot_filepath. Without classification only
+    # 'classifiable' is set.
+    args = [filepath, acronym, classes_filepath, str(classify).lower(), str(axioms).lower()]
+    if axioms_filepath or snapshot_filepath:
+        args.append(axioms_filepath)
+    if snapshot_filepath:
+        args.append(snapshot_filepath)
+    p = run_script('Ingest.groovy', args)
+    if p['returncode'] == 0:
+        lines = p['output'].splitlines()
+        return json.loads(lines[-1])
     return {'classifiable': False}
 
 
+def get_classifier_version():
+    # Changes with the CLASSIFIER_VERSION setting and with the script
+    with open('scripts/Ingest.groovy', 'rb') as f:
+        script_hash = hashlib.sha1(f.read()).hexdigest()
+    return CLASSIFIER_VERSION + '-' + script_hash[:12]
+
+
+# Settings used when the class index has to be created. The number of
+# shards grows with the total number of classes of the latest submissions.
+def get_class_index_settings():
+    latest = Ontology.objects.annotate(
+        latest_submission=Max('submissions__pk')).values('latest_submission')
+    total = Submission.objects.filter(pk__in=latest).aggregate(
+        Sum('nb_classes'))['nb_classes__sum'] or 0
+    nb_shards = -(-total // ELASTIC_CLASS_INDEX_SHARD_SIZE)
+    nb_shards = min(max(nb_shards, 1), ELASTIC_CLASS_INDEX_MAX_SHARDS)
+    return {
+        'number_of_shards': nb_shards,
+        'number_of_replicas': ELASTIC_CLASS_INDEX_REPLICAS,
+        # elasticsearch requires the partition size to be less than the shard count
+        'routing_partition_size': min(ELASTIC_CLASS_INDEX_ROUTING_PARTITION_SIZE, max(nb_shards - 1, 1)),
+    }
+
+
 @shared_task
 def index_submission(ontology_pk, submission_pk, skip_embedding=True, es_url=ELASTIC_SEARCH_URL,
-                     es_username=ELASTIC_SEARCH_USERNAME, es_password=ELASTIC_SEARCH_PASSWORD):
+                     es_username=ELASTIC_SEARCH_USERNAME, es_password=ELASTIC_SEARCH_PASSWORD, incremental=True):
     ontology = Ontology.objects.get(pk=ontology_pk)
     submission = ontology.submissions.get(pk=submission_pk)
     filepath = '../' + submission.get_filepath(folder='latest')
+    # Class documents written by the sync chain are consumed here, otherwise
+    # the ontology is loaded once for the class documents and the axioms
+    classes_filepath = submission.get_classes_filepath()
+    checksum = None
+    train = False
+    corpus_written = False
     if not skip_embedding:
-        generate_embeddings(filepath)
+        checksum = file_checksum(os.path.join('scripts/', filepath))
+        train = not embeddings.link_embeddings(checksum, get_classifier_version(), os.path.join('scripts/', filepath))
+    if not os.path.exists(classes_filepath):
+        # Streamed axioms are extracted by generate_embeddings
+        axioms = train and embeddings.EMBEDDINGS_TRAINER == 'word2vec'
+        result = ingest_ontology(
+            filepath, ontology.acronym, '../' + classes_filepath, classify=False, axioms=axioms)
+        if not result['classifiable']:
+            print('Loading ontology %s failed!' % (ontology.acronym))
+            return False
+        corpus_written = axioms
+    if train and not generate_embeddings(filepath, checksum, corpus_written):
+        print('Generating embeddings for %s failed, indexing without embeddings' % (ontology.acronym,))
+        skip_embedding = True
+
+    # Only classes whose content hash differs from the previously indexed
+    # submission are sent to elasticsearch. Without previous hashes the
+    # ontology is deleted and fully reindexed.
+    previous_hashes_filepath = ''
+    if incremental:
+        previous = ontology.submissions.filter(indexed=True).exclude(
+            pk=submission.pk).order_by('-pk').first()
+        if previous is not None and os.path.exists(previous.get_hashes_filepath()):
+            previous_hashes_filepath = '../' + previous.get_hashes_filepath()
 
-    p = Popen(
-        ['groovy', 'IndexElastic.groovy', es_url, es_username, es_password,
-         ELASTIC_ONTOLOGY_INDEX_NAME, ELASTIC_CLASS_INDEX_NAME, filepath, str(skip_embedding)],
-        stdin=PIPE,
-        cwd='scripts/')
     data = {
         'acronym': ontology.acronym,
         'name': ontology.name,
-        'description': submission.description
+        'description': submission.description,
+        'index_settings': get_class_index_settings(),
+        'classes_file': '../' + classes_filepath,
     }
-    p.stdin.write(json.dumps(data).encode('utf-8'))
-    p.stdin.close()
-
-    if p.wait() == 0:
+    p = run_script(
+        'IndexElastic.groovy',
+        [es_url, es_username, es_password,
+         ELASTIC_ONTOLOGY_INDEX_NAME, ELASTIC_CLASS_INDEX_NAME, filepath, str(skip_embedding),
+         '../' + submission.get_hashes_filepath(), previous_hashes_filepath],
+        stdin=json.dumps(data))
+    print(p['output'], end='')
+    if os.path.exists(classes_filepath):
+        os.remove(classes_filepath)
+
+    if p['returncode'] == 0:
         print('Indexing ontology %s finished' % (ontology.acronym))
         submission.indexed = True
     else:
         print('Indexing ontology %s failed!' % (ontology.acronym))
 
     submission.save()
+    return p['returncode'] == 0
+
+
+def get_reload_parallelism(nb_workers):
+    # A worker reloading an ontology is busy loading and classifying it, at
+    # most this many workers reload the same ontology at once
+    parallelism = int(nb_workers * ABEROWL_RELOAD_MAX_UNAVAILABLE)
+    return min(max(parallelism, 1), nb_workers)
+
+
+def reload_on_worker(api_worker_url, ont, ontIRI):
+    print('Running request: ', api_worker_url)
+    try:
+        r = requests.get(
+            api_worker_url + 'reloadOntology.groovy',
+            params={'ontology': ont, 'ontologyIRI': ontIRI},
+            timeout=(10, ABEROWL_RELOAD_TIMEOUT))
+        result = r.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        result = {'status': 'error', 'message': str(e)}
+    result['worker'] = api_worker_url
+    print(result)
+    return result
+
+
+def get_reload_workers(acronym):
+    # The process serving the ontology or, when it is not loaded, the one
+    # runontapi assigned it to. Every worker of ABEROWL_API_WORKERS when the
+    # ontology API is not started by runontapi or does not know the ontology.
+    url = ontapi_registry.get_live_routes([acronym]).get(acronym) or ontapi_registry.get_assignment(acronym)
+    return [url] if url else ABEROWL_API_WORKERS
 
 
 @shared_task
 def reload_ontology(ont, ontIRI=None):
+    # Rolling reload, the workers are reloaded concurrently but never more
+    # than ABEROWL_RELOAD_MAX_UNAVAILABLE of them at once. Returns the result
+    # of every worker in the order of get_reload_workers.
     if ontIRI is None:
         ontologies = Ontology.objects.filter(acronym=ont)
         if len(ontologies) > 0:
             submission = ontologies[0].get_latest_submission()
             ontIRI = ABEROWL_SERVER_URL + submission.get_filepath()
 
-    responses = []
-    for api_worker_url in ABEROWL_API_WORKERS:
-        print('Running request: ', api_worker_url)
-        r = requests.get(
-            api_worker_url + 'reloadOntology.groovy',
-            params={'ontology': ont, 'ontologyIRI': ontIRI})
-        print(r.json())
-        responses.append(r.json())
-    return responses
+    workers = get_reload_workers(ont)
+    if not workers:
+        return []
+    parallelism = get_reload_parallelism(len(workers))
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        return list(executor.map(
+            lambda api_worker_url: reload_on_worker(api_worker_url, ont, ontIRI), workers))
 
 
 @app.task(run_every=crontab(hour=12, minute=0, day_of_week=1))
 def retry_unloadable_ontology():
-    ontologies = Ontology.objects.filter(
-        status=Ontology.UNLOADABLE)
-
-    unloadable = []
-    for ont in ontologies:
-        results = reload_ontology(ont.acronym)
-        ontResult = {'ontology': ont.acronym, 'results': []}
-        for result in results:
-            if result['status'] and result['status'] == 'ok':
-                ontResult['results'].append(True)
-            else:
-                ontResult['results'].append(False)
-        unloadable.append(ontResult)
-
-    for ontology in unloadable:
-        server_count = 0
-        for result in ontology['results']:
-            if result:
-                server_count += 1
-            else:
-                server_count -= 1
+    acronyms = list(Ontology.objects.filter(
+        status=Ontology.UNLOADABLE).values_list('acronym', flat=True))
 
-        if server_count == len(ABEROWL_API_WORKERS):
+    def reload(acronym):
+        try:
+            return reload_ontology(acronym)
+        finally:
+            connection.close()
+
+    # Every ontology is reloaded on its workers, a few ontologies at once
+    with ThreadPoolExecutor(max_workers=ABEROWL_RELOAD_PARALLEL_ONTOLOGIES) as executor:
+        results = list(executor.map(reload, acronyms))
+
+    for acronym, ontology_results in zip(acronyms, results):
+        if ontology_results and all(result.get('status') == 'ok' for result in ontology_results):
             try:
-                Ontology.objects.filter(acronym=ontology.acronym).update(status=Ontology.CLASSIFIED,
-                                                                         nb_servers=F('nb_servers') + server_count)
+                Ontology.objects.filter(acronym=acronym).update(status=Ontology.CLASSIFIED)
             except Exception as e:
                 print('Exception:', e)
 
 
 @shared_task
-def generate_embeddings(filepath):
-    p = Popen(
-        ['groovy', 'Axioms.groovy', filepath],
-        cwd='scripts/', stderr=DEVNULL, stdout=PIPE)
-    result = {'classifiable': False}
-    if p.wait() == 0:
-        lines = p.stdout.readlines()
-        result = json.loads(lines[-1].decode('utf-8'))
-    if not result['classifiable']:
-        return result
-    p = Popen(
-        ['word2vec', '-train', (filepath + '.axms'),
-         '-output', (filepath + '.embs'), '-size', '256',
-         '-min-count', '1', '-iter', '50'],
-        cwd='scripts/', stderr=DEVNULL, stdout=DEVNULL)
-    if p.wait() == 0:
+def generate_embeddings(filepath, checksum=None, corpus_written=False, threads=embeddings.EMBEDDINGS_THREADS):
+    # Axiom corpora and embeddings are cached by file checksum, see
+    # aberowl.embeddings. The cached embeddings are linked to filepath.embs.
+    # corpus_written tells that filepath.axms was just written by Ingest.
+    local_filepath = os.path.join('scripts/', filepath)
+    if checksum is None:
+        checksum = file_checksum(local_filepath)
+    corpus_version = get_classifier_version()
+    if embeddings.link_embeddings(checksum, corpus_version, local_filepath):
+        return True
+    embeddings_filepath = embeddings.get_embeddings_filepath(checksum, corpus_version)
+    if embeddings.EMBEDDINGS_TRAINER == 'gensim':
+        result = {}
+        try:
+            trained = embeddings.train_stream(
+                stream_axioms(filepath, result), embeddings_filepath,
+                check=lambda: result.get('classifiable'), threads=threads)
+        except (JVMWorkerError, ValueError) as e:
+            print('Streaming the axioms of', filepath, 'failed:', e)
+            return False
+        if not trained:
+            return False
         print('Successfully generated embeddings for ', filepath)
-    return result
+        return embeddings.link_embeddings(checksum, corpus_version, local_filepath)
+
+    corpus_filepath = embeddings.get_corpus_filepath(checksum, corpus_version)
+    if not os.path.exists(corpus_filepath):
+        if not corpus_written:
+            result = ingest_ontology(filepath, classify=False, axioms=True)
+            if not result['classifiable']:
+                return False
+        os.makedirs(os.path.dirname(corpus_filepath), exist_ok=True)
+        shutil.move(local_filepath + '.axms', corpus_filepath)
+    elif corpus_written:
+        os.remove(local_filepath + '.axms')
+    if not embeddings.train(corpus_filepath, embeddings_filepath, threads=threads):
+        return False
+    print('Successfully generated embeddings for ', filepath)
+    return embeddings.link_embeddings(checksum, corpus_version, local_filepath)
+
+
+def stream_axioms(filepath, result):
+    # Yields the axiom sentences Ingest.groovy prints while it runs, the
+    # metrics of the last line are stored in result
+    previous = None
+    for line in stream_cold('Ingest.groovy', [filepath, '', '', 'false', 'true', '-']):
+        if previous is not None:
+            yield previous
+        previous = line
+    if previous is not None:
+        result.update(json.loads(previous))
+
+
+def generate_all_embeddings(nb_cpus=os.cpu_count(), threads=embeddings.EMBEDDINGS_THREADS):
+    # Trains the embeddings of the latest classified submissions, as many
+    # at once as fit in nb_cpus with threads per word2vec process. Only
+    # ontologies without cached embeddings are trained.
+    parallelism = max(nb_cpus // max(threads, 1), 1)
+    jvm_pool.pool.resize(parallelism)
+    filepaths = []
+    for ontology in Ontology.objects.filter(status=Ontology.CLASSIFIED).order_by('acronym'):
+        submission = ontology.get_latest_submission()
+        if submission is not None:
+            filepaths.append('../' + submission.get_filepath(folder='latest'))
+
+    def generate(filepath):
+        try:
+            return generate_embeddings(filepath, threads=threads)
+        except Exception as e:
+            print('Generating embeddings for', filepath, 'failed:', e)
+            return False
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        results = list(executor.map(generate, filepaths))
+    return {'total': len(results), 'done': results.count(True), 'failed': results.count(False)}
+
+
+# Reindexing of all the ontologies is tracked with a ReindexJob that has one
+# ReindexItem per ontology. Items are claimed by worker threads, so a job
+# that stopped can be resumed and only the unfinished items are indexed.
+def create_reindex_job(skip_embedding, es_url=ELASTIC_SEARCH_URL):
+    job = ReindexJob.objects.create(skip_embedding=skip_embedding, es_url=es_url)
+    items = []
+    for ontology in Ontology.objects.filter(status=Ontology.CLASSIFIED).order_by('acronym'):
+        submission = ontology.get_latest_submission()
+        if submission is not None:
+            items.append(ReindexItem(
+                job=job, ontology=ontology, submission=submission, nb_classes=submission.nb_classes or 0))
+    ReindexItem.objects.bulk_create(items)
+    return job
+
+
+def resume_reindex_job(job):
+    # Items that were running when the job stopped and failed items are retried
+    job.items.filter(status__in=[ReindexJob.RUNNING, ReindexJob.FAILED]).update(
+        status=ReindexJob.PENDING, date_started=None, date_finished=None)
+    return job
+
+
+def get_unfinished_reindex_job():
+    return ReindexJob.objects.exclude(status=ReindexJob.DONE).order_by('-pk').first()
+
+
+def claim_reindex_item(job):
+    with transaction.atomic():
+        item = job.items.select_for_update(skip_locked=True).filter(
+            status=ReindexJob.PENDING).order_by('pk').first()
+        if item is None:
+            return None
+        item.status = ReindexJob.RUNNING
+        item.date_started = timezone.now()
+        item.save()
+    return item
+
+
+def run_reindex_worker(job, es_username, es_password):
+    while True:
+        item = claim_reindex_item(job)
+        if item is None:
+            break
+        print('Indexing ontology %s started' % (item.ontology.acronym))
+        try:
+            indexed = index_submission(
+                item.ontology_id, item.submission_id, job.skip_embedding, job.es_url,
+                es_username, es_password, incremental=False)
+        except Exception as e:
+            print(item.ontology.acronym, e)
+            indexed = False
+        item.status = ReindexJob.DONE if indexed else ReindexJob.FAILED
+        item.date_finished = timezone.now()
+        item.save()
+
+
+def run_reindex_job(job, parallelism=1, es_username=ELASTIC_SEARCH_USERNAME, es_password=ELASTIC_SEARCH_PASSWORD):
+    job.status = ReindexJob.RUNNING
+    job.date_started = timezone.now()
+    job.save()
+    if parallelism > 1:
+        jvm_pool.pool.resize(parallelism)
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            futures = [
+                executor.submit(run_reindex_thread, job, es_username, es_password)
+                for i in range(parallelism)]
+            for future in futures:
+                future.result()
+    else:
+        run_reindex_worker(job, es_username, es_password)
 
+    failed = job.items.exclude(status=ReindexJob.DONE).exists()
+    job.status = ReindexJob.FAILED if failed else ReindexJob.DONE
+    job.date_finished = timezone.now()
+    job.save()
+    return job
 
-@shared_task
-def reload_indexes(skip_embedding, es_url=ELASTIC_SEARCH_URL, es_username=ELASTIC_SEARCH_USERNAME,
-                   es_password=ELASTIC_SEARCH_PASSWORD):
+
+def run_reindex_thread(job, es_username, es_password):
     try:
-        ontologies = Ontology.objects.filter(
-            status=Ontology.CLASSIFIED)
-        for ontology in ontologies:
-            submission = ontology.get_latest_submission()
-            print('Indexing ontology %s started' % (ontology.acronym))
-            index_submission(ontology.pk, submission.pk, skip_embedding, es_url, es_username, es_password)
+        run_reindex_worker(job, es_username, es_password)
+    finally:
+        connection.close()
 
-    except Exception as e:
-        print(e)
+
+def get_reindex_progress(job):
+    progress = {'total': 0, 'classes_total': 0, 'classes_done': 0}
+    for status, _ in ReindexJob.STATUS_CHOICES:
+        progress[status] = 0
+    for item in job.items.values('status').annotate(count=Count('pk'), classes=Sum('nb_classes')):
+        progress[item['status']] = item['count']
+        progress['total'] += item['count']
+        progress['classes_total'] += item['classes']
+        if item['status'] == ReindexJob.DONE:
+            progress['classes_done'] = item['classes']
+    return progress
+
+
+@shared_task
+def reload_indexes(skip_embedding, es_url=ELASTIC_SEARCH_URL, es_username=ELASTIC_SEARCH_USERNAME,
+                   es_password=ELASTIC_SEARCH_PASSWORD, parallelism=1):
+    job = create_reindex_job(skip_embedding, es_url)
+    run_reindex_job(job, parallelism, es_username, es_password)
+    return job.pk
 
 
 @shared_task
@@ -404,7 +935,7 @@ def reload_index(ontology_acronym):
         if len(ontologies) > 0:
             submission = ontologies[0].get_latest_submission()
             print('Indexing ontology %s started' % (ontologies[0].acronym))
-            index_submission(ontologies[0].pk, submission.pk)
+            index_submission(ontologies[0].pk, submission.pk, incremental=False)
 
     except Exception as e:
         print(e)
@@ -0,0 +1,289 @@
+# Inferred class hierarchy of the submissions in Postgres
+#
+# The taxonomy snapshot written by Ingest.groovy when a submission is
+# classified, see TaxonomySnapshot.groovy, is imported in TaxonomyClass and
+# TaxonomyEdge. DL queries for a named class (subclass, superclass,
+# equivalent) are answered from these tables without the ontology API, the
+# reasoner is only used for class expressions, instances and axioms.
+# Only the latest submission of an ontology keeps its tables.
+#
+# The path of every class to its top class is computed at import, the root
+# tree of the browse tab (findRoot.groovy) is built from it and cached per
+# submission. The snapshot has no class axioms, the ontology API adds those
+# of the selected class to the tree.
+
+import gzip
+import hashlib
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+
+from aberowl.models import Submission, TaxonomyClass, TaxonomyEdge
+
+TAXONOMY_TABLES = getattr(settings, 'TAXONOMY_TABLES', True)
+TAXONOMY_BATCH_SIZE = getattr(settings, 'TAXONOMY_BATCH_SIZE', 5000)
+TAXONOMY_ROOT_CACHE_TIMEOUT = getattr(settings, 'TAXONOMY_ROOT_CACHE_TIMEOUT', 24 * 60 * 60)
+
+OWL_THING = 'http://www.w3.org/2002/07/owl#Thing'
+
+SUBCLASS = 'subclass'
+SUPERCLASS = 'superclass'
+EQUIVALENT = 'equivalent'
+SUPEQ = 'supeq'
+REALIZE = 'realize'
+
+# Class information keys of the axioms, only rendered by the ontology API
+AXIOM_KEYS = ('SubClassOf', 'Equivalent', 'Disjoint')
+
+
+def read_snapshot(filepath):
+    # Class entries of the snapshot, after the header line
+    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
+        f.readline()
+        for line in f:
+            yield json.loads(line)
+
+
+def delete_taxonomy(submission_ids):
+    # Raw deletes, the ORM would load every class to cascade
+    if not submission_ids:
+        return
+    with connection.cursor() as cursor:
+        for model in (TaxonomyEdge, TaxonomyClass):
+            cursor.execute(
+                'DELETE FROM %s WHERE submission_id = ANY(%%s)' % (model._meta.db_table,), [list(submission_ids)])
+    Submission.objects.filter(pk__in=submission_ids).update(taxonomy_imported=False)
+
+
+def import_taxonomy(submission):
+    # Imports the snapshot of the submission and drops the tables of the
+    # previous submissions. Returns the number of imported classes.
+    filepath = submission.get_snapshot_filepath()
+    if not TAXONOMY_TABLES or not os.path.exists(filepath):
+        return 0
+    with transaction.atomic():
+        previous = list(Submission.objects.filter(
+            ontology=submission.ontology, taxonomy_imported=True).values_list('pk', flat=True))
+        delete_taxonomy(previous + [submission.pk])
+
+        # Classes first, the edges reference their ids
+        ids = {}
+        batch = []
+        for entry in read_snapshot(filepath):
+            info = entry['info']
+            batch.append(TaxonomyClass(
+                submission=submission, iri=info['class'], info=info, label=info['label'],
+                deprecated=info.get('deprecated', False), names=entry['names'],
+                equivalents=entry['equivalents']))
+            if len(batch) >= TAXONOMY_BATCH_SIZE:
+                ids.update((cls.iri, cls.pk) for cls in TaxonomyClass.objects.bulk_create(batch))
+                batch = []
+        ids.update((cls.iri, cls.pk) for cls in TaxonomyClass.objects.bulk_create(batch))
+
+        batch = []
+        for entry in read_snapshot(filepath):
+            child_id = ids[entry['info']['class']]
+            parent_ids = [ids[parent] for parent in entry['parents'] if parent in ids] or [None]
+            batch.extend(
+                TaxonomyEdge(submission=submission, parent_id=parent_id, child_id=child_id)
+                for parent_id in parent_ids)
+            if len(batch) >= TAXONOMY_BATCH_SIZE:
+                TaxonomyEdge.objects.bulk_create(batch)
+                batch = []
+        TaxonomyEdge.objects.bulk_create(batch)
+        set_root_paths(submission)
+
+        submission.taxonomy_imported = True
+        submission.save(update_fields=['taxonomy_imported'])
+    print('Imported the taxonomy of', submission, ':', len(ids), 'classes')
+    return len(ids)
+
+
+def set_root_paths(submission):
+    # The first superclass of a class is the first one by label which is
+    # not deprecated, the paths follow them down from the top classes
+    classes = TaxonomyClass._meta.db_table
+    edges = TaxonomyEdge._meta.db_table
+    sql = (
+        'WITH RECURSIVE first_parent(id, parent_id) AS ('
+        ' SELECT DISTINCT ON (e.child_id) e.child_id, e.parent_id FROM {edges} e'
+        ' LEFT JOIN {classes} p ON p.id = e.parent_id'
+        ' WHERE e.submission_id = %s AND (p.id IS NULL OR NOT p.deprecated)'
+        ' ORDER BY e.child_id, p.label COLLATE "C", p.iri'
+        '), paths(id, path) AS ('
+        ' SELECT id, ARRAY[]::bigint[] FROM first_parent WHERE parent_id IS NULL'
+        ' UNION ALL'
+        ' SELECT f.id, p.path || f.parent_id FROM first_parent f JOIN paths p ON f.parent_id = p.id'
+        ') UPDATE {classes} c SET root_path = paths.path FROM paths WHERE c.id = paths.id'
+    ).format(classes=classes, edges=edges)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [submission.pk])
+
+
+def resolve(submission, query, labels):
+    # Class of a query naming a class, OWL_THING for owl:Thing, None for
+    # class expressions and unknown classes
+    query = query.strip()
+    if query.startswith('<') and query.endswith('>') and query.find('>') == len(query) - 1:
+        iri = query[1:-1]
+        if iri == OWL_THING:
+            return OWL_THING
+        return TaxonomyClass.objects.filter(submission=submission, iri=iri).first()
+    if labels:
+        if len(query) > 1 and query.startswith("'") and query.endswith("'"):
+            query = query[1:-1]
+        if "'" not in query:
+            return TaxonomyClass.objects.filter(
+                submission=submission, names__contains=[query.lower()]).order_by('pk').first()
+    return None
+
+
+def get_closure(submission, cls, query_type):
+    # Ids of the transitive subclasses or superclasses, in one recursive query
+    table = TaxonomyEdge._meta.db_table
+    if query_type == SUBCLASS:
+        start, step = ('parent_id IS NULL', []) if cls == OWL_THING else ('parent_id = %s', [cls.pk])
+        sql = (
+            'WITH RECURSIVE closure(id) AS ('
+            ' SELECT child_id FROM {table} WHERE submission_id = %s AND {start}'
+            ' UNION'
+            ' SELECT e.child_id FROM {table} e JOIN closure c ON e.parent_id = c.id WHERE e.submission_id = %s'
+            ') SELECT id FROM closure').format(table=table, start=start)
+        return RawSQL(sql, [submission.pk] + step + [submission.pk])
+    sql = (
+        'WITH RECURSIVE closure(id) AS ('
+        ' SELECT parent_id FROM {table} WHERE submission_id = %s AND child_id = %s AND parent_id IS NOT NULL'
+        ' UNION'
+        ' SELECT e.parent_id FROM {table} e JOIN closure c ON e.child_id = c.id'
+        ' WHERE e.submission_id = %s AND e.parent_id IS NOT NULL'
+        ') SELECT id FROM closure').format(table=table)
+    return RawSQL(sql, [submission.pk, cls.pk, submission.pk])
+
+
+def get_related(submission, cls, query_type, direct):
+    classes = TaxonomyClass.objects.filter(submission=submission)
+    if cls == OWL_THING:
+        if query_type != SUBCLASS:
+            return classes.none()
+        if direct:
+            return classes.filter(parent_edges__parent__isnull=True)
+        return classes.filter(pk__in=get_closure(submission, cls, SUBCLASS))
+    if query_type == EQUIVALENT:
+        # The class itself is among its equivalent classes, as for the reasoner
+        return classes.filter(models.Q(iri__in=cls.equivalents) | models.Q(pk=cls.pk))
+    if direct and query_type == SUBCLASS:
+        return classes.filter(parent_edges__parent=cls)
+    if direct:
+        return classes.filter(child_edges__child=cls)
+    return classes.filter(pk__in=get_closure(submission, cls, query_type))
+
+
+def is_true(value):
+    return str(value).lower() == 'true'
+
+
+def run_query(ontology, query, query_type, axioms=None, labels=None, direct=None):
+    # Same result as runQuery.groovy for a named class of the latest
+    # submission, None when the query needs the ontology API
+    if not TAXONOMY_TABLES or query is None or is_true(axioms):
+        return None
+    start = time.monotonic()
+    submission = ontology.get_latest_submission()
+    if submission is None or not submission.taxonomy_imported:
+        return None
+    query_type = (query_type or '').lower()
+    if query_type == REALIZE:
+        return None
+    cls = resolve(submission, query, is_true(labels))
+    if cls is None:
+        return None
+    direct = is_true(direct)
+    if query_type in (SUBCLASS, SUPERCLASS, EQUIVALENT):
+        types = [query_type]
+    elif query_type == SUPEQ:
+        types = [SUPERCLASS, EQUIVALENT]
+    else:
+        types = [SUBCLASS, EQUIVALENT]
+    infos = {}
+    for related_type in types:
+        for related in get_related(submission, cls, related_type, direct).filter(deprecated=False):
+            infos[related.iri] = related.info
+    result = sorted(infos.values(), key=lambda info: info['label'])
+    return {'time': int((time.monotonic() - start) * 1000), 'result': result}
+
+
+def get_iri(owl_class):
+    iri = owl_class.strip()
+    if iri.startswith('<') and iri.endswith('>'):
+        iri = iri[1:-1]
+    return iri
+
+
+def get_root_cache_key(submission, iri):
+    return 'taxonomy_root:%d:%s' % (submission.pk, hashlib.md5(iri.encode('utf-8')).hexdigest())
+
+
+def find_root(ontology, owl_class):
+    # Same result as findRoot.groovy, the top classes with the children of
+    # every class on the path to owl_class, None when the ontology API has
+    # to answer
+    if not TAXONOMY_TABLES:
+        return None
+    submission = ontology.get_latest_submission()
+    if submission is None or not submission.taxonomy_imported:
+        return None
+    iri = get_iri(owl_class)
+    key = get_root_cache_key(submission, iri)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    cls = TaxonomyClass.objects.filter(submission=submission, iri=iri).only('pk', 'root_path').first()
+    if cls is None or cls.root_path is None:
+        return None
+
+    path = cls.root_path + [cls.pk]
+    children = {}
+    edges = TaxonomyEdge.objects.filter(submission=submission, child__deprecated=False).filter(
+        models.Q(parent__isnull=True) | models.Q(parent__in=path)).select_related('child')
+    for edge in edges:
+        children.setdefault(edge.parent_id, []).append(edge.child)
+    for siblings in children.values():
+        siblings.sort(key=lambda child: child.label)
+
+    def get_infos(parent_id):
+        return [(child.pk, dict(child.info)) for child in children.get(parent_id, [])]
+
+    # Expands the path as findRoot.groovy does, a class of the path which is
+    # not among the children of the previous one is skipped
+    classes = get_infos(None)
+    result = [info for _, info in classes]
+    for class_id in path:
+        for child_id, info in classes:
+            if child_id == class_id:
+                classes = get_infos(class_id)
+                info['children'] = [child_info for _, child_info in classes]
+                break
+    result = {'result': result}
+    cache.set(key, result, timeout=TAXONOMY_ROOT_CACHE_TIMEOUT)
+    return result
+
+
+def find_node(result, owl_class):
+    # Class information of owl_class in a find_root tree, following the
+    # classes with children down the path
+    iri = get_iri(owl_class)
+    nodes = result['result']
+    while nodes:
+        path = None
+        for node in nodes:
+            if node['class'] == iri:
+                return node
+            if 'children' in node:
+                path = node
+        nodes = path['children'] if path is not None else []
+    return None
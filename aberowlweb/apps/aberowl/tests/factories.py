@@ -5,6 +5,7 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from factory.django import DjangoModelFactory
 from aberowl.models import Ontology, Submission
+from aberowl import ontapi_registry
 import pytz
 from faker import Faker
 
@@ -17,6 +18,11 @@ def get_json_mock_response(data='test data', status_code=200):
     return mock_response
 
 
+def set_live(*acronyms, url='http://localhost:8080/api/'):
+    # Routes the ontologies like a heartbeat of runontapi
+    ontapi_registry.publish_heartbeat(url, acronyms)
+
+
 fake = Faker()
 
 
@@ -40,7 +46,6 @@ class OntologyFactory(DjangoModelFactory):
     status = Ontology.UNKNOWN
     topics = ['Topic 1', 'Topic 2']
     species = ['Species 1', 'Species 2']
-    nb_servers = 0
     is_obsolete = False
 
 
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from aberowl.downloader import download_file, get_partial_filepath, DOWNLOADED, NOT_MODIFIED
+
+CONTENT = b'<rdf:RDF>' + b'ontology content ' * 1000 + b'</rdf:RDF>'
+ETAG = '"v1"'
+
+
+class OntologyFileHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get('Range') and self.headers.get('If-Range') == ETAG:
+            start = int(self.headers['Range'][len('bytes='):-1])
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header('ETag', ETAG)
+        self.send_header('Last-Modified', 'Mon, 02 Oct 2023 10:00:00 GMT')
+        self.send_header('Content-Length', str(len(CONTENT) - start))
+        self.end_headers()
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DownloadFileTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), OntologyFileHandler)
+        cls.url = 'http://127.0.0.1:%d/ontology.owl' % cls.server.server_port
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        OntologyFileHandler.requests = []
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, 'ontology.owl')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_download(self):
+        result = download_file(self.url, self.filepath)
+        self.assertEqual(result['status'], DOWNLOADED)
+        self.assertEqual(result['md5sum'], hashlib.md5(CONTENT).hexdigest())
+        self.assertEqual(result['etag'], ETAG)
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.assertFalse(os.path.exists(get_partial_filepath(self.filepath)))
+
+    def test_not_modified(self):
+        result = download_file(self.url, self.filepath, etag=ETAG, last_modified='Mon, 02 Oct 2023 10:00:00 GMT')
+        self.assertEqual(result['status'], NOT_MODIFIED)
+        self.assertFalse(os.path.exists(self.filepath))
+        self.assertEqual(OntologyFileHandler.requests[0]['If-Modified-Since'], 'Mon, 02 Oct 2023 10:00:00 GMT')
+
+    def test_resume_partial_download(self):
+        partial_filepath = get_partial_filepath(self.filepath)
+        with open(partial_filepath, 'wb') as f:
+            f.write(CONTENT[:100])
+        with open(partial_filepath + '.validator', 'w') as f:
+            f.write(ETAG)
+
+        result = download_file(self.url, self.filepath)
+        self.assertEqual(OntologyFileHandler.requests[0]['Range'], 'bytes=100-')
+        self.assertEqual(result['md5sum'], hashlib.md5(CONTENT).hexdigest())
+        with open(self.filepath, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.assertFalse(os.path.exists(partial_filepath + '.validator'))
+
+    def test_restart_partial_download_without_validator(self):
+        with open(get_partial_filepath(self.filepath), 'wb') as f:
+            f.write(b'stale content')
+
+        result = download_file(self.url, self.filepath)
+        self.assertNotIn('Range', OntologyFileHandler.requests[0])
+        self.assertEqual(result['md5sum'], hashlib.md5(CONTENT).hexdigest())
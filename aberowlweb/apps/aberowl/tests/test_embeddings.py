@@ -0,0 +1,115 @@
+import os
+import tempfile
+from unittest.mock import patch, Mock
+
+from django.test import TestCase
+
+from aberowl import embeddings, tasks
+
+
+class EmbeddingsCacheTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name + '/'
+        self.cache_root = embeddings.EMBEDDINGS_CACHE_ROOT
+        embeddings.EMBEDDINGS_CACHE_ROOT = self.root + 'embeddings/'
+        self.filepath = self.root + 'go.owl'
+        with open(self.filepath, 'w') as f:
+            f.write('ontology')
+
+    def tearDown(self):
+        embeddings.EMBEDDINGS_CACHE_ROOT = self.cache_root
+        self.tmpdir.cleanup()
+
+    def write_axioms(self, filepath, **kwargs):
+        with open(filepath + '.axms', 'w') as f:
+            f.write('A SubClassOf B\n')
+        return {'classifiable': True}
+
+    def write_embeddings(self, corpus_filepath, embeddings_filepath, **kwargs):
+        os.makedirs(os.path.dirname(embeddings_filepath), exist_ok=True)
+        with open(embeddings_filepath, 'w') as f:
+            f.write('A 0.1 0.2\n')
+        return True
+
+    def test_parameters_key(self):
+        parameters = embeddings.get_training_parameters()
+        self.assertEqual(parameters['size'], 256)
+        changed = dict(parameters, iter=10)
+        self.assertNotEqual(embeddings.get_parameters_key(parameters), embeddings.get_parameters_key(changed))
+        self.assertNotEqual(
+            embeddings.get_embeddings_filepath('abc', '1', parameters),
+            embeddings.get_embeddings_filepath('abc', '1', changed))
+
+    @patch('aberowl.embeddings.Popen')
+    def test_failed_training_is_not_cached(self, mock_popen):
+        mock_popen.return_value = Mock(wait=Mock(return_value=1))
+        output = self.root + 'go.embs'
+        self.assertFalse(embeddings.train(self.root + 'go.axms', output, threads=2))
+        self.assertFalse(os.path.exists(output))
+        args = mock_popen.call_args[0][0]
+        self.assertEqual(args[args.index('-threads') + 1], '2')
+        self.assertEqual(args[args.index('-size') + 1], '256')
+
+    @patch('aberowl.tasks.embeddings.train')
+    @patch('aberowl.tasks.ingest_ontology')
+    def test_unchanged_ontology_trained_once(self, mock_ingest, mock_train):
+        mock_ingest.side_effect = self.write_axioms
+        mock_train.side_effect = self.write_embeddings
+        self.assertTrue(tasks.generate_embeddings(self.filepath))
+        self.assertTrue(tasks.generate_embeddings(self.filepath))
+        mock_ingest.assert_called_once()
+        mock_train.assert_called_once()
+        self.assertFalse(os.path.exists(self.filepath + '.axms'))
+        with open(self.filepath + '.embs') as f:
+            self.assertEqual(f.read(), 'A 0.1 0.2\n')
+
+        # new parameters train from the cached corpus
+        with patch('aberowl.embeddings.EMBEDDINGS_ITER', 10):
+            self.assertTrue(tasks.generate_embeddings(self.filepath))
+        mock_ingest.assert_called_once()
+        self.assertEqual(mock_train.call_count, 2)
+
+    @patch('aberowl.tasks.embeddings.train')
+    @patch('aberowl.tasks.ingest_ontology')
+    def test_unloadable_ontology(self, mock_ingest, mock_train):
+        mock_ingest.return_value = {'classifiable': False}
+        self.assertFalse(tasks.generate_embeddings(self.filepath))
+        mock_train.assert_not_called()
+
+    @patch('aberowl.embeddings.EMBEDDINGS_TRAINER', 'gensim')
+    @patch('aberowl.embeddings.get_word2vec')
+    @patch('aberowl.tasks.ingest_ontology')
+    @patch('aberowl.tasks.stream_cold')
+    def test_streamed_axioms_without_corpus(self, mock_stream, mock_ingest, mock_word2vec):
+        corpora = []
+
+        def train(corpus_file=None, **kwargs):
+            with open(corpus_file) as f:
+                corpora.append(f.read())
+            model = Mock()
+            model.wv.save_word2vec_format.side_effect = lambda filepath, binary: self.write_embeddings(
+                None, filepath)
+            return model
+
+        mock_word2vec.return_value = train
+        mock_stream.return_value = iter(['A SubClassOf B', 'B SubClassOf C', '{"classifiable": true}'])
+        self.assertTrue(tasks.generate_embeddings(self.filepath))
+        mock_ingest.assert_not_called()
+        self.assertEqual(mock_stream.call_args[0][1][-1], '-')
+        # the sentences are spooled to a corpus file which is not kept
+        self.assertEqual(corpora, ['A SubClassOf B\nB SubClassOf C\n'])
+        embeddings_filepath = embeddings.get_embeddings_filepath(
+            tasks.file_checksum(self.filepath), tasks.get_classifier_version())
+        self.assertEqual(os.listdir(os.path.dirname(embeddings_filepath)), [os.path.basename(embeddings_filepath)])
+        self.assertTrue(os.path.exists(self.filepath + '.embs'))
+
+        # an unloadable ontology is not trained
+        os.remove(embeddings_filepath)
+        mock_stream.return_value = iter(['{"classifiable": false}'])
+        self.assertFalse(tasks.generate_embeddings(self.filepath))
+        mock_stream.return_value = iter(['A SubClassOf B', '{"classifiable": false}'])
+        self.assertFalse(tasks.generate_embeddings(self.filepath))
+        self.assertEqual(len(corpora), 1)
+        self.assertEqual(os.listdir(os.path.dirname(embeddings_filepath)), [])
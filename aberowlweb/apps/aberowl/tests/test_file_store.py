@@ -0,0 +1,153 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+
+from aberowl import file_store
+from aberowl.tests.factories import OntologyFactory, SubmissionFactory
+
+
+class FileStoreTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name + '/'
+        self.store_root = file_store.FILE_STORE_ROOT
+        file_store.FILE_STORE_ROOT = self.root + 'store/'
+
+    def tearDown(self):
+        file_store.FILE_STORE_ROOT = self.store_root
+        self.tmpdir.cleanup()
+
+    def write_file(self, name, content):
+        filepath = self.root + name
+        with open(filepath, 'wb') as f:
+            f.write(content)
+        return filepath
+
+    def test_identical_content_stored_once(self):
+        first = self.write_file('first.owl', b'ontology')
+        checksum = file_store.store_file(first, [self.root + '1/go.owl', self.root + 'latest/go.owl'])
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(file_store.has_blob(checksum))
+
+        second = self.write_file('second.owl', b'ontology')
+        self.assertEqual(file_store.store_file(second, [self.root + '2/go.owl']), checksum)
+        self.assertFalse(os.path.exists(second))
+
+        blob_filepath = file_store.get_blob_filepath(checksum)
+        for link in ('1/go.owl', '2/go.owl', 'latest/go.owl'):
+            self.assertTrue(os.path.samefile(self.root + link, blob_filepath))
+        self.assertEqual(os.listdir(os.path.dirname(blob_filepath)), [checksum])
+
+    def test_relink_replaces_existing_file(self):
+        old = self.write_file('old.owl', b'old')
+        file_store.store_file(old, [self.root + 'go.owl'])
+        new = self.write_file('new.owl', b'new')
+        checksum = file_store.store_file(new, [self.root + 'go.owl'])
+        with open(self.root + 'go.owl', 'rb') as f:
+            self.assertEqual(f.read(), b'new')
+        self.assertTrue(os.path.samefile(self.root + 'go.owl', file_store.get_blob_filepath(checksum)))
+
+    def test_submission_filepath_resolves_through_store(self):
+        checksum = file_store.store_file(self.write_file('go.owl', b'ontology'), [])
+        submission = SubmissionFactory(ontology=OntologyFactory(acronym='TESTSTORE'), md5sum=checksum)
+        filepath = submission.get_filepath()
+        try:
+            self.assertTrue(os.path.samefile(filepath, file_store.get_blob_filepath(checksum)))
+        finally:
+            os.remove(filepath)
+
+    @patch('aberowl.file_store.FILE_STORE_COMPRESSION', 'gzip')
+    def test_compressed_storage(self):
+        checksum = file_store.store_file(self.write_file('go.owl', b'ontology'), [self.root + '1/go.owl'])
+        self.assertEqual(checksum, file_store.file_checksum(self.root + '1/go.owl'))
+        self.assertFalse(os.path.exists(self.root + '1/go.owl'))
+        self.assertEqual(file_store.find_file(self.root + '1/go.owl'), self.root + '1/go.owl.gz')
+        with gzip.open(self.root + '1/go.owl.gz') as f:
+            self.assertEqual(f.read(), b'ontology')
+        with file_store.open_file(self.root + '1/go.owl') as f:
+            self.assertEqual(f.read(), b'ontology')
+
+        # a raw file linked before is replaced by the compressed form
+        os.makedirs(self.root + '2')
+        self.write_file('2/go.owl', b'old')
+        file_store.link_blob(checksum, self.root + '2/go.owl')
+        self.assertEqual(sorted(os.listdir(self.root + '2')), ['go.owl.gz'])
+
+    def test_existing_blobs_compressed(self):
+        checksum = file_store.store_file(self.write_file('go.owl', b'ontology'), [self.root + '1/go.owl'])
+        self.assertFalse(file_store.compress_blob(checksum))
+        with patch('aberowl.file_store.FILE_STORE_COMPRESSION', 'gzip'):
+            self.assertTrue(file_store.compress_blob(checksum))
+        self.assertEqual(file_store.find_blob(checksum), file_store.get_blob_filepath(checksum) + '.gz')
+        file_store.link_blob(checksum, self.root + '1/go.owl')
+        self.assertEqual(os.listdir(self.root + '1'), ['go.owl.gz'])
+
+
+class MediaFileViewTest(TestCase):
+
+    def setUp(self):
+        self.filedir = 'media/ontologies/TESTMEDIA/'
+        os.makedirs(self.filedir, exist_ok=True)
+        with gzip.open(self.filedir + 'go.owl.gz', 'wb') as f:
+            f.write(b'ontology')
+
+    def tearDown(self):
+        shutil.rmtree(self.filedir)
+
+    def get(self, path, **headers):
+        response = self.client.get(reverse('media', kwargs={'path': path}), **headers)
+        content = b''.join(response.streaming_content) if response.status_code == 200 else b''
+        return response, content
+
+    def test_content_encoding_negotiation(self):
+        response, content = self.get('ontologies/TESTMEDIA/go.owl', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="go.owl"')
+        self.assertEqual(gzip.decompress(content), b'ontology')
+
+        response, content = self.get('ontologies/TESTMEDIA/go.owl', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="go.owl"')
+        self.assertEqual(content, b'ontology')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_compressed_file_name(self):
+        # Requested with its compressed name the file is not decoded
+        response, content = self.get('ontologies/TESTMEDIA/go.owl.gz')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Content-Disposition'], 'inline; filename="go.owl.gz"')
+        self.assertEqual(gzip.decompress(content), b'ontology')
+
+    def test_taxonomy_snapshot(self):
+        # As the ontology API loads it from the URL the supervisor gives,
+        # without Accept-Encoding, gunzipping it when it has the gzip magic
+        submission = SubmissionFactory(ontology=OntologyFactory(acronym='TESTMEDIA'), submission_id=1)
+        filepath = submission.get_snapshot_filepath()
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with gzip.open(filepath, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'ontology': 'TESTMEDIA', 'classes': 0}) + '\n')
+        response = self.client.get('/' + filepath)
+        content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(content[:2], b'\x1f\x8b')
+        self.assertEqual(json.loads(gzip.decompress(content))['ontology'], 'TESTMEDIA')
+
+    def test_missing_files(self):
+        self.assertEqual(self.get('ontologies/TESTMEDIA/hp.owl')[0].status_code, 404)
+        self.assertEqual(self.get('ontologies/../../manage.py')[0].status_code, 404)
+
+    def test_private_files(self):
+        for name in ('go.owl.upload', 'go.owl.classes', 'go.owl.hashes'):
+            with open(self.filedir + name, 'w') as f:
+                f.write('private')
+            self.assertEqual(self.get('ontologies/TESTMEDIA/' + name)[0].status_code, 404)
+        self.assertEqual(self.get('ontologies/../store/go.owl')[0].status_code, 404)
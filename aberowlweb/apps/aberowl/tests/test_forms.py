@@ -1,9 +1,10 @@
-from unittest.mock import Mock, patch
+from unittest.mock import patch
+import os
 
 from django.core.files.uploadedfile import TemporaryUploadedFile
-import tempfile
 from django.test import TestCase
 from aberowl.forms import OntologyForm, SubmissionForm
+from aberowl.models import Ontology, Submission
 from aberowl.tests.factories import UserFactory, OntologyFactory, SubmissionFactory
 
 
@@ -83,19 +84,17 @@ class SubmissionFormTest(TestCase):
         self.request = self.client.get('/test/')
         self.request.user = self.user
 
-    @patch('aberowl.tasks.classify_ontology.delay')
-    def test_form_submission(self, mock_delay):
-        # when valid submission and classifiable is True
-        mock_result = {'classifiable': True, 'other_key': 'other_value'}
-        mock_delay.return_value = Mock(get=lambda: mock_result)
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_file.write(b"File content goes here")
-        temp_file.seek(0)
-        ontology_file = TemporaryUploadedFile(name="example.txt", content_type="text/plain", size=len(temp_file.read()),
-                                              charset=None)
+    def get_ontology_file(self):
+        ontology_file = TemporaryUploadedFile(name="example.txt", content_type="text/plain", size=22, charset=None)
+        ontology_file.write(b"File content goes here")
+        ontology_file.seek(0)
+        return ontology_file
+
+    def test_form_submission(self):
+        # uploaded files are not classified while the form is validated
         form_data = {'version': '1.0', 'has_ontology_language': 'OWL'}
-        form = SubmissionForm(data=form_data, request=self.request,
-                              ontology=self.ontology, instance=self.submission, files={'ontology_file': ontology_file})
+        form = SubmissionForm(data=form_data, request=self.request, ontology=self.ontology, instance=self.submission,
+                              files={'ontology_file': self.get_ontology_file()})
         self.assertTrue(form.is_valid())
         response_form_data = form.cleaned_data
         self.assertEqual(response_form_data['version'], form_data['version'])
@@ -107,52 +106,34 @@ class SubmissionFormTest(TestCase):
         self.assertIn('ontology_file', form.errors)
         self.assertEqual(get_form_errors(form), ['Required when creating a submission!'])
 
-        # when valid submission and classifiable is False
-        mock_result = {'classifiable': False, 'other_key': 'other_value'}
-        mock_delay.return_value = Mock(get=lambda: mock_result)
-        form = SubmissionForm(data=form_data, request=self.request,
-                              ontology=self.ontology, instance=self.submission, files={'ontology_file': ontology_file})
-        self.assertFalse(form.is_valid())
-        self.assertIn('ontology_file', form.errors)
-        self.assertEqual(get_form_errors(form), ['Unloadable ontology file'])
-
-    @patch('shutil.move')
-    @patch('shutil.copy')
-    @patch('os.chmod')
-    @patch('aberowl.tasks.classify_ontology.delay')
-    @patch('aberowl.tasks.index_submission.delay')
-    @patch('aberowl.tasks.reload_ontology.delay')
-    def test_save_new_submission(self, mock_reload_delay, mock_submission_delay, mock_classify_delay, mock_move, mock_copy, mock_chmod):
-        mock_move.return_value, mock_copy.return_value, mock_chmod.return_value = None, None, None
-        mock_result = {'classifiable': True, 'other_key': 'other_value', 'incon': 1, 'status': 2, 'nb_classes': 1,
-                       'nb_individuals': 1,
-                       'max_depth': 9, 'max_children': 0, 'avg_children': 8, 'nb_properties': 1}
-        mock_submission_delay.return_value = Mock(get=lambda: mock_result)
-        mock_classify_delay.return_value = Mock(get=lambda: mock_result)
-        mock_reload_delay.return_value = Mock(get=lambda: mock_result)
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_file.write(b"File content goes here")
-        temp_file.seek(0)
-        ontology_file = TemporaryUploadedFile(name="example.txt", content_type="text/plain", size=len(temp_file.read()),
-                                              charset=None)
+    @patch('aberowl.forms.validate_submission.delay')
+    @patch('aberowl.forms.index_submission.delay')
+    def test_save_new_submission(self, mock_index_delay, mock_validate_delay):
         form_data = {
             'version': '1.0',
             'has_ontology_language': 'OWL'
         }
-
-        form = SubmissionForm(data=form_data, request=self.request, ontology=self.ontology, instance=self.submission,
-                              files={'ontology_file': ontology_file})
-        self.assertTrue(form.is_valid())
-        submission = form.save()
-        self.assertEqual(submission.version, '1.0')
-        self.assertEqual(submission.has_ontology_language, 'OWL')
-        self.assertEqual(submission.ontology, self.ontology)
-
+        ontology_file = self.get_ontology_file()
         form = SubmissionForm(data=form_data, request=self.request, ontology=self.ontology,
                               files={'ontology_file': ontology_file})
         self.assertTrue(form.is_valid())
-        submission = form.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = form.save()
         self.assertEqual(submission.version, '1.0')
         self.assertEqual(submission.has_ontology_language, 'OWL')
         self.assertEqual(submission.ontology, self.ontology)
-        self.assertEqual(submission.nb_inconsistent, mock_result['incon'])
\ No newline at end of file
+        self.assertEqual(submission.status, Submission.VALIDATING)
+        self.assertEqual(submission.submission_id, self.submission.submission_id + 1)
+        mock_validate_delay.assert_called_once_with(submission.pk, Ontology.UNKNOWN)
+        mock_index_delay.assert_not_called()
+        with open(submission.get_upload_filepath(), 'rb') as f:
+            self.assertEqual(f.read(), b"File content goes here")
+        os.remove(submission.get_upload_filepath())
+
+        # updates without a file are only reindexed
+        form = SubmissionForm(data=form_data, request=self.request, ontology=self.ontology, instance=self.submission)
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = form.save()
+        self.assertNotEqual(submission.status, Submission.VALIDATING)
+        mock_index_delay.assert_called_once_with(self.ontology.pk, self.submission.pk)
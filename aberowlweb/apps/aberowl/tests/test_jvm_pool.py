@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from aberowl import jvm_pool
+
+WORKER_STUB = '''
+import json, sys
+print(json.dumps({'ready': True}), flush=True)
+jobs = 0
+for line in sys.stdin:
+    job = json.loads(line)
+    if job.get('ping'):
+        print(json.dumps({'pong': True, 'used_memory': 0, 'jobs': jobs}), flush=True)
+        continue
+    if job['script'] == 'Crash.groovy':
+        sys.exit(1)
+    jobs += 1
+    output = ' '.join(job['args']) + '|' + job['stdin'] + '|' + str(jobs)
+    print(json.dumps({'status': 0, 'output': output}), flush=True)
+'''
+
+
+class JVMWorkerPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        stub = os.path.join(self.tmpdir.name, 'worker.py')
+        with open(stub, 'w') as f:
+            f.write(WORKER_STUB)
+        self.pool = jvm_pool.JVMWorkerPool(size=1, command=[sys.executable, stub])
+
+    def tearDown(self):
+        self.pool.stop()
+        self.tmpdir.cleanup()
+
+    def test_worker_reused_between_jobs(self):
+        result = self.pool.run_script('Ingest.groovy', ['a.owl'], stdin='data')
+        self.assertEqual(result, {'returncode': 0, 'output': 'a.owl|data|1'})
+        result = self.pool.run_script('Ingest.groovy', ['b.owl'])
+        self.assertEqual(result['output'], 'b.owl||2')
+        self.assertEqual(len(self.pool.idle), 1)
+
+    @patch('aberowl.jvm_pool.JVM_WORKER_MAX_JOBS', 1)
+    def test_worker_restarted_after_max_jobs(self):
+        self.pool.run_script('Ingest.groovy', ['a.owl'])
+        self.assertEqual(self.pool.idle, [])
+        self.assertEqual(self.pool.nb_workers, 0)
+        result = self.pool.run_script('Ingest.groovy', ['b.owl'])
+        self.assertEqual(result['output'], 'b.owl||1')
+
+    def test_crashed_worker_replaced(self):
+        result = self.pool.run_script('Crash.groovy', [])
+        self.assertEqual(result['returncode'], -1)
+        self.assertEqual(self.pool.nb_workers, 0)
+        result = self.pool.run_script('Ingest.groovy', ['a.owl'])
+        self.assertEqual(result['returncode'], 0)
+
+    @patch('aberowl.jvm_pool.run_cold')
+    def test_cold_fallback(self, mock_run_cold):
+        mock_run_cold.return_value = {'returncode': 0, 'output': 'cold'}
+        pool = jvm_pool.JVMWorkerPool(size=1, command=[os.path.join(self.tmpdir.name, 'missing')])
+        self.assertEqual(pool.run_script('Ingest.groovy', ['a.owl'])['output'], 'cold')
+        self.assertEqual(pool.nb_workers, 0)
+
+        pool = jvm_pool.JVMWorkerPool(size=0)
+        pool.run_script('Ingest.groovy', ['a.owl'])
+        self.assertEqual(mock_run_cold.call_count, 2)
+
+    def test_stream_cold_yields_lines(self):
+        script = os.path.join(self.tmpdir.name, 'stream.py')
+        with open(script, 'w') as f:
+            f.write('import sys\nprint("A SubClassOf B")\nprint(sys.argv[1])\n')
+        lines = list(jvm_pool.stream_cold(script, ['{"classifiable": true}'], command=[sys.executable]))
+        self.assertEqual(lines, ['A SubClassOf B', '{"classifiable": true}'])
+
+        with open(script, 'w') as f:
+            f.write('import sys\nprint("A")\nsys.exit(1)\n')
+        with self.assertRaises(jvm_pool.JVMWorkerError):
+            list(jvm_pool.stream_cold(script, [], command=[sys.executable]))
@@ -1,7 +1,8 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from unittest.mock import Mock
 from aberowl.manage_views import OntologyCreateView, OntologyUpdateView, SubmissionCreateView, SubmissionUpdateView
+from aberowl.models import Submission
 from aberowl.tests.factories import OntologyFactory, UserFactory, SubmissionFactory
 
 
@@ -51,3 +52,31 @@ class SubmissionUpdateViewTestCase(CommonTestCase):
         success_url = view.get_success_url()
         expected_url = reverse('list_ontology')
         self.assertEqual(success_url, expected_url)
+
+    def test_get_success_url_while_validating(self):
+        view = SubmissionUpdateView()
+        view.kwargs = self.kwargs
+        view.ontology = self.ontology
+        view.object = self.submission
+        self.assertEqual(view.get_success_url(), reverse('list_ontology'))
+        self.submission.status = Submission.VALIDATING
+        success_url = view.get_success_url()
+        expected_url = reverse('edit_submission', kwargs={'onto_pk': self.ontology.pk, 'pk': self.submission.pk})
+        self.assertEqual(success_url, expected_url)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SubmissionStatusViewTestCase(CommonTestCase):
+    def test_submission_status(self):
+        Submission.objects.filter(pk=self.submission.pk).update(status=Submission.VALIDATING)
+        url = reverse('submission_status', kwargs={'onto_pk': self.ontology.pk, 'pk': self.submission.pk})
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.user)
+        data = self.client.get(url).json()
+        self.assertEqual(data['status'], Submission.VALIDATING)
+        self.assertTrue(data['validating'])
+
+        other = OntologyFactory(acronym='OTHER', created_by=self.user)
+        url = reverse('submission_status', kwargs={'onto_pk': other.pk, 'pk': self.submission.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch, Mock, ANY
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from aberowl import ontapi_registry, ontapi_supervisor
+from aberowl.models import Ontology
+from aberowl.tests.factories import OntologyFactory, SubmissionFactory, get_json_mock_response
+
+
+def get_ontologies(*weights):
+    return [{'ontId': 'ONT%d' % i, 'ontIRI': 'http://localhost/ONT%d.owl' % i, 'weight': weight}
+            for i, weight in enumerate(weights)]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PartitionTest(TestCase):
+
+    def test_partition_by_weight(self):
+        partitions = ontapi_supervisor.partition(get_ontologies(100, 60, 50, 10), 2)
+        self.assertEqual([[ont['ontId'] for ont in onts] for onts in partitions],
+                         [['ONT0', 'ONT3'], ['ONT1', 'ONT2']])
+        partitions = ontapi_supervisor.partition(get_ontologies(100, 60, 10), 2)
+        self.assertEqual(ontapi_supervisor.get_heap_sizes(partitions, 17000), [10000, 7000])
+        self.assertEqual(ontapi_supervisor.get_heap_sizes([[], []], 1000), [1024, 1024])
+
+    def test_startup_list(self):
+        ontology = OntologyFactory(acronym='TESTAPI', status=Ontology.CLASSIFIED, pinned=True)
+        SubmissionFactory(ontology=ontology, submission_id=1, nb_classes=42)
+        OntologyFactory(acronym='TESTNOSUB', status=Ontology.CLASSIFIED)
+        data = ontapi_supervisor.get_startup_list()
+        self.assertEqual([ont['ontId'] for ont in data], ['TESTAPI'])
+        self.assertEqual(data[0]['weight'], 42)
+        self.assertTrue(data[0]['pinned'])
+        self.assertNotIn('snapshotIRI', data[0])
+
+    def test_startup_list_with_snapshots(self):
+        ontology = OntologyFactory(acronym='TESTSNAP', status=Ontology.CLASSIFIED)
+        submission = SubmissionFactory(ontology=ontology, submission_id=1, nb_classes=42)
+        os.makedirs(os.path.dirname(submission.get_snapshot_filepath()), exist_ok=True)
+        open(submission.get_snapshot_filepath(), 'w').close()
+        try:
+            data = ontapi_supervisor.get_startup_list()
+            self.assertTrue(data[0]['snapshotIRI'].endswith(submission.get_snapshot_filepath()))
+            self.assertNotIn('snapshotIRI', ontapi_supervisor.get_startup_list(snapshots=False)[0])
+        finally:
+            os.remove(submission.get_snapshot_filepath())
+
+    def test_query_counts_from_logs(self):
+        with tempfile.TemporaryDirectory() as log_folder:
+            with open(os.path.join(log_folder, 'aberowl-dl-logs.txt'), 'w') as f:
+                for acronym, days in (('GO', 1), ('GO', 2), ('HP', 1), ('HP', 60)):
+                    f.write(json.dumps({'ontology': [acronym], 'time': str(datetime.now() - timedelta(days=days))}))
+                    f.write('\n')
+                f.write('{"query": ["A"]}\n')
+            counts = ontapi_supervisor.get_query_counts(days=30, log_folder=log_folder)
+        self.assertEqual(counts, {'GO': 2, 'HP': 1})
+        self.assertEqual(ontapi_supervisor.get_query_counts(log_folder='/nonexistent'), {})
+
+    def test_rank_by_popularity_and_size(self):
+        ontologies = get_ontologies(10, 500, 50, 20)
+        for ont, hits in zip(ontologies, (0, 7, 7, 0)):
+            ont['hits'] = hits
+        ranked = ontapi_supervisor.rank(ontologies)
+        self.assertEqual([ont['ontId'] for ont in ranked], ['ONT2', 'ONT1', 'ONT0', 'ONT3'])
+        self.assertEqual([ont['rank'] for ont in ranked], [0, 1, 2, 3])
+
+    @patch('shutil.which', return_value='/usr/bin/numactl')
+    def test_placement(self, mock_which):
+        placement = ontapi_supervisor.get_placement(3, 4, nodes=[0, 1], cpu_sets=[[0], [1]])
+        self.assertEqual(placement['command'], ['numactl', '--cpunodebind=1', '--membind=1'])
+        placement = ontapi_supervisor.get_placement(1, 2, nodes=[0], cpu_sets=[[0, 1], [2, 3]])
+        self.assertEqual(placement['command'], ['taskset', '-c', '2,3'])
+        self.assertEqual(ontapi_supervisor.get_placement(0, 1, nodes=[0], cpu_sets=[[0]])['command'], [])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SupervisorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ontologies = [OntologyFactory(acronym='ONT%d' % i) for i in range(3)]
+        with patch('aberowl.ontapi_supervisor.get_numa_nodes', return_value=[0]):
+            self.supervisor = ontapi_supervisor.Supervisor(get_ontologies(30, 20, 10), nb_processes=2)
+
+    def test_loaded_ontologies_are_routed(self):
+        member = self.supervisor.members[1]
+        self.assertEqual(member.url, 'http://localhost:8081/api/')
+        member.handle_line('Finished loading ONT1')
+        member.handle_line('Finished loading ONT1')
+        member.handle_line('Unloadable ontology ONT2')
+        self.assertTrue(self.ontologies[1].is_live())
+        self.assertEqual(Ontology.objects.get(acronym='ONT2').status, Ontology.UNLOADABLE)
+        self.assertEqual(self.ontologies[1].get_api_url(), member.url)
+
+        member.set_unloaded()
+        self.assertFalse(self.ontologies[1].is_live())
+        self.assertEqual(self.ontologies[1].get_api_url(), ontapi_registry.ABEROWL_API_URL)
+
+    @patch('aberowl.ontapi_supervisor.ONTAPI_STARTUP_BATCH_SIZE', 1)
+    @patch('aberowl.ontapi_supervisor.Popen')
+    def test_startup_order_and_readiness(self, mock_popen):
+        mock_popen.return_value.stdout = io.StringIO('')
+        member = self.supervisor.members[1]
+        for ont, rank in zip(member.ontologies, (1, 0)):
+            ont['rank'] = rank
+        member.ontologies[0]['snapshotIRI'] = 'http://localhost/ONT1.owl.taxonomy.gz'
+        member.start()
+        member.reader.join()
+        data = json.loads(mock_popen.return_value.stdin.write.call_args[0][0])
+        self.assertEqual([(ont['ontId'], ont['batch']) for ont in data], [('ONT2', 0), ('ONT1', 1)])
+        self.assertEqual([ont['snapshotIRI'] for ont in data], [None, 'http://localhost/ONT1.owl.taxonomy.gz'])
+        self.assertEqual(ontapi_registry.get_readiness('ONT1')['state'], ontapi_registry.QUEUED)
+        self.assertEqual(ontapi_registry.get_readiness('ONT1')['position'], 1)
+        self.assertEqual(ontapi_registry.get_assignment('ONT1'), member.url)
+
+        member.handle_line('Starting manager for ONT1')
+        self.assertEqual(ontapi_registry.get_readiness('ONT1')['state'], ontapi_registry.LOADING)
+        member.handle_line('Finished loading ONT1')
+        self.assertEqual(ontapi_registry.get_readiness('ONT1')['state'], ontapi_registry.READY)
+        member.handle_line("Can't start ONT2")
+        response = self.client.get(reverse('api-ontology_readiness', args=('ONT2',)))
+        self.assertEqual(response.json()['result']['state'], ontapi_registry.FAILED)
+
+    @patch('aberowl.ontapi_supervisor.requests.get')
+    def test_heartbeats(self, mock_get):
+        member, other = self.supervisor.members
+        member.process = Mock()
+        member.process.poll.return_value = None
+        member.state = ontapi_supervisor.RUNNING
+        # ONT3 failed to load, the process does not serve it
+        mock_get.return_value = get_json_mock_response({
+            'ontologies': ['ONT1', 'ONT2'], 'registered': ['ONT1', 'ONT2', 'ONT3'], 'failed': ['ONT3'],
+            'loaded': ['ONT1']})
+        self.assertEqual(self.supervisor.heartbeat(), [True, False])
+        mock_get.assert_called_once_with(member.url + 'status.groovy', timeout=ANY)
+        self.assertEqual(ontapi_registry.get_live_routes(['ONT0', 'ONT1', 'ONT2', 'ONT3']),
+                         {'ONT1': member.url, 'ONT2': member.url})
+        self.assertEqual(ontapi_registry.get_server(member.url)['ontologies'], ['ONT1', 'ONT2'])
+        # queries without an ontology only go to the loaded ones
+        self.assertEqual(ontapi_registry.get_loaded_routes(['ONT1', 'ONT2']), {'ONT1': member.url})
+        self.assertEqual(member.loaded, {'ONT1', 'ONT2'})
+
+        # a process which does not answer is not published
+        mock_get.side_effect = Exception('timeout')
+        self.assertFalse(member.heartbeat())
+
+        # routes moved to another process are kept
+        other.set_loaded('ONT2')
+        member.set_unloaded()
+        self.assertEqual(ontapi_registry.get_live_routes(['ONT1', 'ONT2']), {'ONT2': other.url})
+        self.assertIsNone(ontapi_registry.get_server(member.url))
+
+    def test_access_counts(self):
+        ontapi_registry.record_access('ONT0')
+        ontapi_registry.record_access('ONT0')
+        # building a URL is not an access
+        self.ontologies[1].get_api_url()
+        self.assertEqual(ontapi_registry.get_access_counts(['ONT0', 'ONT1']), {'ONT0': 2})
+
+    def test_lazy_members(self):
+        with patch('aberowl.ontapi_supervisor.get_numa_nodes', return_value=[0]):
+            supervisor = ontapi_supervisor.Supervisor(get_ontologies(30), nb_processes=1, lazy=True)
+        member = supervisor.members[0]
+        self.assertEqual(member.get_command()[-7:], [
+            'OntologyServer.groovy', '8080', 'true',
+            str(ontapi_supervisor.ONTAPI_MAX_HEAP_FRACTION), str(ontapi_supervisor.ONTAPI_LOAD_WAIT),
+            str(ontapi_supervisor.ONTAPI_LOAD_CONCURRENCY), str(ontapi_supervisor.ONTAPI_LOAD_FAILURE_BACKOFF)])
+        # registered ontologies are served, they are loaded on their first query
+        member.handle_line('Registered ONT0')
+        member.handle_line('Finished loading ONT0')
+        member.handle_line('Evicted ONT0')
+        self.assertTrue(ontapi_registry.is_live('ONT0'))
+
+    @patch('threading.Thread')
+    @patch.object(ontapi_supervisor.Member, 'start')
+    def test_crashed_member_restarted_then_replaced(self, mock_start, mock_thread):
+        member, other = self.supervisor.members
+        member.process = Mock(returncode=1, pid=10)
+        member.process.poll.return_value = 1
+        member.reader = Mock()
+        other.process = Mock(pid=11)
+        other.process.poll.return_value = None
+        member.state = other.state = ontapi_supervisor.RUNNING
+        member.handle_line('Finished loading ONT0')
+
+        self.supervisor.check()
+        mock_start.assert_called_once()
+        self.assertEqual(member.state, ontapi_supervisor.RESTARTING)
+        self.assertFalse(ontapi_registry.is_live('ONT0'))
+
+        member.crashes = [member.crashes[0]] * ontapi_supervisor.ONTAPI_MAX_RESTARTS
+        self.supervisor.check()
+        self.assertEqual(member.state, ontapi_supervisor.FAILED)
+        mock_thread.assert_called_once_with(target=self.supervisor.replace, args=(member,), daemon=True)
+
+        with patch.object(ontapi_supervisor.Member, 'load') as mock_load:
+            self.supervisor.replace(member)
+            self.assertEqual(mock_load.call_count, 1)
+            self.assertEqual(mock_load.call_args[0][0]['ontId'], 'ONT0')
+
+        self.supervisor.publish_status()
+        response = self.client.get(reverse('api-ontology_servers'))
+        processes = response.json()['result']['processes']
+        self.assertEqual([process['state'] for process in processes], ['failed', 'running'])
+        self.assertEqual(processes[1]['pid'], 11)
@@ -1,15 +1,22 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from unittest.mock import patch
+from aberowl import ontapi_registry
 from aberowl.ont_server_request_processor import OntServerRequestProcessor
-from aberowl.tests.factories import OntologyFactory, get_json_mock_response
+from aberowl.tests.factories import OntologyFactory, get_json_mock_response, set_live
 
 processor = OntServerRequestProcessor()
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
 class TestOntServerRequestProcessor(TestCase):
+    def setUp(self):
+        cache.clear()
+
     @patch('requests.get')
     def test_find_ontology_root(self, mock_get):
-        OntologyFactory(acronym='TEST', nb_servers=2), OntologyFactory(acronym='TEST1', nb_servers=0)
+        OntologyFactory(acronym='TEST'), OntologyFactory(acronym='TEST1')
+        set_live('TEST')
         mock_get.return_value = get_json_mock_response('test')
         result = processor.find_ontology_root('owl_class', 'TEST')
         self.assertEqual(result, 'test')
@@ -26,17 +33,69 @@ class TestOntServerRequestProcessor(TestCase):
             expected_message = "API server is down!"
             self.assertEqual(str(e), expected_message)
 
+    @patch('aberowl.taxonomy.find_root')
+    @patch('requests.get')
+    def test_find_ontology_root_from_taxonomy(self, mock_get, mock_find_root):
+        OntologyFactory(acronym='TEST')
+        tree = {'result': [{'owlClass': '<http://example.com/A>', 'class': 'http://example.com/A'}]}
+        mock_find_root.return_value = tree
+        result = processor.find_ontology_root('<http://example.com/A>', 'TEST')
+        self.assertEqual(result, tree)
+        mock_get.assert_not_called()
+
+    @patch('aberowl.taxonomy.find_root')
+    @patch('aberowl.taxonomy.run_query')
+    def test_access_counts(self, mock_run_query, mock_find_root):
+        # Queries answered from the taxonomy tables are counted too
+        OntologyFactory(acronym='TEST')
+        mock_run_query.return_value = {'result': [], 'time': 1}
+        mock_find_root.return_value = {'result': []}
+        processor.execute_dl_query('<http://example.com/A>', 'subclass', 'TEST')
+        processor.find_ontology_root('<http://example.com/A>', 'TEST')
+        self.assertEqual(ontapi_registry.get_access_counts(['TEST']), {'TEST': 2})
+
+    @patch('aberowl.taxonomy.find_root')
+    @patch('requests.get')
+    def test_find_ontology_root_axioms(self, mock_get, mock_find_root):
+        # The selected class gets its axioms from the ontology API
+        OntologyFactory(acronym='TEST')
+        set_live('TEST')
+        mock_find_root.return_value = {'result': [
+            {'owlClass': '<http://example.com/A>', 'class': 'http://example.com/A', 'children': [
+                {'owlClass': '<http://example.com/B>', 'class': 'http://example.com/B'}]},
+            {'owlClass': '<http://example.com/C>', 'class': 'http://example.com/C'}]}
+        mock_get.return_value = get_json_mock_response({'result': [
+            {'class': 'http://example.com/B', 'SubClassOf': ['A'], 'Equivalent': [], 'Disjoint': ['C']}]})
+        result = processor.find_ontology_root('<http://example.com/B>', 'TEST')
+        self.assertEqual(result['result'][0]['children'][0], {
+            'owlClass': '<http://example.com/B>', 'class': 'http://example.com/B',
+            'SubClassOf': ['A'], 'Equivalent': [], 'Disjoint': ['C']})
+        self.assertNotIn('SubClassOf', result['result'][0])
+        self.assertIn('axioms=true', mock_get.call_args[0][0])
+        self.assertIn('type=equivalent', mock_get.call_args[0][0])
+
     @patch('requests.get')
     def test_find_ontology_object_properties(self, mock_get):
-        OntologyFactory(acronym='TEST', nb_servers=2)
+        OntologyFactory(acronym='TEST')
+        set_live('TEST')
         mock_get.return_value = get_json_mock_response('test')
         result = processor.find_ontology_object_properties('TEST', ont_property='property')
         self.assertEqual(result, 'test')
 
+    @patch('requests.get')
+    def test_ontology_loading(self, mock_get):
+        OntologyFactory(acronym='TEST')
+        set_live('TEST')
+        mock_get.return_value = get_json_mock_response(
+            {'status': 'loading', 'message': 'Ontology TEST is loading, please retry later.'}, status_code=503)
+        with self.assertRaisesMessage(Exception, 'Ontology TEST is loading'):
+            processor.execute_dl_query('A', 'subclass', 'TEST')
+
     @patch.object(processor, 'execute_dl_query')
     @patch('requests.get')
     def test_match_superclasses(self, mock_get, mock_execute_dl_query):
-        OntologyFactory(acronym='TEST', nb_servers=2)
+        OntologyFactory(acronym='TEST')
+        set_live('TEST')
         mock_get.return_value = get_json_mock_response('test')
         mock_response1 = {'result': [{'owlClass': 'Class1'}, {'owlClass': 'Class2'}, {'owlClass': 'Class1'}]}
         mock_response2 = {'result': [{'owlClass': 'Class3'}, {'owlClass': 'Class4'}, {'owlClass': 'Class3'}]}
@@ -56,24 +115,31 @@ class TestOntServerRequestProcessor(TestCase):
 
     @patch('requests.get')
     def test_find_by_ontology_and_class(self, mock_get):
-        OntologyFactory(acronym='TEST', nb_servers=2)
+        OntologyFactory(acronym='TEST')
+        set_live('TEST')
         mock_get.return_value = get_json_mock_response('test')
         result = processor.find_by_ontology_and_class('TEST', 'test_class')
         self.assertEqual(result, 'test')
 
     @patch('requests.get')
     def test_execute_dl_query(self, mock_get):
-        OntologyFactory(acronym='TEST1', nb_servers=0)
+        OntologyFactory(acronym='TEST1')
         try:
             processor.execute_dl_query(query='query', query_type='query_type', ontology_acronym=None, labels=True)
         except Exception as e:
             expected_message = "API server is down!"
             self.assertEqual(str(e), expected_message)
 
-        OntologyFactory(acronym='TEST', nb_servers=2)
+        OntologyFactory(acronym='TEST')
+        set_live('TEST')
+        mock_get.return_value = get_json_mock_response({'result': [{'owlClass': 'A'}]})
+        result = processor.execute_dl_query(query='Query', query_type='query_type', ontology_acronym=None, labels=True)
+        self.assertEqual(result['result'], [{'owlClass': 'A'}])
+        self.assertTrue(result['complete'])
+        self.assertEqual(mock_get.call_args[1]['params'], {
+            'query': 'query', 'type': 'query_type', 'axioms': 'false', 'labels': True, 'ontology': 'TEST'})
+
         mock_get.return_value = get_json_mock_response('test')
-        result = processor.execute_dl_query(query='query', query_type='query_type', ontology_acronym=None, labels=True)
-        self.assertEqual(result, 'test')
 
         result = processor.execute_dl_query(query='query', query_type='query_type', ontology_acronym='TEST',
                                             labels=True)
@@ -89,6 +155,16 @@ class TestOntServerRequestProcessor(TestCase):
         except Exception as e:
             self.assertEqual(str(e), "API server is down!")
 
+    @patch('aberowl.taxonomy.run_query')
+    @patch('requests.get')
+    def test_execute_dl_query_from_taxonomy(self, mock_get, mock_run_query):
+        OntologyFactory(acronym='TEST')
+        mock_run_query.return_value = {'result': [{'owlClass': 'A'}], 'time': 1}
+        result = processor.execute_dl_query(query='<http://example.com/B>', query_type='subclass',
+                                            ontology_acronym='TEST')
+        self.assertEqual(result['result'], [{'owlClass': 'A'}])
+        mock_get.assert_not_called()
+
     def test_is_query_complex(self):
         from aberowl.dl_query_logger import is_query_complex
         self.assertFalse(is_query_complex(None))
@@ -0,0 +1,56 @@
+from unittest.mock import patch, Mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from aberowl import queue_metrics
+from aberowlweb.celery import app, set_queue_concurrency
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueueMetricsTest(TestCase):
+
+    def test_wait_time_recorded_from_publish_time(self):
+        headers = {}
+        queue_metrics.add_publish_time(headers=headers)
+        task = Mock()
+        task.request.published_at = headers['published_at'] - 2
+        task.request.delivery_info = {'routing_key': 'validation'}
+        queue_metrics.record_task_wait_time(task=task)
+        queue_metrics.record_wait_time('validation', 1)
+
+        with patch('aberowl.queue_metrics.get_queue_depths', return_value={'validation': 3}):
+            all_metrics = queue_metrics.get_queue_metrics(app)
+        metrics = all_metrics['validation']
+        self.assertEqual(metrics['depth'], 3)
+        self.assertEqual(metrics['started'], 2)
+        self.assertEqual(metrics['last_wait_ms'], 1000)
+        self.assertGreaterEqual(metrics['max_wait_ms'], 2000)
+        self.assertGreaterEqual(metrics['avg_wait_ms'], 1500)
+        self.assertEqual(all_metrics['reload']['started'], 0)
+
+    def test_tasks_without_publish_time_ignored(self):
+        task = Mock()
+        task.request.published_at = None
+        task.request.headers = None
+        task.request.delivery_info = {'routing_key': 'index'}
+        queue_metrics.record_task_wait_time(task=task)
+        self.assertIsNone(queue_metrics.cache.get(queue_metrics.queue_metrics_key('index', 'started')))
+
+    @patch('aberowl.api_views.get_queue_metrics')
+    def test_queue_metrics_api(self, mock_metrics):
+        mock_metrics.return_value = {'validation': {'depth': 0, 'started': 1}}
+        response = self.client.get(reverse('api-queue_metrics'))
+        self.assertEqual(response.json()['result'], mock_metrics.return_value)
+
+    def test_task_routes(self):
+        self.assertEqual(app.amqp.router.route({}, 'aberowl.tasks.classify_ontology')['queue'].name, 'validation')
+        self.assertEqual(app.amqp.router.route({}, 'aberowl.tasks.sync_bioportal')['queue'].name, 'sync')
+
+    def test_queue_concurrency(self):
+        conf = Mock(worker_concurrency=24)
+        set_queue_concurrency(conf=conf, options={'queues': ['validation'], 'concurrency': None})
+        self.assertEqual(conf.worker_concurrency, 4)
+        conf = Mock(worker_concurrency=24)
+        set_queue_concurrency(conf=conf, options={'queues': 'validation', 'concurrency': 1})
+        self.assertEqual(conf.worker_concurrency, 24)
@@ -0,0 +1,87 @@
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from aberowl import scatter_gather
+from aberowl.tests.factories import get_json_mock_response
+
+TARGETS = {
+    'ONT_A': 'http://localhost:8080/api/',
+    'ONT_B': 'http://localhost:8081/api/',
+    'ONT_C': 'http://localhost:8081/api/',
+}
+
+
+class ScatterGatherTest(SimpleTestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def answer(self, url, params=None, timeout=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            ontology = params['ontology']
+            if ontology == 'ONT_B':
+                raise requests.Timeout()
+            if ontology == 'ONT_C':
+                return get_json_mock_response({'error': True, 'message': 'Query parsing error'}, status_code=400)
+            time.sleep(0.05)
+            return get_json_mock_response({'result': [{'owlClass': ontology + ':1'}, {'owlClass': ontology + ':2'}]})
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    @patch('aberowl.scatter_gather.requests.get')
+    def test_partial_results(self, mock_get):
+        mock_get.side_effect = self.answer
+        result = scatter_gather.gather('A', 'subclass', labels='true', targets=TARGETS)
+        self.assertEqual(result['result'], [{'owlClass': 'ONT_A:1'}, {'owlClass': 'ONT_A:2'}])
+        self.assertFalse(result['complete'])
+        self.assertEqual(result['timeout'], ['ONT_B'])
+        self.assertEqual(result['failed'], [{'ontology': 'ONT_C', 'message': 'Query parsing error'}])
+        self.assertEqual(mock_get.call_args_list[0][0][0], 'http://localhost:8080/api/runQuery.groovy')
+        self.assertEqual(mock_get.call_args_list[0][1]['params'], {
+            'query': 'A', 'type': 'subclass', 'axioms': 'false', 'labels': 'true', 'ontology': 'ONT_A'})
+
+    @patch('aberowl.scatter_gather.requests.get')
+    def test_bounded_concurrency(self, mock_get):
+        mock_get.side_effect = self.answer
+        targets = {'ONT_A%d' % i: 'http://localhost:8080/api/' for i in range(8)}
+        result = scatter_gather.gather('A', 'subclass', targets=targets, max_workers=3)
+        self.assertTrue(result['complete'])
+        self.assertEqual(len(result['result']), 16)
+        self.assertEqual(self.max_running, 3)
+
+    @patch('aberowl.scatter_gather.requests.get')
+    def test_deadline(self, mock_get):
+        def answer(url, params=None, timeout=None):
+            if params['ontology'] == 'SLOW':
+                time.sleep(0.5)
+            return get_json_mock_response({'result': [params['ontology']]})
+
+        mock_get.side_effect = answer
+        start = time.monotonic()
+        result = scatter_gather.gather(
+            'A', 'subclass', targets={'FAST': 'http://a/', 'SLOW': 'http://b/'}, timeout=0.2)
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(result['result'], ['FAST'])
+        self.assertEqual(result['timeout'], ['SLOW'])
+
+    @patch('aberowl.scatter_gather.requests.get')
+    def test_stream(self, mock_get):
+        mock_get.side_effect = self.answer
+        lines = [json.loads(line) for line in scatter_gather.stream('A', 'subclass', targets=TARGETS)]
+        self.assertEqual(sorted((line['ontology'], line['status']) for line in lines[:-1]), [
+            ('ONT_A', scatter_gather.OK), ('ONT_B', scatter_gather.TIMEOUT), ('ONT_C', scatter_gather.FAILED)])
+        self.assertEqual(lines[-1], {'status': 'done', 'complete': False, 'timeout': ['ONT_B'], 'failed': ['ONT_C']})
+
+    def test_no_targets(self):
+        self.assertEqual(list(scatter_gather.scatter('A', 'subclass', targets={})), [])
@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+
+from aberowl.search_query import SearchQueryBuilder, ELASTIC_SEARCH_MAX_SIZE
+
+
+class SearchQueryBuilderTest(SimpleTestCase):
+
+    def test_filter_context(self):
+        builder = SearchQueryBuilder()
+        builder.must({'match_bool_prefix': {'label': 'cell'}})
+        builder.filter_ontology('GO').exclude_deprecated()
+        query = builder.build()
+        self.assertEqual(query['query'], {'bool': {
+            'must': [{'match_bool_prefix': {'label': 'cell'}}],
+            'filter': [{'term': {'ontology': 'GO'}}, {'term': {'deprecated': False}}]}})
+        self.assertEqual(query['_source'], {'excludes': ['embedding_vector']})
+        self.assertEqual(builder.routing, 'go')
+
+    def test_size_limits(self):
+        self.assertEqual(SearchQueryBuilder(size=ELASTIC_SEARCH_MAX_SIZE + 1).build()['size'], ELASTIC_SEARCH_MAX_SIZE)
+        self.assertEqual(SearchQueryBuilder(size=0).build()['size'], 1)
+        self.assertEqual(SearchQueryBuilder(size='5').build()['size'], 5)
+        self.assertRaises(ValueError, SearchQueryBuilder, size='invalid')
+
+    def test_match_all(self):
+        query = SearchQueryBuilder().build()
+        self.assertEqual(query['query'], {'match_all': {}})
+        self.assertIsNone(SearchQueryBuilder().routing)
+
+    def test_script_score_and_source(self):
+        script = {'inline': 'binary_vector_score', 'lang': 'knn'}
+        builder = SearchQueryBuilder(size=50).filter_ontology('GO').script_score(script)
+        builder.source(includes=['embedding_vector'])
+        query = builder.build()
+        function_score = query['query']['function_score']
+        self.assertEqual(function_score['query'], {'bool': {'filter': [{'term': {'ontology': 'GO'}}]}})
+        self.assertEqual(function_score['script_score'], {'script': script})
+        self.assertEqual(function_score['boost_mode'], 'replace')
+        self.assertEqual(query['_source'], {'includes': ['embedding_vector']})
@@ -0,0 +1,128 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from aberowl import sync_schedule, tasks
+from aberowl.models import Ontology
+from aberowl.tests.factories import OntologyFactory, SubmissionFactory, UserFactory, get_json_mock_response
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SyncScheduleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ontology = OntologyFactory(acronym='TESTSCHED', source=Ontology.BIOPORTAL)
+        self.now = timezone.now()
+
+    def test_interval_from_submission_history(self):
+        self.assertEqual(
+            sync_schedule.get_history_interval(self.ontology),
+            timedelta(hours=sync_schedule.SYNC_DEFAULT_INTERVAL))
+        for i, days in enumerate((0, 10, 20, 50)):
+            SubmissionFactory(ontology=self.ontology, submission_id=i + 1,
+                              date_created=self.now - timedelta(days=days))
+        self.assertEqual(sync_schedule.get_history_interval(self.ontology), timedelta(days=10))
+
+    @patch('random.uniform', return_value=0)
+    def test_interval_adapts_to_changes(self, mock_uniform):
+        self.ontology.sync_interval = timedelta(days=8)
+        sync_schedule.record_check(self.ontology, sync_schedule.CHANGED, now=self.now)
+        self.ontology.refresh_from_db()
+        self.assertEqual(self.ontology.sync_interval, timedelta(days=4))
+        self.assertEqual(self.ontology.date_changed, self.now)
+        self.assertEqual(self.ontology.next_check, self.now + timedelta(days=4))
+
+        sync_schedule.record_check(self.ontology, sync_schedule.UNCHANGED, now=self.now)
+        self.ontology.refresh_from_db()
+        self.assertEqual(self.ontology.sync_interval, timedelta(days=6))
+        self.assertEqual(self.ontology.date_checked, self.now)
+
+        sync_schedule.record_check(self.ontology, sync_schedule.FAILED, now=self.now)
+        self.ontology.refresh_from_db()
+        self.assertEqual(self.ontology.sync_interval, timedelta(days=6))
+        self.assertEqual(
+            self.ontology.next_check, self.now + timedelta(hours=sync_schedule.SYNC_MIN_INTERVAL))
+
+        self.ontology.sync_interval = timedelta(hours=sync_schedule.SYNC_MAX_INTERVAL)
+        sync_schedule.record_check(self.ontology, sync_schedule.UNCHANGED, now=self.now)
+        self.assertEqual(self.ontology.sync_interval, timedelta(hours=sync_schedule.SYNC_MAX_INTERVAL))
+
+    def test_claim_due_acronyms(self):
+        OntologyFactory(acronym='LATER', next_check=self.now + timedelta(days=1))
+        OntologyFactory(acronym='OVERDUE', next_check=self.now - timedelta(days=2))
+        OntologyFactory(acronym='DUE', next_check=self.now - timedelta(days=1))
+        acronyms = ['LATER', 'DUE', 'OVERDUE', 'TESTSCHED', 'NEW']
+        due = sync_schedule.claim_due_acronyms(acronyms, now=self.now, limit=3)
+        self.assertEqual(due, {'TESTSCHED', 'NEW', 'OVERDUE'})
+        # claimed ontologies are not started again by the next run
+        due = sync_schedule.claim_due_acronyms(acronyms, now=self.now)
+        self.assertEqual(due, {'DUE'})
+
+    def test_claim_other_source(self):
+        OntologyFactory(acronym='OBO', source=Ontology.OBOFOUNDRY)
+        due = sync_schedule.claim_due_acronyms(['OBO', 'TESTSCHED'], now=self.now, sources=(Ontology.BIOPORTAL,))
+        self.assertEqual(due, {'TESTSCHED'})
+        self.assertIsNone(Ontology.objects.get(acronym='OBO').next_check)
+
+    @patch('random.uniform', return_value=0)
+    def test_missing_ontology_backoff(self, mock_uniform):
+        min_interval = timedelta(hours=sync_schedule.SYNC_MIN_INTERVAL)
+        sync_schedule.record_missing_check('RETIRED', sync_schedule.UNCHANGED, now=self.now)
+        self.assertEqual(sync_schedule.claim_due_acronyms(['RETIRED'], now=self.now), set())
+        later = self.now + min_interval
+        self.assertEqual(sync_schedule.claim_due_acronyms(['RETIRED'], now=later), {'RETIRED'})
+        sync_schedule.record_missing_check('RETIRED', sync_schedule.UNCHANGED, now=later)
+        self.assertEqual(cache.get(sync_schedule.backoff_key('RETIRED'))['next_check'],
+                         later + min_interval * sync_schedule.SYNC_INTERVAL_GROWTH)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ScheduledSyncTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        UserFactory(pk=1)
+        self.ontology = OntologyFactory(acronym='TESTSCHED', source=Ontology.BIOPORTAL)
+
+    @patch('aberowl.tasks.group')
+    @patch('requests.get')
+    def test_sync_starts_due_ontologies(self, mock_get, mock_group):
+        self.ontology.next_check = timezone.now() + timedelta(days=1)
+        self.ontology.save()
+        mock_get.return_value = get_json_mock_response([
+            {'acronym': 'TESTSCHED', 'name': 'Test'}, {'acronym': 'NEW', 'name': 'New'}])
+        self.assertEqual(tasks.sync_bioportal(), 1)
+        job = mock_group.call_args[0][0][0]
+        self.assertEqual(job.tasks[0].args[0]['acronym'], 'NEW')
+        self.ontology.next_check = timezone.now()
+        self.ontology.save()
+        # NEW is still running, it was postponed when it was claimed
+        self.assertEqual(tasks.sync_bioportal(), 1)
+        self.assertEqual(tasks.sync_bioportal(force=True), 2)
+
+    @patch('requests.get')
+    def test_retired_ontology_is_backed_off(self, mock_get):
+        mock_get.return_value = get_json_mock_response({'status': 'retired', 'submissionId': 1})
+        job = tasks.download_bioportal_ontology({'acronym': 'RETIRED', 'name': 'Retired'})
+        tasks.record_sync_check(job)
+        self.assertIsNotNone(cache.get(sync_schedule.backoff_key('RETIRED')))
+        self.assertNotIn('RETIRED', sync_schedule.claim_due_acronyms(['RETIRED']))
+
+    def test_sync_records_changes(self):
+        tasks.start_sync_progress(Ontology.BIOPORTAL, 2)
+        job = tasks.new_sync_job(Ontology.BIOPORTAL, 'TESTSCHED')
+        job['ontology_pk'] = self.ontology.pk
+        job['status'] = tasks.SYNC_UNCHANGED
+        tasks.index_synced_submission(job)
+        self.ontology.refresh_from_db()
+        self.assertIsNotNone(self.ontology.date_checked)
+        self.assertIsNone(self.ontology.date_changed)
+        self.assertGreater(self.ontology.next_check, timezone.now())
+
+        job['submission'] = {'submission_id': 2}
+        job['status'] = tasks.SYNC_INDEXED
+        tasks.index_synced_submission(job)
+        self.ontology.refresh_from_db()
+        self.assertEqual(self.ontology.date_changed, self.ontology.date_checked)
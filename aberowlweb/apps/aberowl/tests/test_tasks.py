@@ -0,0 +1,443 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from aberowl import ontapi_registry, tasks
+from aberowl.models import Ontology, Submission, ClassificationResult, ReindexJob
+from aberowl.tests.factories import (
+    OntologyFactory, SubmissionFactory, UserFactory, get_json_mock_response, set_live)
+
+
+def get_script_result(returncode=0, output=''):
+    return {'returncode': returncode, 'output': output}
+
+
+class IndexSubmissionTest(TestCase):
+    def setUp(self):
+        self.ontology = OntologyFactory(acronym='TESTIDX')
+        self.previous = SubmissionFactory(ontology=self.ontology, submission_id=1, indexed=True,
+                                          has_ontology_language='OWL')
+        self.submission = SubmissionFactory(ontology=self.ontology, submission_id=2, indexed=False,
+                                            has_ontology_language='OWL')
+
+        # class documents written by the classification stage
+        with open(self.submission.get_classes_filepath(), 'w') as f:
+            f.write('{"class": "http://example.com/A"}\n')
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT + 'ontologies/TESTIDX', ignore_errors=True)
+
+    @patch('aberowl.tasks.run_script')
+    def test_index_submission_without_previous_hashes(self, mock_run_script):
+        mock_run_script.return_value = get_script_result()
+        tasks.index_submission(self.ontology.pk, self.submission.pk)
+        args = mock_run_script.call_args[0][1]
+        self.assertEqual(args[-2], '../' + self.submission.get_hashes_filepath())
+        self.assertEqual(args[-1], '')
+        self.submission.refresh_from_db()
+        self.assertTrue(self.submission.indexed)
+
+    @patch('aberowl.tasks.run_script')
+    def test_index_submission_consumes_class_documents(self, mock_run_script):
+        mock_run_script.return_value = get_script_result()
+        tasks.index_submission(self.ontology.pk, self.submission.pk)
+        self.assertEqual(mock_run_script.call_count, 1)
+        self.assertEqual(mock_run_script.call_args[0][0], 'IndexElastic.groovy')
+        data = json.loads(mock_run_script.call_args[1]['stdin'])
+        self.assertEqual(data['classes_file'], '../' + self.submission.get_classes_filepath())
+        self.assertFalse(os.path.exists(self.submission.get_classes_filepath()))
+
+        # without class documents the ontology is loaded once without classification
+        mock_run_script.side_effect = [get_script_result(output='{"classifiable": true}\n'), get_script_result()]
+        tasks.index_submission(self.ontology.pk, self.submission.pk)
+        script, args = mock_run_script.call_args_list[1][0]
+        self.assertEqual(script, 'Ingest.groovy')
+        self.assertEqual(args[1:], ['TESTIDX', '../' + self.submission.get_classes_filepath(), 'false', 'false'])
+        self.assertEqual(mock_run_script.call_args_list[2][0][0], 'IndexElastic.groovy')
+
+    @patch('aberowl.tasks.run_script')
+    def test_index_submission_with_previous_hashes(self, mock_run_script):
+        mock_run_script.return_value = get_script_result()
+        with open(self.previous.get_hashes_filepath(), 'w') as f:
+            f.write('http://example.com/A\thash\n')
+        tasks.index_submission(self.ontology.pk, self.submission.pk)
+        args = mock_run_script.call_args[0][1]
+        self.assertEqual(args[-1], '../' + self.previous.get_hashes_filepath())
+
+        # full reindex is forced when incremental is disabled
+        with open(self.submission.get_classes_filepath(), 'w') as f:
+            f.write('{"class": "http://example.com/A"}\n')
+        tasks.index_submission(self.ontology.pk, self.submission.pk, incremental=False)
+        args = mock_run_script.call_args[0][1]
+        self.assertEqual(args[-1], '')
+
+    @patch('aberowl.tasks.run_script')
+    def test_index_submission_failure(self, mock_run_script):
+        mock_run_script.return_value = get_script_result(returncode=1)
+        tasks.index_submission(self.ontology.pk, self.submission.pk)
+        self.submission.refresh_from_db()
+        self.assertFalse(self.submission.indexed)
+
+
+class ClassifyOntologyTest(TestCase):
+    result = {'classifiable': True, 'incon': 0, 'status': Ontology.CLASSIFIED, 'nb_classes': 10}
+
+    @patch('aberowl.tasks.run_script')
+    def test_classification_cached_by_checksum(self, mock_run_script):
+        mock_run_script.return_value = get_script_result(output=json.dumps(self.result) + '\n')
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'ontology')
+            f.flush()
+            self.assertEqual(tasks.classify_ontology(f.name), self.result)
+            self.assertEqual(tasks.classify_ontology(f.name), self.result)
+        self.assertEqual(mock_run_script.call_count, 1)
+        self.assertEqual(ClassificationResult.objects.count(), 1)
+
+    @patch('aberowl.tasks.run_script')
+    def test_classifier_version_invalidates_results(self, mock_run_script):
+        ClassificationResult.objects.create(checksum='abc', classifier_version='old', result=self.result)
+        mock_run_script.return_value = get_script_result(output=json.dumps(self.result) + '\n')
+        tasks.classify_ontology('../media/abc.owl', 'abc')
+        mock_run_script.assert_called_once()
+        self.assertEqual(
+            list(ClassificationResult.objects.values_list('classifier_version', flat=True)),
+            [tasks.get_classifier_version()])
+
+    @patch('aberowl.tasks.run_script')
+    def test_cached_classification_writes_class_documents(self, mock_run_script):
+        ClassificationResult.objects.create(
+            checksum='abc', classifier_version=tasks.get_classifier_version(), result=self.result)
+        mock_run_script.return_value = get_script_result(output='{"classifiable": true}\n')
+        self.assertEqual(tasks.classify_ontology('../media/abc.owl', 'abc'), self.result)
+        mock_run_script.assert_not_called()
+
+        result = tasks.classify_ontology('../media/abc.owl', 'abc', 'GO', '../media/abc.owl.classes')
+        self.assertEqual(result, self.result)
+        mock_run_script.assert_called_once_with(
+            'Ingest.groovy', ['../media/abc.owl', 'GO', '../media/abc.owl.classes', 'false', 'false'])
+
+    @patch('aberowl.tasks.run_script')
+    def test_cached_classification_writes_missing_snapshot(self, mock_run_script):
+        ClassificationResult.objects.create(
+            checksum='abc', classifier_version=tasks.get_classifier_version(), result=self.result)
+        mock_run_script.return_value = get_script_result(output='{"classifiable": true}\n')
+        result = tasks.classify_ontology('../media/abc.owl', 'abc', 'GO', '', '../media/abc.owl.taxonomy.gz')
+        self.assertEqual(result, self.result)
+        mock_run_script.assert_called_once_with(
+            'Ingest.groovy', ['../media/abc.owl', 'GO', '', 'false', 'false', '', '../media/abc.owl.taxonomy.gz'])
+
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=settings.MEDIA_ROOT) as folder:
+            snapshot_filepath = os.path.join(folder, 'abc.owl.taxonomy.gz')
+            open(snapshot_filepath, 'w').close()
+            mock_run_script.reset_mock()
+            tasks.classify_ontology('../media/abc.owl', 'abc', 'GO', '', '../' + snapshot_filepath)
+            mock_run_script.assert_not_called()
+
+    @patch('aberowl.tasks.run_script')
+    def test_unclassifiable_results_not_cached(self, mock_run_script):
+        mock_run_script.return_value = get_script_result(returncode=1)
+        self.assertEqual(tasks.classify_ontology('../media/abc.owl', 'abc'), {'classifiable': False})
+        self.assertFalse(ClassificationResult.objects.exists())
+
+
+class ValidateSubmissionTest(TestCase):
+    result = {
+        'classifiable': True, 'incon': 0, 'status': Ontology.CLASSIFIED, 'nb_classes': 10,
+        'nb_individuals': 0, 'nb_properties': 1, 'max_depth': 3, 'max_children': 4, 'avg_children': 2}
+
+    def setUp(self):
+        self.ontology = OntologyFactory(acronym='TESTVAL')
+        self.submission = SubmissionFactory(ontology=self.ontology, submission_id=1, has_ontology_language='OWL',
+                                            status=Submission.VALIDATING, classifiable=False)
+        with open(self.submission.get_upload_filepath(), 'w') as f:
+            f.write('ontology')
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT + 'ontologies/TESTVAL', ignore_errors=True)
+
+    @patch('aberowl.tasks.index_submission.delay')
+    @patch('aberowl.tasks.reload_ontology.delay')
+    @patch('aberowl.tasks.store_file')
+    @patch('aberowl.tasks.classify_ontology')
+    def test_validated_submission_is_loaded(self, mock_classify, mock_store_file, mock_reload, mock_index):
+        def classify(filepath, checksum, acronym, classes_filepath, snapshot_filepath):
+            for path in (classes_filepath, snapshot_filepath):
+                with open(path[len('../'):], 'w') as f:
+                    f.write('new')
+            return self.result
+
+        mock_classify.side_effect = classify
+        self.assertTrue(tasks.validate_submission(self.submission.pk))
+        mock_classify.assert_called_once_with(
+            '../' + self.submission.get_upload_filepath(), tasks.file_checksum(self.submission.get_upload_filepath()),
+            'TESTVAL', '../' + self.submission.get_classes_filepath() + '.validating',
+            '../' + self.submission.get_snapshot_filepath() + '.validating')
+        for path in (self.submission.get_classes_filepath(), self.submission.get_snapshot_filepath()):
+            with open(path) as f:
+                self.assertEqual(f.read(), 'new')
+            self.assertFalse(os.path.exists(path + '.validating'))
+        mock_store_file.assert_called_once()
+        self.assertEqual(mock_store_file.call_args[0][1], [
+            self.submission.get_filepath(), self.submission.get_filepath('latest')])
+        mock_reload.assert_called_once()
+        mock_index.assert_called_once_with(self.ontology.pk, self.submission.pk)
+
+        status = tasks.get_submission_status(Submission.objects.get(pk=self.submission.pk))
+        self.assertEqual(status['status'], Ontology.CLASSIFIED)
+        self.assertFalse(status['validating'])
+        self.assertTrue(status['classifiable'])
+        self.assertEqual(status['nb_classes'], 10)
+        self.ontology.refresh_from_db()
+        self.assertEqual(self.ontology.status, Ontology.CLASSIFIED)
+        self.assertEqual(Submission.objects.get(pk=self.submission.pk).md5sum,
+                         mock_classify.call_args[0][1])
+
+    @patch('aberowl.tasks.index_submission.delay')
+    @patch('aberowl.tasks.reload_ontology.delay')
+    @patch('aberowl.tasks.classify_ontology')
+    def test_unloadable_submission(self, mock_classify, mock_reload, mock_index):
+        mock_classify.return_value = {'classifiable': False}
+        self.assertFalse(tasks.validate_submission(self.submission.pk))
+        self.assertFalse(os.path.exists(self.submission.get_upload_filepath()))
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.status, Ontology.UNLOADABLE)
+        mock_reload.assert_not_called()
+        mock_index.assert_not_called()
+
+    @patch('aberowl.tasks.index_submission.delay')
+    @patch('aberowl.tasks.reload_ontology.delay')
+    @patch('aberowl.tasks.classify_ontology')
+    def test_failed_edit_keeps_valid_submission(self, mock_classify, mock_reload, mock_index):
+        self.submission.classifiable = True
+        self.submission.save()
+        for path in (self.submission.get_classes_filepath(), self.submission.get_snapshot_filepath()):
+            with open(path, 'w') as f:
+                f.write('valid')
+        mock_classify.return_value = {'classifiable': False}
+        self.assertFalse(tasks.validate_submission(self.submission.pk, Ontology.CLASSIFIED))
+        for path in (self.submission.get_classes_filepath(), self.submission.get_snapshot_filepath()):
+            with open(path) as f:
+                self.assertEqual(f.read(), 'valid')
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.status, Ontology.CLASSIFIED)
+        mock_reload.assert_not_called()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReloadOntologyTest(TestCase):
+    workers = ['http://w1/api/', 'http://w2/api/', 'http://w3/api/', 'http://w4/api/']
+
+    def setUp(self):
+        cache.clear()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def reload(self, url, params=None, timeout=None):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if url.startswith('http://w3/'):
+            raise requests.exceptions.Timeout('Read timed out')
+        return get_json_mock_response({'status': 'ok'})
+
+    @patch('aberowl.tasks.ABEROWL_API_WORKERS', workers)
+    @patch('aberowl.tasks.requests.get')
+    def test_rolling_reload(self, mock_get):
+        mock_get.side_effect = self.reload
+        results = tasks.reload_ontology('GO', 'http://localhost/go.owl')
+        self.assertEqual([result['worker'] for result in results], self.workers)
+        self.assertEqual([result['status'] for result in results], ['ok', 'ok', 'error', 'ok'])
+        self.assertIn('timed out', results[2]['message'])
+        self.assertEqual(self.max_running, 2)
+        self.assertEqual(mock_get.call_args[1]['timeout'][1], tasks.ABEROWL_RELOAD_TIMEOUT)
+
+    @patch('aberowl.tasks.ABEROWL_API_WORKERS', workers)
+    @patch('aberowl.tasks.requests.get')
+    def test_reload_routed_process(self, mock_get):
+        mock_get.side_effect = self.reload
+        ontapi_registry.set_assignments('http://w2/api/', ['GO'])
+        results = tasks.reload_ontology('GO', 'http://localhost/go.owl')
+        self.assertEqual([result['worker'] for result in results], ['http://w2/api/'])
+        set_live('GO', url='http://w4/api/')
+        results = tasks.reload_ontology('GO', 'http://localhost/go.owl')
+        self.assertEqual([result['worker'] for result in results], ['http://w4/api/'])
+
+    def test_reload_parallelism(self):
+        self.assertEqual(tasks.get_reload_parallelism(1), 1)
+        self.assertEqual(tasks.get_reload_parallelism(5), 2)
+        with patch('aberowl.tasks.ABEROWL_RELOAD_MAX_UNAVAILABLE', 1.0):
+            self.assertEqual(tasks.get_reload_parallelism(5), 5)
+
+    @patch('aberowl.tasks.ABEROWL_API_WORKERS', workers[:2])
+    @patch('aberowl.tasks.reload_ontology')
+    def test_retry_unloadable_ontology(self, mock_reload):
+        loaded = OntologyFactory(acronym='LOADED', status=Ontology.UNLOADABLE)
+        failed = OntologyFactory(acronym='FAILED', status=Ontology.UNLOADABLE)
+        routed = OntologyFactory(acronym='ROUTED', status=Ontology.UNLOADABLE)
+        results = {
+            'LOADED': [{'status': 'ok'}, {'status': 'ok'}],
+            'FAILED': [{'status': 'ok'}, {'status': 'error'}],
+            'ROUTED': [{'status': 'ok'}],
+        }
+        mock_reload.side_effect = lambda acronym: results[acronym]
+        tasks.retry_unloadable_ontology()
+        for ontology, status in ((loaded, Ontology.CLASSIFIED), (failed, Ontology.UNLOADABLE),
+                                 (routed, Ontology.CLASSIFIED)):
+            ontology.refresh_from_db()
+            self.assertEqual(ontology.status, status)
+
+
+class ClassIndexSettingsTest(TestCase):
+    def test_shard_count_from_class_count(self):
+        self.assertEqual(tasks.get_class_index_settings()['number_of_shards'], 1)
+
+        ontology = OntologyFactory()
+        SubmissionFactory(ontology=ontology, submission_id=1, nb_classes=10)
+        SubmissionFactory(ontology=ontology, submission_id=2, nb_classes=tasks.ELASTIC_CLASS_INDEX_SHARD_SIZE)
+        SubmissionFactory(submission_id=1, nb_classes=tasks.ELASTIC_CLASS_INDEX_SHARD_SIZE)
+        index_settings = tasks.get_class_index_settings()
+        self.assertEqual(index_settings['number_of_shards'], 2)
+        self.assertEqual(index_settings['routing_partition_size'], 1)
+
+        SubmissionFactory(submission_id=1, nb_classes=tasks.ELASTIC_CLASS_INDEX_SHARD_SIZE * 100)
+        index_settings = tasks.get_class_index_settings()
+        self.assertEqual(index_settings['number_of_shards'], tasks.ELASTIC_CLASS_INDEX_MAX_SHARDS)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SyncOntologiesTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(pk=1)
+        self.ontology = OntologyFactory(acronym='TESTSYNC', source=Ontology.BIOPORTAL, created_by=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT + 'ontologies/TESTSYNC', ignore_errors=True)
+
+    @patch('aberowl.tasks.group')
+    @patch('requests.get')
+    def test_sync_obofoundry_fan_out(self, mock_get, mock_group):
+        mock_get.return_value = get_json_mock_response({'ontologies': [
+            {'id': 'go'}, {'id': 'chebi'}, {'id': 'old', 'is_obsolete': True}]})
+        self.assertEqual(tasks.sync_obofoundry(), 2)
+        self.assertEqual(len(mock_group.call_args[0][0]), 2)
+        mock_group.return_value.apply_async.assert_called_once()
+        self.assertEqual(tasks.get_sync_progress(Ontology.OBOFOUNDRY)['total'], 2)
+
+        self.assertEqual(tasks.sync_obofoundry(chem=True, force=True), 1)
+
+    @patch('requests.get')
+    def test_download_bioportal_existing_submission(self, mock_get):
+        submission = SubmissionFactory(ontology=self.ontology, submission_id=3, indexed=False, classifiable=True)
+        mock_get.return_value = get_json_mock_response({'submissionId': 3})
+        job = tasks.download_bioportal_ontology({'acronym': 'TESTSYNC', 'name': self.ontology.name})
+        self.assertEqual(job['status'], tasks.SYNC_CLASSIFIED)
+        self.assertEqual(job['submission_pk'], submission.pk)
+
+        mock_get.return_value = get_json_mock_response({'submissionId': 3, 'status': 'retired'})
+        job = tasks.download_bioportal_ontology({'acronym': 'TESTSYNC', 'name': self.ontology.name})
+        self.assertEqual(job['status'], tasks.SYNC_UNCHANGED)
+
+    @patch('os.remove')
+    @patch('aberowl.tasks.download_file')
+    def test_download_obofoundry_skips_unchanged_files(self, mock_download, mock_remove):
+        onto = {'id': 'testsync', 'title': self.ontology.name, 'ontology_purl': 'http://example.com/testsync.owl'}
+        mock_download.return_value = {'status': tasks.NOT_MODIFIED}
+        job = tasks.download_obofoundry_ontology(onto)
+        self.assertEqual(job['status'], tasks.SYNC_UNCHANGED)
+
+        SubmissionFactory(ontology=self.ontology, submission_id=1, md5sum='abc')
+        mock_download.return_value = {'status': 'downloaded', 'md5sum': 'abc', 'etag': '"v2"', 'last_modified': None}
+        job = tasks.download_obofoundry_ontology(onto)
+        self.assertEqual(job['status'], tasks.SYNC_UNCHANGED)
+        self.ontology.refresh_from_db()
+        self.assertEqual(self.ontology.download_etag, '"v2"')
+
+    @patch('aberowl.tasks.reload_ontology.delay')
+    @patch('aberowl.tasks.classify_ontology')
+    def test_classify_and_index_stages(self, mock_classify, mock_reload):
+        tasks.start_sync_progress(Ontology.BIOPORTAL, 2)
+        mock_classify.return_value = {
+            'classifiable': True, 'incon': 0, 'status': Ontology.CLASSIFIED, 'nb_classes': 10,
+            'nb_individuals': 0, 'nb_properties': 1, 'max_depth': 3, 'max_children': 4, 'avg_children': 2}
+        job = tasks.new_sync_job(Ontology.BIOPORTAL, 'TESTSYNC')
+        job['ontology_pk'] = self.ontology.pk
+        job['status'] = tasks.SYNC_DOWNLOADED
+        job['submission'] = {
+            'submission_id': 7, 'has_ontology_language': 'OWL',
+            'date_released': '2023-08-31T00:00:00+00:00', 'date_created': '2023-08-31T00:00:00+00:00'}
+        job = tasks.classify_synced_submission(job)
+        self.assertEqual(job['status'], tasks.SYNC_CLASSIFIED)
+        submission = Submission.objects.get(pk=job['submission_pk'])
+        self.assertEqual(submission.nb_classes, 10)
+        mock_reload.assert_called_once()
+
+        with patch('aberowl.tasks.index_submission') as mock_index:
+            Submission.objects.filter(pk=submission.pk).update(indexed=True)
+            job = tasks.index_synced_submission(job)
+            mock_index.assert_called_once_with(self.ontology.pk, submission.pk)
+        self.assertEqual(job['status'], tasks.SYNC_INDEXED)
+
+        failed = tasks.new_sync_job(Ontology.BIOPORTAL, 'OTHER')
+        failed['status'] = tasks.SYNC_FAILED
+        tasks.index_synced_submission(tasks.classify_synced_submission(failed))
+        progress = tasks.get_sync_progress(Ontology.BIOPORTAL)
+        self.assertEqual(progress['done'], 2)
+        self.assertEqual(progress['updated'], 1)
+        self.assertEqual(progress['failed'], 1)
+        self.assertEqual(progress['remaining'], 0)
+
+
+class ReindexJobTest(TestCase):
+    def setUp(self):
+        self.submissions = {}
+        for acronym in ('TESTA', 'TESTB', 'TESTC'):
+            ontology = OntologyFactory(acronym=acronym, status=Ontology.CLASSIFIED)
+            self.submissions[acronym] = SubmissionFactory(ontology=ontology, submission_id=1, nb_classes=10)
+        OntologyFactory(acronym='TESTD', status=Ontology.UNLOADABLE)
+
+    @patch('aberowl.tasks.index_submission')
+    def test_run_reindex_job(self, mock_index_submission):
+        mock_index_submission.side_effect = lambda ontology_pk, *args, **kwargs: (
+            ontology_pk != self.submissions['TESTB'].ontology_id)
+        job = tasks.create_reindex_job(True, 'http://localhost:9200/')
+        self.assertEqual(job.items.count(), 3)
+
+        tasks.run_reindex_job(job)
+        self.assertEqual(job.status, ReindexJob.FAILED)
+        progress = tasks.get_reindex_progress(job)
+        self.assertEqual(progress[ReindexJob.DONE], 2)
+        self.assertEqual(progress[ReindexJob.FAILED], 1)
+        self.assertEqual(progress['classes_done'], 20)
+        self.assertEqual(progress['classes_total'], 30)
+        self.assertEqual(tasks.get_unfinished_reindex_job(), job)
+
+    @patch('aberowl.tasks.index_submission')
+    def test_resume_reindex_job(self, mock_index_submission):
+        mock_index_submission.return_value = True
+        job = tasks.create_reindex_job(True, 'http://localhost:9200/')
+        items = list(job.items.order_by('pk'))
+        items[0].status = ReindexJob.DONE
+        items[0].save()
+        items[1].status = ReindexJob.RUNNING
+        items[1].save()
+
+        tasks.run_reindex_job(tasks.resume_reindex_job(job))
+        self.assertEqual(mock_index_submission.call_count, 2)
+        indexed = [call[0][0] for call in mock_index_submission.call_args_list]
+        self.assertNotIn(items[0].ontology_id, indexed)
+        self.assertEqual(job.status, ReindexJob.DONE)
+        self.assertIsNone(tasks.get_unfinished_reindex_job())
@@ -0,0 +1,159 @@
+import gzip
+import json
+import shutil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from aberowl import taxonomy
+from aberowl.models import TaxonomyClass, TaxonomyEdge
+from aberowl.tests.factories import OntologyFactory, SubmissionFactory
+
+EX = 'http://example.com/'
+
+
+def get_entry(name, label, parents=(), equivalents=(), deprecated=False, synonyms=()):
+    info = {'owlClass': '<' + EX + name + '>', 'class': EX + name, 'ontology': 'TESTTAX',
+            'label': label, 'deprecated': deprecated}
+    return {'info': info, 'names': [label.lower()] + list(synonyms),
+            'parents': [EX + parent for parent in parents],
+            'equivalents': [EX + equivalent for equivalent in equivalents]}
+
+
+def write_snapshot(submission, entries):
+    with gzip.open(submission.get_snapshot_filepath(), 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'ontology': 'TESTTAX', 'classes': len(entries)}) + '\n')
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+
+
+def get_labels(result):
+    return [info['label'] for info in result['result']]
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaxonomyTest(TestCase):
+    # A
+    # +- B == C
+    # |  +- D
+    # +- E (deprecated)
+    # F
+    def setUp(self):
+        cache.clear()
+        self.ontology = OntologyFactory(acronym='TESTTAX')
+        self.submission = SubmissionFactory(ontology=self.ontology, submission_id=1, has_ontology_language='OWL')
+        write_snapshot(self.submission, [
+            get_entry('A', 'Alpha'),
+            get_entry('B', 'Beta', parents=['A'], equivalents=['C']),
+            get_entry('C', 'Gamma', parents=['A'], equivalents=['B']),
+            get_entry('D', 'Delta', parents=['B', 'C'], synonyms=['dee']),
+            get_entry('E', 'Epsilon', parents=['A'], deprecated=True),
+            get_entry('F', 'Phi'),
+        ])
+        self.assertEqual(taxonomy.import_taxonomy(self.submission), 6)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT + 'ontologies/TESTTAX', ignore_errors=True)
+
+    def run_query(self, query, query_type, **kwargs):
+        return taxonomy.run_query(self.ontology, query, query_type, **kwargs)
+
+    def test_import(self):
+        self.submission.refresh_from_db()
+        self.assertTrue(self.submission.taxonomy_imported)
+        self.assertEqual(TaxonomyEdge.objects.filter(submission=self.submission).count(), 7)
+        self.assertEqual(TaxonomyEdge.objects.filter(submission=self.submission, parent=None).count(), 2)
+
+    def test_reimport_replaces_previous_submission(self):
+        submission = SubmissionFactory(ontology=self.ontology, submission_id=2, has_ontology_language='OWL')
+        write_snapshot(submission, [get_entry('A', 'Alpha')])
+        taxonomy.import_taxonomy(submission)
+        self.assertFalse(TaxonomyClass.objects.filter(submission=self.submission).exists())
+        self.submission.refresh_from_db()
+        self.assertFalse(self.submission.taxonomy_imported)
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'A>', 'subclass')), [])
+
+    def test_subclass(self):
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'A>', 'subclass', direct='true')),
+                         ['Beta', 'Gamma'])
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'A>', 'subclass', direct='false')),
+                         ['Beta', 'Delta', 'Gamma'])
+
+    def test_superclass(self):
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'D>', 'superclass', direct='true')),
+                         ['Beta', 'Gamma'])
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'D>', 'superclass')),
+                         ['Alpha', 'Beta', 'Gamma'])
+
+    def test_equivalent(self):
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'B>', 'equivalent')), ['Beta', 'Gamma'])
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'B>', 'supeq', direct='true')),
+                         ['Alpha', 'Beta', 'Gamma'])
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'B>', None, direct='true')),
+                         ['Beta', 'Delta', 'Gamma'])
+        # a class info query, a deprecated class has none
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'F>', 'equivalent')), ['Phi'])
+        self.assertEqual(get_labels(self.run_query('<' + EX + 'E>', 'equivalent')), [])
+
+    def test_labels(self):
+        self.assertEqual(get_labels(self.run_query("'dee'", 'superclass', labels='true', direct='true')),
+                         ['Beta', 'Gamma'])
+        self.assertEqual(get_labels(self.run_query('beta', 'subclass', labels=True)), ['Delta'])
+
+    def test_owl_thing(self):
+        query = '<http://www.w3.org/2002/07/owl#Thing>'
+        self.assertEqual(get_labels(self.run_query(query, 'subclass', direct='true')), ['Alpha', 'Phi'])
+        self.assertEqual(get_labels(self.run_query(query, 'subclass')),
+                         ['Alpha', 'Beta', 'Delta', 'Gamma', 'Phi'])
+        self.assertEqual(get_labels(self.run_query(query, 'superclass')), [])
+
+    def test_needs_ontology_api(self):
+        self.assertIsNone(self.run_query('beta and gamma', 'subclass', labels='true'))
+        self.assertIsNone(self.run_query('<' + EX + 'X>', 'subclass'))
+        self.assertIsNone(self.run_query('beta', 'subclass'))
+        self.assertIsNone(self.run_query('<' + EX + 'A>', 'subclass', axioms='true'))
+        self.assertIsNone(self.run_query('<' + EX + 'A>', 'realize'))
+
+    def test_latest_submission_not_imported(self):
+        SubmissionFactory(ontology=self.ontology, submission_id=2, has_ontology_language='OWL')
+        self.assertIsNone(self.run_query('<' + EX + 'A>', 'subclass'))
+
+    def test_root_paths(self):
+        ids = dict(TaxonomyClass.objects.values_list('iri', 'pk'))
+        paths = dict(TaxonomyClass.objects.values_list('iri', 'root_path'))
+        self.assertEqual(paths[EX + 'A'], [])
+        self.assertEqual(paths[EX + 'B'], [ids[EX + 'A']])
+        # Beta comes before Gamma
+        self.assertEqual(paths[EX + 'D'], [ids[EX + 'A'], ids[EX + 'B']])
+
+    def test_find_root(self):
+        result = taxonomy.find_root(self.ontology, '<' + EX + 'D>')['result']
+        self.assertEqual([info['label'] for info in result], ['Alpha', 'Phi'])
+        self.assertEqual([info['label'] for info in result[0]['children']], ['Beta', 'Gamma'])
+        self.assertNotIn('children', result[1])
+        beta = result[0]['children'][0]
+        self.assertEqual([info['label'] for info in beta['children']], ['Delta'])
+        self.assertEqual(beta['children'][0]['children'], [])
+        self.assertNotIn('children', result[0]['children'][1])
+
+    def test_find_node(self):
+        result = taxonomy.find_root(self.ontology, '<' + EX + 'D>')
+        self.assertEqual(taxonomy.find_node(result, '<' + EX + 'D>')['label'], 'Delta')
+        self.assertEqual(taxonomy.find_node(result, EX + 'F')['label'], 'Phi')
+        self.assertIsNone(taxonomy.find_node(result, EX + 'X'))
+
+    def test_find_root_cached_per_submission(self):
+        result = taxonomy.find_root(self.ontology, EX + 'B')
+        with self.assertNumQueries(1):
+            self.assertEqual(taxonomy.find_root(self.ontology, '<' + EX + 'B>'), result)
+        submission = SubmissionFactory(ontology=self.ontology, submission_id=2, has_ontology_language='OWL')
+        write_snapshot(submission, [get_entry('B', 'Beta')])
+        taxonomy.import_taxonomy(submission)
+        self.assertEqual([info['label'] for info in taxonomy.find_root(self.ontology, EX + 'B')['result']],
+                         ['Beta'])
+
+    def test_find_root_needs_ontology_api(self):
+        self.assertIsNone(taxonomy.find_root(self.ontology, '<' + EX + 'X>'))
+        SubmissionFactory(ontology=self.ontology, submission_id=2, has_ontology_language='OWL')
+        self.assertIsNone(taxonomy.find_root(self.ontology, '<' + EX + 'A>'))
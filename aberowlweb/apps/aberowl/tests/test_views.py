@@ -1,7 +1,8 @@
 import json
 from unittest.mock import patch, Mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.test import RequestFactory
 from aberowl.views import MainView
@@ -9,7 +10,7 @@ from aberowl.views import MainView
 from ..serializers import OntologySerializer
 
 from aberowl.models import Ontology
-from aberowl.tests.factories import OntologyFactory, SubmissionFactory
+from aberowl.tests.factories import OntologyFactory, SubmissionFactory, set_live
 from requests.models import Response
 
 
@@ -23,9 +24,13 @@ class MainViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
 class OntologyListViewTest(TestCase):
     def test_get_context_data(self):
-        ontologies = OntologyFactory.create_batch(2, status=Ontology.CLASSIFIED, nb_servers=1)
+        cache.clear()
+        ontologies = OntologyFactory.create_batch(2, status=Ontology.CLASSIFIED)
+        OntologyFactory(status=Ontology.CLASSIFIED)
+        set_live(*[ontology.acronym for ontology in ontologies])
 
         url = reverse('ontology-list')
 
@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 import json
-from django.views.generic import TemplateView, DetailView, ListView
+import mimetypes
+import os
+import posixpath
+from wsgiref.util import FileWrapper
+from django.views.generic import TemplateView, DetailView, ListView, View
 import requests
 from django.conf import settings
-from django.http import Http404
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, FileResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from django.utils._os import safe_join
+from aberowl import file_store
 from aberowl.models import Ontology
 from aberowl.serializers import OntologySerializer
 from aberowl.ont_server_request_processor import OntServerRequestProcessor
@@ -14,6 +22,9 @@ ABEROWL_API_URL = getattr(
 
 ont_server = OntServerRequestProcessor()
 
+# Working files next to the ontology files which are not published
+PRIVATE_MEDIA_SUFFIXES = ('.upload', '.validating', '.hashes', '.classes', '.axms', '.embs', '.tmp')
+
 
 class MainView(TemplateView):
     template_name = 'aberowl/main.html'
@@ -29,8 +40,7 @@ class OntologyListView(ListView):
 
     def get_context_data(self, *args, **kwargs):
         context = super(ListView, self).get_context_data(*args, **kwargs)
-        ontologies = self.get_queryset().filter(
-            status=Ontology.CLASSIFIED, nb_servers__gt=0)
+        ontologies = Ontology.filter_live(self.get_queryset().filter(status=Ontology.CLASSIFIED))
         data = OntologySerializer(ontologies, many=True).data
         context['ontologies'] = json.dumps(data)
         return context
@@ -79,3 +89,51 @@ class OntologyDetailView(DetailView):
         data['downloads'] = downloads
         context['ontology'] = json.dumps(data)
         return context
+
+
+def get_accepted_encodings(header):
+    encodings = set()
+    for item in header.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        if any(part.startswith('q=') and not part[2:].strip('0.') for part in parts[1:]):
+            continue
+        if parts[0]:
+            encodings.add(parts[0].lower())
+    return encodings
+
+
+class MediaFileView(View):
+    # Serves the ontology files and taxonomy snapshots under
+    # media/ontologies/, not the working files of the submissions.
+    # Compressed ontology files are sent as stored with Content-Encoding
+    # when the client accepts the encoding and are decompressed on the fly
+    # otherwise. Files requested with their compressed name, like taxonomy
+    # snapshots, are sent as they are.
+
+    def get(self, request, path):
+        path = posixpath.normpath(path).lstrip('/')
+        if not path.startswith('ontologies/') or path.endswith(PRIVATE_MEDIA_SUFFIXES):
+            raise Http404
+        try:
+            filepath = safe_join(settings.MEDIA_ROOT, path)
+        except SuspiciousFileOperation:
+            raise Http404
+        stored_filepath = file_store.find_file(filepath)
+        if stored_filepath is None:
+            raise Http404
+        content_type = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+        filename = os.path.basename(filepath)
+        encoding = file_store.get_encoding(stored_filepath) if stored_filepath != filepath else ''
+        accepted = get_accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if not encoding or encoding in accepted:
+            response = FileResponse(
+                open(stored_filepath, 'rb'), content_type=content_type, as_attachment=False, filename=filename)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        else:
+            # The decompressed length is unknown, no Content-Length
+            response = StreamingHttpResponse(
+                FileWrapper(file_store.open_file(filepath), FileResponse.block_size), content_type=content_type)
+            response['Content-Disposition'] = content_disposition_header(False, filename)
+        response['Vary'] = 'Accept-Encoding'
+        return response
@@ -1,6 +1,7 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import celeryd_init
 import configurations
 from django.conf import settings
 
@@ -19,3 +20,14 @@ app = Celery('aberowlweb')
 app.config_from_object(settings, namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+@celeryd_init.connect
+def set_queue_concurrency(conf=None, options=None, **kwargs):
+    # Workers consuming a single queue get the concurrency configured for it
+    queues = options.get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    queue_concurrency = getattr(settings, 'CELERY_QUEUE_CONCURRENCY', {})
+    if len(queues) == 1 and not options.get('concurrency') and queues[0] in queue_concurrency:
+        conf.worker_concurrency = queue_concurrency[queues[0]]
@@ -264,11 +264,57 @@ class BaseConfiguration(Configuration):
     CELERY_BROKER_POOL_LIMIT = 100
     CELERY_BROKER_CONNECTION_TIMEOUT = 10
 
-    # configure queues, currently we have only one
-    CELERY_DEFAULT_QUEUE = 'default'
-    CELERY_QUEUES = (
+    # configure queues, interactive validation of uploaded files, per
+    # ontology reloads, bulk ontology syncs and indexing are consumed by
+    # separate workers. Ontology syncs run every stage on its own queue so
+    # that workers with stage specific concurrency can consume them.
+    CELERY_TASK_DEFAULT_QUEUE = 'default'
+    CELERY_TASK_QUEUES = (
         Queue('default', Exchange('default'), routing_key='default'),
+        Queue('validation', Exchange('validation'), routing_key='validation'),
+        Queue('reload', Exchange('reload'), routing_key='reload'),
+        Queue('index', Exchange('index'), routing_key='index'),
+        Queue('sync', Exchange('sync'), routing_key='sync'),
+        Queue('sync_download', Exchange('sync_download'), routing_key='sync_download'),
+        Queue('sync_classify', Exchange('sync_classify'), routing_key='sync_classify'),
+        Queue('sync_index', Exchange('sync_index'), routing_key='sync_index'),
     )
+    # With redis 0 is the highest priority, bulk sync tasks get the lowest
+    CELERY_TASK_ROUTES = {
+        'aberowl.tasks.classify_ontology': {'queue': 'validation', 'priority': 0},
+        'aberowl.tasks.validate_submission': {'queue': 'validation', 'priority': 0},
+        'aberowl.tasks.reload_ontology': {'queue': 'reload', 'priority': 2},
+        'aberowl.tasks.retry_unloadable_ontology': {'queue': 'reload', 'priority': 6},
+        'aberowl.tasks.index_submission': {'queue': 'index', 'priority': 3},
+        'aberowl.tasks.reload_index': {'queue': 'index', 'priority': 3},
+        'aberowl.tasks.generate_embeddings': {'queue': 'index', 'priority': 6},
+        'aberowl.tasks.reload_indexes': {'queue': 'index', 'priority': 9},
+        'aberowl.tasks.sync_obofoundry': {'queue': 'sync', 'priority': 9},
+        'aberowl.tasks.sync_bioportal': {'queue': 'sync', 'priority': 9},
+        'aberowl.tasks.download_obofoundry_ontology': {'queue': 'sync_download', 'priority': 9},
+        'aberowl.tasks.download_bioportal_ontology': {'queue': 'sync_download', 'priority': 9},
+        'aberowl.tasks.classify_synced_submission': {'queue': 'sync_classify', 'priority': 9},
+        'aberowl.tasks.index_synced_submission': {'queue': 'sync_index', 'priority': 9},
+    }
+    CELERY_TASK_DEFAULT_PRIORITY = 5
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        'queue_order_strategy': 'priority',
+        'priority_steps': list(range(10)),
+        'sep': ':',
+    }
+    # Concurrency of a worker started with a single queue (-Q) and without -c
+    CELERY_QUEUE_CONCURRENCY = {
+        'default': 4,
+        'validation': 4,
+        'reload': 4,
+        'index': 2,
+        'sync': 1,
+        'sync_download': 16,
+        'sync_classify': 2,
+        'sync_index': 4,
+    }
+    # Sync tasks are long running, do not reserve more than one at a time
+    CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
     # Sensible settings for celery
     CELERY_ALWAYS_EAGER = False
@@ -289,6 +335,85 @@ class BaseConfiguration(Configuration):
 
     ABEROWL_API_WORKERS = [
         'http://localhost:8080/api/']
+    # Fraction of the API workers reloading the same ontology at once, the
+    # timeout of one reload in seconds and the number of ontologies
+    # retry_unloadable_ontology reloads at once
+    ABEROWL_RELOAD_MAX_UNAVAILABLE = env.float('ABEROWL_RELOAD_MAX_UNAVAILABLE', default=0.5)
+    ABEROWL_RELOAD_TIMEOUT = env.int('ABEROWL_RELOAD_TIMEOUT', default=3600)
+    ABEROWL_RELOAD_PARALLEL_ONTOLOGIES = env.int('ABEROWL_RELOAD_PARALLEL_ONTOLOGIES', default=2)
+
+    # runontapi partitions the ontologies over ONTAPI_PROCESSES ontology API
+    # processes listening on consecutive ports from ONTAPI_BASE_PORT and
+    # sharing RAM_SIZE GB of heap
+    ONTAPI_PROCESSES = env.int('ONTAPI_PROCESSES', default=1)
+    ONTAPI_HOST = env('ONTAPI_HOST', default='localhost')
+    ONTAPI_BASE_PORT = env.int('ONTAPI_BASE_PORT', default=8080)
+    ONTAPI_MEMORY = env.int('RAM_SIZE', default=10)
+    ONTAPI_MAX_RESTARTS = env.int('ONTAPI_MAX_RESTARTS', default=3)
+    # Load the ontologies which are not pinned on their first query, keeping
+    # the loaded ones below a fraction of the heap. Cold queries wait up to
+    # ONTAPI_LOAD_WAIT seconds before a loading response. Each process loads
+    # ONTAPI_LOAD_CONCURRENCY ontologies at once, an ontology which failed to
+    # load is tried again after ONTAPI_LOAD_FAILURE_BACKOFF seconds, doubled
+    # after every new failure.
+    ONTAPI_LAZY = env.bool('ONTAPI_LAZY', default=False)
+    ONTAPI_MAX_HEAP_FRACTION = env.float('ONTAPI_MAX_HEAP_FRACTION', default=0.8)
+    ONTAPI_LOAD_WAIT = env.int('ONTAPI_LOAD_WAIT', default=30)
+    ONTAPI_LOAD_CONCURRENCY = env.int('ONTAPI_LOAD_CONCURRENCY', default=2)
+    ONTAPI_LOAD_FAILURE_BACKOFF = env.int('ONTAPI_LOAD_FAILURE_BACKOFF', default=300)
+    # Ontologies are loaded by popularity over the last ONTAPI_POPULARITY_DAYS
+    # days, ONTAPI_STARTUP_BATCH_SIZE at a time in each process
+    ONTAPI_STARTUP_BATCH_SIZE = env.int('ONTAPI_STARTUP_BATCH_SIZE', default=8)
+    ONTAPI_POPULARITY_DAYS = env.int('ONTAPI_POPULARITY_DAYS', default=30)
+    # Classification writes the taxonomy snapshots ontologies are started from
+    ONTAPI_SNAPSHOTS = env.bool('ONTAPI_SNAPSHOTS', default=True)
+    # The ontologies of every process are published to the cache every
+    # ONTAPI_HEARTBEAT_INTERVAL seconds and expire after ONTAPI_HEARTBEAT_TIMEOUT
+    ONTAPI_HEARTBEAT_INTERVAL = env.int('ONTAPI_HEARTBEAT_INTERVAL', default=5)
+    ONTAPI_HEARTBEAT_TIMEOUT = env.int('ONTAPI_HEARTBEAT_TIMEOUT', default=30)
+
+    # DL queries without an ontology are sent to every ontology separately,
+    # DL_QUERY_MAX_WORKERS at a time, with a deadline per ontology and a
+    # deadline for the whole query in seconds
+    DL_QUERY_MAX_WORKERS = env.int('DL_QUERY_MAX_WORKERS', default=16)
+    DL_QUERY_ONTOLOGY_TIMEOUT = env.int('DL_QUERY_ONTOLOGY_TIMEOUT', default=10)
+    DL_QUERY_TIMEOUT = env.int('DL_QUERY_TIMEOUT', default=60)
+    # The taxonomy snapshots are imported in Postgres, hierarchy queries for a
+    # named class of one ontology do not go to the ontology API
+    TAXONOMY_TABLES = env.bool('TAXONOMY_TABLES', default=True)
+    TAXONOMY_BATCH_SIZE = env.int('TAXONOMY_BATCH_SIZE', default=5000)
+    # Seconds the root tree of a class is cached, the key has the submission
+    TAXONOMY_ROOT_CACHE_TIMEOUT = env.int('TAXONOMY_ROOT_CACHE_TIMEOUT', default=86400)
+
+    # Bounds and default of the interval between two syncs of an ontology in
+    # hours and the number of ontologies one hourly sync run starts
+    SYNC_MIN_INTERVAL = env.int('SYNC_MIN_INTERVAL', default=24)
+    SYNC_MAX_INTERVAL = env.int('SYNC_MAX_INTERVAL', default=24 * 28)
+    SYNC_DEFAULT_INTERVAL = env.int('SYNC_DEFAULT_INTERVAL', default=24 * 7)
+    SYNC_MAX_ONTOLOGIES_PER_RUN = env.int('SYNC_MAX_ONTOLOGIES_PER_RUN', default=200)
+
+    # 'gzip' or 'zstd' stores the ontology files compressed, see aberowl.file_store
+    FILE_STORE_COMPRESSION = env('FILE_STORE_COMPRESSION', default='')
+
+    # Bump to invalidate the cached classification results
+    CLASSIFIER_VERSION = env('CLASSIFIER_VERSION', default='1')
+
+    # Warm JVM workers running the groovy scripts in each celery process,
+    # 0 runs every script in a new groovy process
+    JVM_WORKER_POOL_SIZE = env.int('JVM_WORKER_POOL_SIZE', default=1)
+    JVM_WORKER_MAX_JOBS = env.int('JVM_WORKER_MAX_JOBS', default=50)
+    JVM_WORKER_MAX_MEMORY_MB = env.int('JVM_WORKER_MAX_MEMORY_MB', default=8192)
+    JVM_WORKER_JAVA_OPTS = env('JVM_WORKER_JAVA_OPTS', default='')
+
+    # word2vec parameters, embeddings are cached by file checksum and
+    # parameters; the number of threads does not invalidate the cache
+    EMBEDDINGS_SIZE = env.int('EMBEDDINGS_SIZE', default=256)
+    EMBEDDINGS_ITER = env.int('EMBEDDINGS_ITER', default=50)
+    EMBEDDINGS_MIN_COUNT = env.int('EMBEDDINGS_MIN_COUNT', default=1)
+    EMBEDDINGS_WINDOW = env.int('EMBEDDINGS_WINDOW', default=5)
+    EMBEDDINGS_THREADS = env.int('EMBEDDINGS_THREADS', default=4)
+    # 'gensim' streams the axioms into an in-process trainer without caching a corpus
+    EMBEDDINGS_TRAINER = env('EMBEDDINGS_TRAINER', default='word2vec')
 
     FILE_UPLOAD_HANDLERS = [
         # 'django.core.files.uploadhandler.MemoryFileUploadHandler',
@@ -315,6 +440,13 @@ class BaseConfiguration(Configuration):
     ELASTIC_SEARCH_PASSWORD = env('ELASTIC_SEARCH_PASSWORD', default='test123')
     ELASTIC_ONTOLOGY_INDEX_NAME = env('ELASTIC_ONTOLOGY_INDEX_NAME', default='aberowl_ontology')
     ELASTIC_CLASS_INDEX_NAME = env('ELASTIC_CLASS_INDEX_NAME', default='aberowl_owlclass')
+    ELASTIC_SEARCH_DEFAULT_SIZE = env.int('ELASTIC_SEARCH_DEFAULT_SIZE', default=10)
+    ELASTIC_SEARCH_MAX_SIZE = env.int('ELASTIC_SEARCH_MAX_SIZE', default=100)
+    # Shard count of the class index is derived from the total number of classes
+    ELASTIC_CLASS_INDEX_SHARD_SIZE = env.int('ELASTIC_CLASS_INDEX_SHARD_SIZE', default=5000000)
+    ELASTIC_CLASS_INDEX_MAX_SHARDS = env.int('ELASTIC_CLASS_INDEX_MAX_SHARDS', default=16)
+    ELASTIC_CLASS_INDEX_REPLICAS = env.int('ELASTIC_CLASS_INDEX_REPLICAS', default=1)
+    ELASTIC_CLASS_INDEX_ROUTING_PARTITION_SIZE = env.int('ELASTIC_CLASS_INDEX_ROUTING_PARTITION_SIZE', default=1)
 
     DLQUERY_LOGS_FOLDER = 'dl'
 
@@ -22,7 +22,6 @@ def test_create_ontology():
     assert ontology.date_modified == date_str
     assert ontology.status == Ontology.STATUS_CHOICES[0][0]
     assert not ontology.is_obsolete
-    assert ontology.nb_servers == 0
 
 
 @pytest.mark.django_db
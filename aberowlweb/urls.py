@@ -13,10 +13,11 @@ Including another URLconf
     1. Import the include() function: from django.conf.urls import url, include
     2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
 """
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.contrib import admin
 from django.conf.urls.static import static
 from aberowlweb.views import AboutPageView
+from aberowl.views import MediaFileView
 from django.conf import settings
 from django.views.generic import TemplateView
 
@@ -28,4 +29,7 @@ urlpatterns = [
                   path('about/', AboutPageView.as_view(), name='about'),
                   path('healthcheck', TemplateView.as_view(template_name='health.html')),
                   path('docs/', TemplateView.as_view(template_name="index.html"), name='api_docs'),
+                  # Ontology files may be stored compressed, see aberowl.file_store
+                  re_path(r'^%s(?P<path>ontologies/.*)$' % settings.MEDIA_URL.lstrip('/'), MediaFileView.as_view(),
+                          name='media'),
               ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + static(settings.STATIC_URL)
@@ -1,11 +1,6 @@
 @Grapes([
     @Grab(group='org.elasticsearch.client', module='elasticsearch-rest-client', version='7.3.1'),
     @Grab(group='org.elasticsearch.client', module='elasticsearch-rest-high-level-client', version='7.3.1'),
-    @Grab(group='org.semanticweb.elk', module='elk-owlapi', version='0.4.2'),
-    @Grab(group='net.sourceforge.owlapi', module='owlapi-api', version='4.2.3'),
-    @Grab(group='net.sourceforge.owlapi', module='owlapi-apibinding', version='4.2.3'),
-    @Grab(group='net.sourceforge.owlapi', module='owlapi-impl', version='4.2.3'),
-    @Grab(group='net.sourceforge.owlapi', module='owlapi-parsers', version='4.2.3'),
     @Grab(group='org.slf4j', module='slf4j-nop', version='1.7.25'),
     @Grab(group='ch.qos.reload4j', module='reload4j', version='1.2.18.5'),
     @GrabExclude(group='log4j', module='log4j'),
@@ -24,23 +19,11 @@ import org.apache.http.client.methods.*
 import org.apache.http.entity.*
 import org.apache.http.impl.client.*
 
-import org.semanticweb.elk.owlapi.ElkReasonerFactory;
-import org.semanticweb.elk.owlapi.ElkReasonerConfiguration
-import org.semanticweb.elk.reasoner.config.*
-import org.semanticweb.owlapi.apibinding.OWLManager;
-import org.semanticweb.owlapi.reasoner.*
-import org.semanticweb.owlapi.reasoner.structural.StructuralReasoner
-import org.semanticweb.owlapi.vocab.OWLRDFVocabulary;
-import org.semanticweb.owlapi.model.*;
-import org.semanticweb.owlapi.io.*;
-import org.semanticweb.owlapi.owllink.*;
-import org.semanticweb.owlapi.util.*;
-import org.semanticweb.owlapi.search.*;
-import org.semanticweb.owlapi.manchestersyntax.renderer.*;
-import org.semanticweb.owlapi.reasoner.structural.*
 
 import org.elasticsearch.client.indices.*
 import org.elasticsearch.action.index.IndexRequest
+import org.elasticsearch.action.delete.DeleteRequest
+import org.elasticsearch.action.bulk.BulkRequest
 import org.elasticsearch.common.xcontent.XContentType;
 import org.elasticsearch.client.RestClientBuilder
 import org.elasticsearch.client.RestClient
@@ -53,6 +36,7 @@ import org.elasticsearch.common.unit.TimeValue;
 import java.nio.*
 import java.nio.file.*
 import java.util.*
+import java.security.MessageDigest
 import org.apache.logging.log4j.*
 import java.net.URL
 
@@ -63,6 +47,13 @@ ontologyIndexName = args[3]
 owlClassIndexName = args[4]
 fileName = args[5]
 skip_embbedding = args[6]
+// Per-class content hashes written for this submission and read from the
+// previously indexed one. Without previous hashes the ontology is fully reindexed.
+hashesFileName = args.length > 7 ? args[7] : ""
+previousHashesFileName = args.length > 8 ? args[8] : ""
+
+BULK_SIZE = 1000
+bulkFailed = false
 
 esUrls = new ArrayList<URL>();
 hosts = new HttpHost[urls.length];
@@ -107,7 +98,13 @@ def indexExists(indexName) {
 	}
 }
 
-def initIndex() {
+// Class documents are routed by lower-cased ontology acronym so that
+// ontology scoped searches only touch a single shard
+String classRouting(String acronym) {
+	return acronym.toLowerCase()
+}
+
+def initIndex(def indexSettings) {
 	def settings = [
 	    "number_of_shards" : 1,
 	    "number_of_replicas" : 1,
@@ -121,6 +118,15 @@ def initIndex() {
 	    ]
 	]
 
+	def classSettings = new LinkedHashMap(settings)
+	if (indexSettings != null) {
+		classSettings["number_of_shards"] = indexSettings.number_of_shards
+		classSettings["number_of_replicas"] = indexSettings.number_of_replicas
+		if (indexSettings.routing_partition_size > 1) {
+			classSettings["routing_partition_size"] = indexSettings.routing_partition_size
+		}
+	}
+
     def ontologyIndexSettings = [
 		"settings" : settings,
 		"mappings":[
@@ -135,8 +141,9 @@ def initIndex() {
     ]
 
 	def classIndexSettings = [
-		"settings" : settings,
+		"settings" : classSettings,
 		"mappings":[
+		"_routing": ["required": true],
 		"properties" : [
 			"embedding_vector": [
 				"type": "binary",
@@ -178,21 +185,32 @@ def createIndex(indexName, settings) {
 }
 
 def deleteOntologyData(ontology) {
+	deleteByQuery(ontologyIndexName, ontology, null)
+	deleteByQuery(owlClassIndexName, ontology, classRouting(ontology))
+}
+
+def deleteByQuery(indexName, ontology, routing) {
 	try {
-		DeleteByQueryRequest request = new DeleteByQueryRequest(ontologyIndexName, owlClassIndexName);
+		DeleteByQueryRequest request = new DeleteByQueryRequest(indexName);
 		request.setQuery(new MatchQueryBuilder("ontology", ontology));
 		request.setTimeout(new TimeValue(10 * 60000));
+		if (routing != null) {
+			request.setRouting(routing);
+		}
 		response = esClient.deleteByQuery(request, RequestOptions.DEFAULT);
-		println("total=" + response.total + "|deletedDocs=" + response.deleted + "|searchRetries=" 
-			+ response.searchRetries + "|bulkRetries=" + response.bulkRetries)
+		println("index=" + indexName + "|total=" + response.total + "|deletedDocs=" + response.deleted
+			+ "|searchRetries=" + response.searchRetries + "|bulkRetries=" + response.bulkRetries)
 	}  catch (Exception e) {
 		e.printStackTrace();
 	}
 }
 
-def index(def indexName, def obj) {
+def index(def indexName, def docId, def obj) {
 	try {
 		request = new IndexRequest(indexName)
+		if (docId != null) {
+			request.id(docId)
+		}
 		request.source(new JsonBuilder(obj).toString(), XContentType.JSON);
 		esClient.index(request, RequestOptions.DEFAULT);
     } catch (Exception e) {
@@ -200,46 +218,73 @@ def index(def indexName, def obj) {
     }
 }
 
+def bulk(def requests) {
+	if (requests.isEmpty()) {
+		return
+	}
+	try {
+		BulkRequest request = new BulkRequest()
+		requests.each { request.add(it) }
+		request.timeout(new TimeValue(10 * 60000))
+		response = esClient.bulk(request, RequestOptions.DEFAULT)
+		if (response.hasFailures()) {
+			println(response.buildFailureMessage())
+			bulkFailed = true
+		}
+	}  catch (Exception e) {
+		e.printStackTrace();
+		bulkFailed = true
+	}
+	requests.clear()
+}
+
+String sha1(String value) {
+	MessageDigest digest = MessageDigest.getInstance("SHA-1")
+	return digest.digest(value.getBytes("UTF-8")).encodeHex().toString()
+}
 
-void indexOntology(String fileName, def data) {
-    // Initialize index
-    initIndex()
-    
-    OWLOntologyManager manager = OWLManager.createOWLOntologyManager()
-    OWLOntology ont = manager.loadOntologyFromOntologyDocument(new File(fileName))
-    OWLDataFactory fac = manager.getOWLDataFactory()
-    ConsoleProgressMonitor progressMonitor = new ConsoleProgressMonitor()
-    OWLReasonerConfiguration config = new SimpleConfiguration(progressMonitor)
-    ElkReasonerFactory f1 = new ElkReasonerFactory()
-    OWLReasoner reasoner = f1.createReasoner(ont, config)
-    def oReasoner = reasoner
-    def df = fac
-    
-    def identifiers = [
-	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/elements/1.1/identifier')),
-    ]
-    
-    def labels = [
-	df.getRDFSLabel(),
-	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#prefLabel')),
-	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000111'))
-    ]
-    def synonyms = [
-	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#altLabel')),
-	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000118')),
-	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasExactSynonym')),
-	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasSynonym')),
-	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasNarrowSynonym')),
-	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasBroadSynonym'))
-    ]
-    def definitions = [
-	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000115')),
-	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#definition')),
-	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/elements/1.1/description')),
-	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/terms/description')),
-	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasDefinition'))
-    ]
+// Stable document id so that a class can be updated or deleted in place
+String classDocId(String acronym, String cIRI) {
+	return sha1(acronym + "\n" + cIRI)
+}
 
+// Hash of the document content independent of annotation iteration order
+String contentHash(def info) {
+	def canonical = new TreeMap()
+	info.each { key, value ->
+		canonical[key] = (value instanceof List) ? value.collect { it.toString() }.sort() : value
+	}
+	return sha1(JsonOutput.toJson(canonical))
+}
+
+def readHashes(String hashesFile) {
+	def hashes = [:]
+	if (hashesFile && new File(hashesFile).exists()) {
+		new File(hashesFile).splitEachLine("\t") { it ->
+			if (it.size() == 2) {
+				hashes[it[0]] = it[1]
+			}
+		}
+	}
+	return hashes
+}
+
+def writeHashes(String hashesFile, def hashes) {
+	if (!hashesFile) {
+		return
+	}
+	new File(hashesFile).withWriter("UTF-8") { out ->
+		hashes.each { cIRI, hash ->
+			out.println(cIRI + "\t" + hash)
+		}
+	}
+}
+
+
+// Class documents are read from the JSON lines written by Ingest.groovy
+void indexOntology(def data) {
+    // Initialize index
+    initIndex(data.index_settings)
 
     def acronym = data.acronym
     def name = data.name
@@ -252,88 +297,64 @@ void indexOntology(String fileName, def data) {
 	omap.description = StringEscapeUtils.escapeJava(description)
     }
     
-    // Delete ontology data
-    deleteOntologyData(acronym)
-    
-    index(ontologyIndexName, omap)
+    def previousHashes = readHashes(previousHashesFileName)
+    def incremental = !previousHashes.isEmpty()
+    if (!incremental) {
+	// Delete ontology data
+	deleteOntologyData(acronym)
+    }
 
-    // Re-add all classes for this ont
+    index(ontologyIndexName, acronym.toLowerCase(), omap)
 
-    OWLOntologyImportsClosureSetProvider mp = new OWLOntologyImportsClosureSetProvider(manager, ont)
-    OWLOntologyMerger merger = new OWLOntologyMerger(mp, false)
-    def iOnt = merger.createMergedOntology(manager, IRI.create("http://test.owl"))
-
-    iOnt.getClassesInSignature(true).each {
-	c -> // OWLClass
-	def cIRI = c.getIRI().toString()
-	def info = [
-	    "owlClass": c.toString(),
-	    "class": cIRI,
-	    "ontology": acronym,
-	].withDefault { key -> [] };
-
-	def hasLabel = false
-	def deprecated = false;
-
-	EntitySearcher.getAnnotations(c, iOnt).each { annot ->
-	    def aProp = annot.getProperty()
-	    if (annot.isDeprecatedIRIAnnotation()) {
-		deprecated = true
-	    } else 
-		if (aProp in identifiers) {
-			if (annot.getValue() instanceof OWLLiteral) {
-				def aVal = annot.getValue().getLiteral()
-				info["identifier"] << aVal
-			}
-	    } else if (aProp in labels) {
-			if (annot.getValue() instanceof OWLLiteral) {
-				def aVal = annot.getValue().getLiteral()
-				info["label"] << aVal
-				hasLabel = true
-			}
-	    } else if (aProp in definitions) {
-			if (annot.getValue() instanceof OWLLiteral) {
-				def aVal = annot.getValue().getLiteral()
-				info["definition"] << StringEscapeUtils.escapeJava(aVal)
-			}
-	    } else if (aProp in synonyms) {
-			if (annot.getValue() instanceof OWLLiteral) {
-				def aVal = annot.getValue().getLiteral()
-				info["synonyms"] << aVal
-			}
-	    } 
-	}
-	// if (!deprecated) {
-
-	info['deprecated'] = deprecated
-	if (!hasLabel) {
-	info["label"] << c.getIRI().getFragment().toString()
-	}
+    // Re-add all classes for this ont
+    def hashes = [:]
+    def requests = []
+    def nbUpserts = 0
+    def slurper = new JsonSlurper()
+    new File(data.classes_file).eachLine("UTF-8") { line ->
+	def info = slurper.parseText(line)
+	def cIRI = info["class"]
 
 	// Add an embedding to the document
 	if (data["embeds"] != null && data["embeds"].containsKey(cIRI)) {
 		info["embedding_vector"] = data["embeds"][cIRI];
 	} 
 	
-	// generate OBO-style ID for the index
-	def oboId = ""
-	if (cIRI.lastIndexOf('?') > -1) {
-	oboId = cIRI.substring(cIRI.lastIndexOf('?') + 1)
-	} else if (cIRI.lastIndexOf('#') > -1) {
-	oboId = cIRI.substring(cIRI.lastIndexOf('#') + 1)
-	} else if (cIRI.lastIndexOf('/') > -1) {
-	oboId = cIRI.substring(cIRI.lastIndexOf('/') + 1)
+	def hash = contentHash(info)
+	hashes[cIRI] = hash
+	if (previousHashes[cIRI] != hash) {
+		requests.add(new IndexRequest(owlClassIndexName)
+			.id(classDocId(acronym, cIRI))
+			.routing(classRouting(acronym))
+			.source(new JsonBuilder(info).toString(), XContentType.JSON))
+		nbUpserts++
 	}
-	if (oboId.length() > 0) {
-	oboId = oboId.replaceAll("_", ":")
-	info["oboid"] = oboId
+	if (requests.size() >= BULK_SIZE) {
+		bulk(requests)
 	}
-	
-	
-	index(owlClassIndexName, info)
-	// }
     }
 
+    def nbDeletes = 0
+    previousHashes.keySet().each { cIRI ->
+	if (!hashes.containsKey(cIRI)) {
+		requests.add(new DeleteRequest(owlClassIndexName, classDocId(acronym, cIRI))
+			.routing(classRouting(acronym)))
+		nbDeletes++
+	}
+	if (requests.size() >= BULK_SIZE) {
+		bulk(requests)
+	}
+    }
+    bulk(requests)
+    if (bulkFailed) {
+	// Do not record hashes for documents that may not have been written
+	println('Failed indexing :' + acronym)
+	return
+    }
+    writeHashes(hashesFileName, hashes)
+
+	println("incremental=" + incremental + "|upserts=" + nbUpserts + "|deletes=" + nbDeletes
+		+ "|unchanged=" + (hashes.size() - nbUpserts))
 	println('Finished indexing :' + acronym)
 }
 
@@ -369,5 +390,9 @@ if (skip_embbedding.equals("False")) {
 	data["embeds"] = embeds
 }
 
-indexOntology(fileName, data)  
+indexOntology(data)
 esClient.close()
+// Fails the script without exiting the JVM when run by Worker.groovy
+if (bulkFailed) {
+	throw new RuntimeException("Bulk indexing failed")
+}
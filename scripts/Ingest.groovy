@@ -0,0 +1,361 @@
+@Grapes([
+    @Grab(group='org.semanticweb.elk', module='elk-owlapi', version='0.4.2'),
+    @Grab(group='net.sourceforge.owlapi', module='owlapi-api', version='4.2.3'),
+    @Grab(group='net.sourceforge.owlapi', module='owlapi-apibinding', version='4.2.3'),
+    @Grab(group='net.sourceforge.owlapi', module='owlapi-impl', version='4.2.3'),
+    @Grab(group='net.sourceforge.owlapi', module='owlapi-parsers', version='4.2.3'),
+    @Grab(group='org.slf4j', module='slf4j-nop', version='1.7.25'),
+    @Grab(group='com.github.luben', module='zstd-jni', version='1.5.5-5'),
+    @Grab(group='ch.qos.reload4j', module='reload4j', version='1.2.18.5'),
+    @GrabExclude(group='log4j', module='log4j'),
+])
+
+import org.semanticweb.owlapi.model.parameters.*
+import org.semanticweb.elk.owlapi.ElkReasonerFactory;
+import org.semanticweb.owlapi.apibinding.OWLManager;
+import org.semanticweb.owlapi.reasoner.*
+import org.semanticweb.owlapi.model.*;
+import org.semanticweb.owlapi.io.*;
+import org.semanticweb.owlapi.util.*;
+import org.semanticweb.owlapi.search.*;
+import org.semanticweb.owlapi.manchestersyntax.renderer.*;
+import groovy.json.*
+import java.util.zip.GZIPInputStream
+import java.util.zip.GZIPOutputStream
+import com.github.luben.zstd.ZstdInputStream
+
+// Loads and merges an ontology once and, depending on the flags:
+//  - classifies it with ELK and prints the metrics as the last output line
+//  - writes the class documents of the search index, one JSON object per
+//    line, to classesFileName
+//  - writes the axiom corpus of the embeddings to axiomsFileName, by
+//    default fileName.axms. With "-" the axioms are streamed to the output,
+//    one sentence per line before the metrics line.
+//  - writes the taxonomy snapshot of the ontology API to snapshotFileName,
+//    the inferred direct superclasses, equivalent classes and annotations
+//    of every class, gzipped JSON with one class per line
+// Without classification the last output line only tells whether the
+// ontology could be loaded.
+
+class URIShortFormProvider implements ShortFormProvider {
+
+    public String getShortForm(OWLEntity entity) {
+	return entity.toStringID();
+    }
+
+    public void dispose(){}
+}
+
+def MAX_UNSATISFIABLE_CLASSES = 500
+
+def fileName = args[0]
+def acronym = args[1]
+def classesFileName = args[2]
+def classify = args[3] == "true"
+def axioms = args[4] == "true"
+def axiomsFileName = args.length > 5 && args[5] ? args[5] : fileName + ".axms"
+def streamAxioms = axiomsFileName == "-"
+def snapshotFileName = args.length > 6 ? args[6] : ""
+
+def metrics = [classifiable: true]
+
+def writeClasses(OWLOntology ont, OWLDataFactory df, String acronym, String classesFileName) {
+    def identifiers = [
+	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/elements/1.1/identifier')),
+    ]
+    def labels = [
+	df.getRDFSLabel(),
+	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#prefLabel')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000111'))
+    ]
+    def synonyms = [
+	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#altLabel')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000118')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasExactSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasNarrowSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasBroadSynonym'))
+    ]
+    def definitions = [
+	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000115')),
+	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#definition')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/elements/1.1/description')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/terms/description')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasDefinition'))
+    ]
+
+    new File(classesFileName).withWriter("UTF-8") { out ->
+	ont.getClassesInSignature(true).each { c ->
+	    def cIRI = c.getIRI().toString()
+	    def info = [
+		"owlClass": c.toString(),
+		"class": cIRI,
+		"ontology": acronym,
+	    ].withDefault { key -> [] };
+
+	    def hasLabel = false
+	    def deprecated = false;
+
+	    EntitySearcher.getAnnotations(c, ont).each { annot ->
+		def aProp = annot.getProperty()
+		if (annot.isDeprecatedIRIAnnotation()) {
+		    deprecated = true
+		} else if (aProp in identifiers) {
+		    if (annot.getValue() instanceof OWLLiteral) {
+			info["identifier"] << annot.getValue().getLiteral()
+		    }
+		} else if (aProp in labels) {
+		    if (annot.getValue() instanceof OWLLiteral) {
+			info["label"] << annot.getValue().getLiteral()
+			hasLabel = true
+		    }
+		} else if (aProp in definitions) {
+		    if (annot.getValue() instanceof OWLLiteral) {
+			info["definition"] << StringEscapeUtils.escapeJava(annot.getValue().getLiteral())
+		    }
+		} else if (aProp in synonyms) {
+		    if (annot.getValue() instanceof OWLLiteral) {
+			info["synonyms"] << annot.getValue().getLiteral()
+		    }
+		}
+	    }
+
+	    info['deprecated'] = deprecated
+	    if (!hasLabel) {
+		info["label"] << c.getIRI().getFragment().toString()
+	    }
+
+	    // generate OBO-style ID for the index
+	    def oboId = ""
+	    if (cIRI.lastIndexOf('?') > -1) {
+		oboId = cIRI.substring(cIRI.lastIndexOf('?') + 1)
+	    } else if (cIRI.lastIndexOf('#') > -1) {
+		oboId = cIRI.substring(cIRI.lastIndexOf('#') + 1)
+	    } else if (cIRI.lastIndexOf('/') > -1) {
+		oboId = cIRI.substring(cIRI.lastIndexOf('/') + 1)
+	    }
+	    if (oboId.length() > 0) {
+		info["oboid"] = oboId.replaceAll("_", ":")
+	    }
+	    out.println(JsonOutput.toJson(info))
+	}
+    }
+}
+
+// Same class information as RequestManager.toInfo without the axioms, the
+// ontology API answers hierarchy queries from it without classifying
+def writeSnapshot(OWLOntology ont, OWLDataFactory df, OWLReasoner reasoner, String acronym, String snapshotFileName) {
+    def identifiers = [
+	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/elements/1.1/identifier')),
+    ]
+    def labels = [
+	df.getRDFSLabel(),
+	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#prefLabel')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000111'))
+    ]
+    def synonyms = [
+	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#altLabel')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000118')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasExactSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasNarrowSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasBroadSynonym'))
+    ]
+    def definitions = [
+	df.getOWLAnnotationProperty(new IRI('http://purl.obolibrary.org/obo/IAO_0000115')),
+	df.getOWLAnnotationProperty(new IRI('http://www.w3.org/2004/02/skos/core#definition')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/elements/1.1/description')),
+	df.getOWLAnnotationProperty(new IRI('http://purl.org/dc/terms/description')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasDefinition'))
+    ]
+    // The labels the query parser of the ontology API resolves
+    def names = [
+	df.getRDFSLabel(),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasNarrowSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasBroadSynonym')),
+	df.getOWLAnnotationProperty(new IRI('http://www.geneontology.org/formats/oboInOwl#hasExactSynonym'))
+    ]
+    def shortFormProvider = new SimpleShortFormProvider()
+
+    // Written next to the final file and moved, the ontology API never
+    // reads a partial snapshot
+    def tmpFile = new File(snapshotFileName + ".tmp")
+    new GZIPOutputStream(new FileOutputStream(tmpFile)).withWriter("UTF-8") { out ->
+	out.println(JsonOutput.toJson([ontology: acronym, classes: ont.getClassesInSignature(true).size()]))
+	ont.getClassesInSignature(true).each { c ->
+	    if (c.isOWLThing() || c.isOWLNothing()) {
+		return
+	    }
+	    def info = [
+		"owlClass": c.toString(),
+		"class": c.getIRI().toString(),
+		"ontology": acronym,
+		"deprecated": false
+	    ].withDefault { key -> [] }
+	    def classNames = new LinkedHashSet()
+	    def hasLabel = false
+	    def hasAnnot = false
+
+	    EntitySearcher.getAnnotationAssertionAxioms(c, ont).each { axiom ->
+		hasAnnot = true
+		def annot = axiom.getAnnotation()
+		def aProp = axiom.getProperty()
+		if (!(annot.getValue() instanceof OWLLiteral)) {
+		    if (annot.isDeprecatedIRIAnnotation()) {
+			info["deprecated"] = true
+		    }
+		    return
+		}
+		def aVal = annot.getValue().getLiteral()
+		if (aProp in names) {
+		    classNames << aVal.toLowerCase()
+		}
+		if (annot.isDeprecatedIRIAnnotation()) {
+		    info["deprecated"] = true
+		} else if (aProp in identifiers) {
+		    info["identifier"] << aVal
+		} else if (aProp in labels) {
+		    info["label"] = aVal
+		    hasLabel = true
+		} else if (aProp in definitions) {
+		    info["definition"] << aVal
+		} else if (aProp in synonyms) {
+		    info["synonyms"] << aVal
+		} else {
+		    def aLabels = EntitySearcher.getAnnotations(aProp, ont).findAll { it.getValue() instanceof OWLLiteral }
+		    if (aLabels.size() > 0) {
+			aLabels.each { l -> info[l.getValue().getLiteral()] << aVal }
+		    } else {
+			info[shortFormProvider.getShortForm(aProp)] << aVal
+		    }
+		}
+	    }
+	    if (!hasLabel) {
+		info["label"] = shortFormProvider.getShortForm(c)
+	    }
+	    if (!hasAnnot) {
+		info["deprecated"] = true
+	    }
+
+	    def parents = reasoner.getSuperClasses(c, true).getFlattened()
+	    parents.remove(df.getOWLThing())
+	    def equivalents = reasoner.getEquivalentClasses(c).getEntities()
+	    equivalents.remove(c)
+	    equivalents.remove(df.getOWLNothing())
+	    out.println(JsonOutput.toJson([
+		info: info,
+		names: classNames,
+		parents: parents.collect { it.getIRI().toString() },
+		equivalents: equivalents.collect { it.getIRI().toString() },
+	    ]))
+	}
+    }
+    def file = new File(snapshotFileName)
+    file.delete()
+    tmpFile.renameTo(file)
+}
+
+// Ontology files may be stored compressed with a .gz or .zst suffix, the
+// document IRI stays the one of the plain file name for relative imports
+def getDocumentSource(String fileName) {
+    def file = new File(fileName)
+    def gzFile = new File(fileName + ".gz")
+    def zstFile = new File(fileName + ".zst")
+    if (!file.exists() && gzFile.exists()) {
+	return new StreamDocumentSource(new GZIPInputStream(new FileInputStream(gzFile)), IRI.create(file))
+    } else if (!file.exists() && zstFile.exists()) {
+	return new StreamDocumentSource(new ZstdInputStream(new FileInputStream(zstFile)), IRI.create(file))
+    }
+    return new FileDocumentSource(file)
+}
+
+def classifyOntology(OWLOntology ont, OWLDataFactory fac, OWLReasoner reasoner, int maxUnsatisfiable) {
+    def incon = reasoner.getEquivalentClasses(fac.getOWLNothing()).getSize() - 1
+    def q = [[fac.getOWLThing(), 0],] as Queue
+    def used = new HashSet<OWLClass>();
+    used.add(fac.getOWLThing());
+    def nb_visits = 0;
+    def nb_children = 0;
+    def max_children = 0;
+    def max_depth = 0;
+    while(!q.isEmpty()) {
+	def item = q.poll()
+	def cur = item[0]
+	def depth = item[1]
+	def subs = reasoner.getSubClasses(cur, true).getFlattened();
+	subs.remove(fac.getOWLNothing());
+	def children = subs.size();
+	nb_children += children;
+	if (children > 0) nb_visits += 1;
+	if (max_depth < depth) max_depth = depth;
+	if (max_children < children) max_children = children;
+	subs.each {cl ->
+	    if (!used.contains(cl)) {
+		used.add(cl);
+		q.add([cl, depth + 1])
+	    }
+	}
+    }
+    return [
+	incon: incon, status: incon >= maxUnsatisfiable ? "Incoherent" : "Classified",
+	classifiable: true,
+	nb_classes: ont.getClassesInSignature().size(),
+	nb_individuals: ont.getIndividualsInSignature().size(),
+	nb_properties: ont.getObjectPropertiesInSignature().size(),
+	max_children: max_children, avg_children: nb_children.intdiv(nb_visits),
+	max_depth: max_depth]
+}
+
+def writeAxioms(OWLOntologyManager manager, OWLOntology ont, OWLDataFactory fac, OWLReasoner reasoner, PrintWriter out) {
+    OWLObjectRenderer renderer = new ManchesterOWLSyntaxOWLObjectRendererImpl();
+    renderer.setShortFormProvider(new URIShortFormProvider());
+    InferredSubClassAxiomGenerator generator = new InferredSubClassAxiomGenerator();
+    Set<OWLAxiom> inferred = generator.createAxioms(fac, reasoner);
+    manager.addAxioms(ont, inferred);
+    for (OWLAxiom axiom: ont.getTBoxAxioms(Imports.INCLUDED)) {
+	// Line breaks of annotations would split a sentence
+	out.println(renderer.render(axiom).replaceAll("[()]", "").replaceAll("[\\r\\n]+", " "));
+    }
+    out.flush();
+}
+
+try {
+    OWLOntologyManager manager = OWLManager.createOWLOntologyManager();
+    OWLOntology ont = manager.loadOntologyFromOntologyDocument(getDocumentSource(fileName));
+    OWLOntologyImportsClosureSetProvider provider = new OWLOntologyImportsClosureSetProvider(manager, ont);
+    OWLOntologyMerger merger = new OWLOntologyMerger(provider, false);
+    ont = merger.createMergedOntology(manager, IRI.create("http://merged.owl"));
+    OWLDataFactory fac = manager.getOWLDataFactory();
+
+    OWLReasoner reasoner = null
+    if (classify || axioms || snapshotFileName) {
+	// The progress monitor prints to the output, which carries the axioms when streaming
+	def monitor = streamAxioms ? new NullReasonerProgressMonitor() : new ConsoleProgressMonitor()
+	OWLReasonerConfiguration config = new SimpleConfiguration(monitor);
+	reasoner = new ElkReasonerFactory().createReasoner(ont, config);
+    }
+    if (classify) {
+	metrics = classifyOntology(ont, fac, reasoner, MAX_UNSATISFIABLE_CLASSES)
+    }
+    if (classesFileName) {
+	writeClasses(ont, fac, acronym, classesFileName)
+    }
+    // An incoherent taxonomy is not worth serving, the reasoner answers the
+    // queries of the ontology API
+    if (snapshotFileName && metrics.classifiable && (metrics.incon ?: 0) < MAX_UNSATISFIABLE_CLASSES) {
+	writeSnapshot(ont, fac, reasoner, acronym, snapshotFileName)
+    }
+    // Inferred axioms are added to the ontology, so this is done last
+    if (axioms && streamAxioms) {
+	writeAxioms(manager, ont, fac, reasoner, new PrintWriter(new OutputStreamWriter(System.out, "UTF-8")))
+    } else if (axioms) {
+	PrintWriter out = new PrintWriter(axiomsFileName, "UTF-8")
+	writeAxioms(manager, ont, fac, reasoner, out)
+	out.close()
+    }
+} catch (Exception e) {
+    metrics = [incon: 0, status: "Unloadable", classifiable: false, nb_classes: 0]
+    e.printStackTrace()
+}
+
+println(JsonOutput.toJson(metrics))
@@ -0,0 +1,57 @@
+// Long-lived worker running Ingest and IndexElastic in one JVM.
+// Jobs are read as one JSON object per line on stdin:
+//   {"script": "Ingest.groovy", "args": [...], "stdin": "..."}
+// and answered with one JSON line {"status": 0, "output": "..."} on stdout.
+// {"ping": true} is answered with the used heap and the number of jobs.
+// Compiled scripts, including their @Grab dependencies, are kept between
+// jobs. Every script gets its own class loader.
+
+import groovy.json.*
+import org.codehaus.groovy.runtime.InvokerHelper
+
+def protocolOut = System.out
+def protocolIn = System.in
+def reader = new BufferedReader(new InputStreamReader(protocolIn, "UTF-8"))
+def slurper = new JsonSlurper()
+def scripts = [:]
+def nbJobs = 0
+
+def respond = { result ->
+    protocolOut.println(JsonOutput.toJson(result))
+    protocolOut.flush()
+}
+
+respond([ready: true])
+String line
+while ((line = reader.readLine()) != null) {
+    def job = slurper.parseText(line)
+    if (job.ping) {
+	def runtime = Runtime.getRuntime()
+	respond([pong: true, used_memory: runtime.totalMemory() - runtime.freeMemory(), jobs: nbJobs])
+	continue
+    }
+
+    def buffer = new ByteArrayOutputStream()
+    def out = new PrintStream(buffer, true, "UTF-8")
+    def status = 0
+    System.setOut(out)
+    System.setIn(new ByteArrayInputStream((job.stdin ?: "").getBytes("UTF-8")))
+    try {
+	def scriptClass = scripts[job.script]
+	if (scriptClass == null) {
+	    scriptClass = new GroovyShell().getClassLoader().parseClass(new File(job.script))
+	    scripts[job.script] = scriptClass
+	}
+	def binding = new Binding(job.args as String[])
+	InvokerHelper.createScript(scriptClass, binding).run()
+    } catch (Throwable e) {
+	status = 1
+	e.printStackTrace()
+    } finally {
+	out.flush()
+	System.setOut(protocolOut)
+	System.setIn(protocolIn)
+    }
+    nbJobs++
+    respond([status: status, output: buffer.toString("UTF-8")])
+}